@@ -0,0 +1,71 @@
+"""
+Бенчмарк времени запуска: python -X importtime в отдельных процессах.
+Запуск: python -m benchmarks.bench_import
+Завершается с кодом 1, если импорт дольше бюджета или тянет лишние тяжелые модули.
+"""
+
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+# Модуль -> (бюджет в мс, модули, которых не должно быть после импорта)
+BUDGETS = {
+    "bot": (150, ("numpy", "pandas", "pybit.unified_trading", "requests")),
+    "bot.trade_logic": (500, ("pandas", "ta", "sklearn", "joblib", "websocket")),
+    "bot.runner": (500, ("pandas", "ta", "sklearn", "joblib", "websocket")),
+}
+
+
+def _run(code):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Строки вида "import time: self [us] | cumulative | imported package",
+    # вложенные импорты отбиты в имени дополнительными пробелами
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        top_level[name.strip()] = int(cumulative)
+    return top_level, result.stdout
+
+
+def measure(module, startup):
+    """
+    Один запуск интерпретатора.
+    :param startup: Модули, загружаемые самим интерпретатором (site и т.п.)
+    :return: (время импорта module в мс, загруженные модули)
+    """
+    top_level, stdout = _run(f"import sys, {module}; print(' '.join(sys.modules))")
+    total_us = sum(us for name, us in top_level.items() if name not in startup)
+    return total_us / 1000, set(stdout.split())
+
+
+def main():
+    startup = set(_run("pass")[0])
+    failed = False
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        runs = [measure(module, startup) for _ in range(RUNS)]
+        median = statistics.median(ms for ms, _ in runs)
+        loaded = sorted(set(forbidden) & runs[-1][1])
+        print(f"import {module:<16} {median:7.1f} ms (budget {budget_ms} ms)")
+        if median > budget_ms:
+            print(f"FAIL: import {module} is over budget")
+            failed = True
+        if loaded:
+            print(f"FAIL: import {module} loads {', '.join(loaded)}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Бенчмарк разбора ответа get_kline.
+Запуск: python -m benchmarks.bench_klines
+Сравнивает прежний путь (на каждый тик 200 свечей: разворот списка,
+float() по close, pd.Series и pd.DataFrame) с новым (parse_klines дельты
+в KlineSeries и срез без копирования), а также полный разбор ответа.
+Завершается с кодом 1, если тик по новому пути не быстрее прежнего.
+"""
+
+import json
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from bot.kline_store import KLINE_DTYPE, KlineSeries, parse_klines
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROWS = 1000
+
+
+def payload(rows=ROWS):
+    start = 1_700_000_000_000
+    klines = [
+        [
+            str(start + i * 300_000),
+            f"{100 + i * 0.01:.2f}",
+            f"{101 + i * 0.01:.2f}",
+            f"{99 + i * 0.01:.2f}",
+            f"{100.5 + i * 0.01:.2f}",
+            "12.345",
+            "1234.5",
+        ]
+        for i in range(rows)
+    ]
+    klines.reverse()  # Bybit отдает свечи от новых к старым
+    return json.dumps(
+        {"retCode": 0, "retMsg": "OK", "result": {"list": klines}}
+    ).encode()
+
+
+def legacy(klines):
+    """Прежний close_prices + get_historical_data"""
+    klines = list(klines)
+    klines.reverse()
+    close_prices = pd.Series([float(e[4]) for e in klines])
+    return pd.DataFrame({"close": close_prices})
+
+
+def per_call_us(func, number):
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def main():
+    body = payload()
+    klines = json.loads(body)["result"]["list"]
+    out = np.empty(ROWS, dtype=KLINE_DTYPE)
+
+    # Тик: прежде каждый раз разбирались 200 свечей, теперь - дельта из 2 свечей
+    last_200 = klines[:200]
+    delta = klines[:2]
+    series = KlineSeries(maxlen=ROWS)
+    series.replace(parse_klines(klines, newest_first=True))
+
+    def new_tick():
+        series.merge(parse_klines(delta, newest_first=True))
+        return series.view(200)
+
+    results = {
+        "json.loads (1000 klines)": per_call_us(lambda: json.loads(body), 200),
+        "full: legacy (close only)": per_call_us(lambda: legacy(klines), 200),
+        "full: parse_klines (OHLCV)": per_call_us(
+            lambda: parse_klines(klines, out=out, newest_first=True), 200
+        ),
+        "tick: legacy (200 closes)": per_call_us(lambda: legacy(last_200), 2_000),
+        "tick: delta merge + view": per_call_us(new_tick, 20_000),
+    }
+    if orjson is not None:
+        results["orjson.loads (1000 klines)"] = per_call_us(
+            lambda: orjson.loads(body), 200
+        )
+
+    for name, value in results.items():
+        print(f"{name:28} {value:10.1f} us")
+
+    per_value = (
+        results["full: parse_klines (OHLCV)"] / (ROWS * 7) * 1000,
+        results["full: legacy (close only)"] / ROWS * 1000,
+    )
+    print(f"per parsed value: {per_value[0]:.0f} ns (legacy {per_value[1]:.0f} ns)")
+    speedup = results["tick: legacy (200 closes)"] / results["tick: delta merge + view"]
+    print(f"tick speedup: x{speedup:.1f}")
+    if speedup <= 1:
+        print("FAIL: tick path is not faster than the legacy path")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Микробенчмарк Bybit.log.
+Запуск: python -m benchmarks.bench_logging
+Завершается с кодом 1, если вызов при выключенном DEBUG дороже бюджета.
+"""
+
+import inspect
+import logging
+import sys
+import timeit
+
+from bot import api
+from bot.api import Bybit
+
+BUDGET_NS = 1000  # не больше микросекунды на вызов при выключенном DEBUG
+
+
+def legacy_log(self, *args):
+    """Прежняя реализация: inspect.stack() и f-строка на каждый вызов"""
+    caller = inspect.stack()[1].function
+    api.logger.debug(f"* {caller} {self.symbol} - {args}")
+
+
+def per_call_ns(func, number):
+    return timeit.timeit(func, number=number) / number * 1e9
+
+
+def main():
+    bybit = Bybit.__new__(Bybit)
+    bybit.symbol = "BTCUSDT"
+    args = {"category": "linear", "symbol": "BTCUSDT", "interval": "5", "limit": 200}
+
+    level = api.logger.level
+    api.logger.setLevel(logging.ERROR)
+    try:
+        disabled = per_call_ns(lambda: bybit.log("args", args), 1_000_000)
+        legacy = per_call_ns(lambda: legacy_log(bybit, "args", args), 2_000)
+    finally:
+        api.logger.setLevel(level)
+
+    print(f"Bybit.log, DEBUG disabled: {disabled:8.1f} ns/call")
+    print(f"legacy log, DEBUG disabled: {legacy:8.1f} ns/call")
+    print(f"speedup: x{legacy / disabled:.0f}")
+
+    if disabled > BUDGET_NS:
+        print(f"FAIL: budget is {BUDGET_NS} ns/call")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
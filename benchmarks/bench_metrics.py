@@ -0,0 +1,42 @@
+"""
+Микробенчмарк метрик горячего пути.
+Запуск: python -m benchmarks.bench_metrics
+Завершается с кодом 1, если выключенные метрики дороже бюджета на вызов.
+"""
+
+import sys
+import timeit
+
+from bot.metrics import Metrics
+
+BUDGET_NS = 500  # этап при выключенных метриках - не дороже 0.5 мкс
+
+
+def per_call_ns(func, number):
+    return timeit.timeit(func, number=number) / number * 1e9
+
+
+def stage(metrics):
+    with metrics.stage("klines"):
+        pass
+
+
+def main():
+    disabled = Metrics(enabled=False)
+    enabled = Metrics(enabled=True)
+    baseline = per_call_ns(lambda: None, 1_000_000)
+    off = per_call_ns(lambda: stage(disabled), 1_000_000) - baseline
+    on = per_call_ns(lambda: stage(enabled), 300_000) - baseline
+    request = per_call_ns(lambda: disabled.request("/v5/market/kline", 0.01), 1_000_000)
+
+    print(f"stage, metrics disabled:   {off:8.1f} ns/call")
+    print(f"stage, metrics enabled:    {on:8.1f} ns/call")
+    print(f"request, metrics disabled: {request - baseline:8.1f} ns/call")
+
+    if off > BUDGET_NS:
+        print(f"FAIL: budget is {BUDGET_NS} ns/call")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Бенчмарк сканера рынка: снимок тикеров -> индикаторы -> ранжированный список.
+Запуск: python -m benchmarks.bench_scanner --symbols 500
+Печатает время обновления внутри свечи и со сменой свечи (медиана прогонов).
+Завершается с кодом 1, если обновление дольше бюджета.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from bot.kline_store import KLINE_DTYPE, MINUTE_MS
+from bot.scanner import MarketScanner
+
+BUDGET_MS = 10  # разбор тикеров и скан 500 символов
+RUNS = 50
+
+
+def make_scanner(count, bars, now):
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, (count, bars)), axis=1))
+    starts = now - 5 * MINUTE_MS * np.arange(bars, dtype=np.int64)[::-1]
+    histories = {}
+    for i in range(count):
+        rows = np.zeros(bars, dtype=KLINE_DTYPE)
+        rows["start"], rows["close"] = starts, closes[i]
+        histories[f"SYM{i}USDT"] = rows
+    scanner = MarketScanner(interval="5", bars=bars)
+    scanner.load_history(histories)
+    return scanner, closes[:, -1]
+
+
+def tickers(last, rng):
+    """Снимок в формате get_tickers: цены строками, как в ответе биржи"""
+    prices = last * (1 + rng.normal(0, 0.002, len(last)))
+    return [
+        {"symbol": f"SYM{i}USDT", "lastPrice": f"{price:.4f}", "bid1Price": "0", "ask1Price": "0"}
+        for i, price in enumerate(prices)
+    ]
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк MarketScanner")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    now = 1_700_000_000_000 // (5 * MINUTE_MS) * (5 * MINUTE_MS)
+    scanner, last = make_scanner(args.symbols, args.bars, now)
+    rng = np.random.default_rng(1)
+    snapshots = [tickers(last, rng) for _ in range(RUNS)]
+
+    def refresh(snapshot, at):
+        scanner.update_tickers(snapshot, at)
+        scanner.scan()
+
+    inside = [timed(lambda s=s: refresh(s, now + 1000)) for s in snapshots]
+    rollover = [
+        timed(lambda s=s, i=i: refresh(s, now + (i + 1) * 5 * MINUTE_MS))
+        for i, s in enumerate(snapshots)
+    ]
+    scan = [timed(scanner.scan) for _ in range(RUNS)]
+
+    worst = max(statistics.median(inside), statistics.median(rollover))
+    print(f"symbols: {args.symbols}, bars: {args.bars}")
+    print(f"refresh inside candle:   {statistics.median(inside):6.2f} ms")
+    print(f"refresh with new candle: {statistics.median(rollover):6.2f} ms")
+    print(f"scan only:               {statistics.median(scan):6.2f} ms")
+
+    if worst > BUDGET_MS:
+        print(f"FAIL: budget is {BUDGET_MS} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
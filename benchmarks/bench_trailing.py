@@ -0,0 +1,82 @@
+"""
+Бенчмарк локальных трейлинг стопов: много позиций, поток тиков по символам.
+Запуск: python -m benchmarks.bench_trailing --positions 10000 --symbols 500
+Печатает время on_tick (мкс на тик) и долю тиков, отправивших стоп на биржу.
+Завершается с кодом 1, если тик дольше бюджета.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bot.trailing import TrailingStopManager
+
+BUDGET_US = 50  # среднее время on_tick
+TICKS = 200_000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк TrailingStopManager")
+    parser.add_argument("--positions", type=int, default=10_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--threshold", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    rows_of = {symbol: row for row, symbol in enumerate(symbols)}
+    prices = np.full(args.symbols, 100.0)
+    sends = []
+    manager = TrailingStopManager(threshold_ticks=args.threshold)
+
+    def send(position, stop):
+        sends.append(stop)
+        return True
+
+    def reopen(position):
+        # Позиция со сработавшим стопом открывается заново: число позиций не падает
+        manager.open(
+            position.symbol,
+            "Buy" if position.long else "Sell",
+            prices[rows_of[position.symbol]],
+            percent=position.percent,
+            tick_size=0.01,
+            position_idx=position.position_idx,
+            send=send,
+        )
+
+    manager.on_trigger = reopen
+    for i in range(args.positions):
+        manager.open(
+            symbols[i % args.symbols],
+            "Buy" if i % 2 else "Sell",
+            100.0,
+            percent=float(rng.choice((0.5, 1, 2))),
+            tick_size=0.01,
+            position_idx=i,
+            send=send,
+        )
+    opened = len(sends)
+
+    rows = rng.integers(0, args.symbols, TICKS)
+    moves = rng.normal(0, 0.0005, TICKS)
+    started = time.perf_counter()
+    for row, move in zip(rows.tolist(), moves.tolist()):
+        prices[row] = round(prices[row] * (1 + move), 2)
+        manager.on_tick(symbols[row], prices[row])
+    elapsed = time.perf_counter() - started
+
+    per_tick = elapsed / TICKS * 1e6
+    print(f"positions: {len(manager)}, symbols: {args.symbols}, ticks: {TICKS}")
+    print(f"on_tick:     {per_tick:6.2f} us")
+    print(f"stops sent:  {len(sends) - opened} ({(len(sends) - opened) / TICKS:.2f} per tick)")
+
+    if per_tick > BUDGET_US:
+        print(f"FAIL: budget is {BUDGET_US} us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
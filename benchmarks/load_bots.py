@@ -0,0 +1,142 @@
+"""
+Нагрузочный прогон: N ботов AsyncRunner против локальной биржи bot.sandbox.
+Запуск: python -m benchmarks.load_bots --bots 50 --seconds 10 --latency 0.005
+Печатает пропускную способность циклов (итераций в секунду),
+p50/p99 задержки сигнал -> подтверждение ордера и запросы к бирже по эндпоинтам.
+С --min-tps завершается с кодом 1, если итераций в секунду меньше.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import time
+
+from bot import instruments, orders
+from bot.metrics import metrics
+from bot.runner import AsyncRunner
+from bot.sandbox import SandboxExchange
+from bot.trade_logic import Bot
+
+
+class LoadBot(Bot):
+    """Бот, который помимо обычного расчета сигнала торгует с вероятностью signal_rate"""
+
+    signal_rate = 0.1
+
+    def generate_signal(self, data=None, timeframe=None):
+        signal = super().generate_signal(data, timeframe)
+        if signal is None and random.random() < self.signal_rate:
+            signal = random.choice((0, 1))
+        return signal
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int((len(values) - 1) * q)]
+
+
+def quiet_logs():
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith(("bot", "__main__", "pybit")):
+            logging.getLogger(name).setLevel(logging.CRITICAL)
+
+
+async def drive(runner, seconds):
+    task = asyncio.create_task(runner.run())
+    await asyncio.sleep(seconds)
+    runner.stop()
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон ботов")
+    parser.add_argument("--bots", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.1, help="Период цикла бота, сек")
+    parser.add_argument("--latency", type=float, default=0.005, help="Задержка биржи, сек")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--signal-rate", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=int, default=1000, help="Бюджет запросов/сек")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument(
+        "--batch-window", type=float, default=0, help="Окно batch заявок, сек (0 - без batch)"
+    )
+    parser.add_argument("--no-limits", action="store_true", help="Без лимитов биржи")
+    parser.add_argument("--min-tps", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    symbols = [f"LOAD{i}USDT" for i in range(args.bots)]
+    exchange = SandboxExchange(
+        symbols=symbols,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        limits={} if args.no_limits else None,
+        balance=1e9,
+        speed=60,
+    ).start()
+
+    # Состояние процесса - только в памяти, без файлов кэша
+    instruments.registry = instruments.InstrumentRegistry(path=None)
+    orders.book = orders.OrderBook(path=None)
+    LoadBot.signal_rate = args.signal_rate
+    metrics.enable()
+    quiet_logs()
+
+    os.environ.update(
+        BYBIT_ENDPOINT=exchange.url,
+        API_KEY="load",
+        API_SECRET="load",
+        TRAILING_PERCENT="1",
+    )
+    runner = AsyncRunner.from_symbols(
+        symbols=symbols,
+        capital=10**9,
+        interval=args.interval,
+        rate_limit=args.rate_limit,
+        max_workers=args.workers,
+        bot_factory=LoadBot,
+        batch_window=args.batch_window,
+    )
+    quiet_logs()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(drive(runner, args.seconds))
+    elapsed = time.perf_counter() - started
+    exchange.stop()
+
+    latencies = [value for bot in runner.bots for value in bot.order_latencies]
+    tps = runner.ticks / elapsed
+    p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+    print(f"bots: {args.bots}, {elapsed:.1f} s, exchange latency {args.latency * 1000:.1f} ms")
+    print(f"loop iterations: {runner.ticks} ({tps:.1f}/s, {tps / args.bots:.2f}/s per bot)")
+    if latencies:
+        print(
+            f"orders: {len(latencies)}, signal to ack p50 {p50 * 1000:.1f} ms, "
+            f"p99 {p99 * 1000:.1f} ms"
+        )
+    else:
+        print("orders: 0")
+    for path, count in sorted(exchange.requests.items()):
+        print(f"  {path:<32} {count:7d} requests, {exchange.errors[path]:5d} errors")
+    for stage, stats in sorted(metrics.snapshot()["stages"].items()):
+        print(f"  stage {stage:<14} p50 <= {stats['p50']}s, p99 <= {stats['p99']}s")
+
+    if args.min_tps is not None and tps < args.min_tps:
+        print(f"FAIL: {tps:.1f} iterations/s is below {args.min_tps}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,33 @@
 __all__ = (
+    "AsyncRunner",
     "Bot",
     "Bybit",
     "setup_logger",
+    "shutdown_logging",
 )
 
 
-from .logger import setup_logger
-from .trade_logic import Bot
-from .api import Bybit
+import importlib
+
+from .logger import setup_logger, shutdown_logging
+
+# Тяжелые модули (pybit, requests, numpy) импортируются при первом обращении,
+# чтобы `import bot` и чтение .env в main.py не ждали их загрузки
+_LAZY = {
+    "AsyncRunner": ".runner",
+    "Bot": ".trade_logic",
+    "Bybit": ".api",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
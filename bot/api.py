@@ -1,17 +1,27 @@
-import decimal
+import logging
 import os
+import sys
+import time
 import uuid
 
-import inspect
-
-import pandas as pd
-from pybit.unified_trading import HTTP, AccountHTTP, MarketHTTP, TradeHTTP
 from pybit import exceptions
 
-from . import setup_logger
+from . import instruments, orders, setup_logger
+from .kline_store import KlineStore, parse_klines
+from .transport import Transport
 
 logger = setup_logger(__name__)
 
+# Ордеров в одном batch-запросе Bybit по категориям
+BATCH_LIMITS = {"linear": 20, "inverse": 20, "option": 20, "spot": 10}
+# orderId заявки, судьбу которой не удалось выяснить (запрос и поиск упали):
+# заявка могла исполниться, поэтому она не считается неразмещенной
+UNKNOWN_ORDER = "unknown"
+
+
+def _order_key(item):
+    return item.get("orderLinkId") or item.get("orderId")
+
 
 class Bybit:
     """
@@ -19,20 +29,39 @@ class Bybit:
     торговой логике в нем нет
     """
 
-    def __init__(self):
+    def __init__(self, symbol=None, transport=None):
+        """
+        :param symbol: Торговая пара, по умолчанию SYMBOL из окружения
+        :param transport: Общий Transport, если ботов несколько в одном процессе
+        """
         logger.info(f"{os.getenv('NAME', 'Anon')} Bybit auth logged")
 
         self.position_id = str(uuid.uuid4())
         self.qty = os.getenv("QTY")
-        self.symbol = os.getenv("SYMBOL")
+        self.symbol = symbol or os.getenv("SYMBOL")
         self.category = "linear"
         self.trailing_percent = os.getenv("TRAILING_PERCENT")
+        # exchange - trailingStop на бирже, local - стоп ведет bot.trailing по тикам
+        self.trailing_mode = os.getenv("TRAILING_MODE", "exchange")
 
         self.params = dict(
             api_key=os.getenv("API_KEY"),
             api_secret=os.getenv("API_SECRET"),
         )
-        self.client = HTTP(**self.params)
+        # Один пул соединений на все запросы к бирже
+        self.transport = transport or Transport(
+            pool_size=int(os.getenv("HTTP_POOL_SIZE", 10)),
+            endpoint=os.getenv("BYBIT_ENDPOINT"),
+            **self.params,
+        )
+        self.client = self.transport.http
+        self.klines = KlineStore(cache_dir=os.getenv("KLINE_CACHE_DIR"))
+        # Старшие интервалы из базовых свечей (см. bot.resample), None - без сборки
+        self.resampler = None
+        # Ордера и позиции всех ботов процесса, поиск без запросов к бирже
+        self.book = orders.book
+        # Общий OrderBatcher (см. bot.batch): ордера ботов уходят batch-запросами
+        self.order_batcher = None
 
     def check_permissions(self):
         """
@@ -41,7 +70,7 @@ class Bybit:
         если ключи не правильные выкинет ошибку
         """
         try:
-            response = AccountHTTP(**self.params).get_wallet_balance(
+            response = self.client.get_wallet_balance(
                 accountType="UNIFIED"
             )
             return response
@@ -50,19 +79,29 @@ class Bybit:
         except exceptions.FailedRequestError as e:
             logger.error(e)
 
-    def close_prices(
-        self,
-        interval="5",
-        limit=200,
-        category="inverse",
-    ):
+    def _fetch_klines(self, **args):
         """
-        Возвращает серию цен закрытия (close) Pandas для обработки в библиотеке ta.
-        :param interval: Временной интервал свечей (например, 1, 3, 5, 15 минут и т.д.)
-        :param limit: Количество свечей для получения
-        :param category: Категория инструмента (например, "inverse" для обратных контрактов)
-        :return: pd.Series с ценами закрытия
+        Запрос свечей у биржи.
+        :return: Массив KLINE_DTYPE в хронологическом порядке
+        """
+        self.log("args", args)
+        response = self.client.get_kline(**args)
+
+        # Проверяем, что запрос был успешным
+        if response["retCode"] != 0:
+            logger.error(f"API response error: {response['retMsg']}")
+            raise Exception(f"Ошибка получения данных: {response['retMsg']}")
+
+        # Bybit отдает свечи от новых к старым, парсер сразу пишет их по порядку
+        return parse_klines(response["result"]["list"], newest_first=True)
+
+    def _sync_klines(self, interval, limit, category):
         """
+        Обновляет историю в KlineStore: с биржи запрашиваются только свечи
+        начиная с последней сохраненной (она заменяется на месте).
+        :return: KlineSeries или None в случае ошибки
+        """
+        series = self.klines.get(self.symbol, interval, category)
         args = dict(
             category=category,
             symbol=self.symbol,
@@ -70,55 +109,126 @@ class Bybit:
             limit=limit,
         )
         try:
-            self.log("args", args)
-            # Получаем текущие данные о свечах
-            response = MarketHTTP(**self.params).get_kline(**args)
+            synced = False
+            appended = 0
+            if series.last_start is not None:
+                # Получаем только свечи новее последней сохраненной
+                klines = self._fetch_klines(start=series.last_start, **args)
+                synced, appended = series.merge(klines)
+                if not synced:
+                    logger.error(f"Kline history gap for {self.symbol}, reloading.")
+
+            if not synced:
+                klines = self._fetch_klines(**args)
+                if not len(klines):
+                    logger.error(f"No kline data returned for {self.symbol}.")
+                    return None
+                series.replace(klines)
+                appended = len(klines)
 
-            # Проверяем, что запрос был успешным
-            if response["retCode"] == 0:
-                klines = response["result"]["list"]
+            if appended:
+                self.klines.save(self.symbol, interval, category)
+            return series
+        except Exception as e:
+            logger.error(f"Exception occurred while syncing klines: {e}")
+            return None
 
-                if not klines:
-                    logger.error(f"No kline data returned for {self.symbol}.")
-                    return pd.Series()
+    def _series(self, interval, limit, category):
+        """
+        KlineSeries интервала. Интервалы из resampler собираются из базовых свечей:
+        на все интервалы один запрос get_kline базового интервала, история биржи
+        по самому интервалу запрашивается только один раз для прогрева.
+        :return: KlineSeries или None в случае ошибки
+        """
+        resampler = self.resampler
+        if resampler is None or interval not in resampler:
+            return self._sync_klines(interval, limit, category)
 
-                # Разворачиваем список свечей, чтобы он был в хронологическом порядке
-                klines.reverse()
+        base = self._sync_klines(resampler.base_interval, resampler.base_limit, category)
+        if base is None:
+            return None
+        resampler.sync(base.view())
+        if resampler.needs_history(interval):
+            try:
+                klines = self._fetch_klines(
+                    category=category,
+                    symbol=self.symbol,
+                    interval=interval,
+                    limit=limit,
+                )
+                resampler.backfill(interval, klines)
+            except Exception as e:
+                logger.error(f"Exception occurred while loading {interval} klines: {e}")
+        return resampler.series(interval)
 
-                # Извлекаем цены закрытия и возвращаем их в виде Pandas серии
-                try:
-                    close_prices = [float(e[4]) for e in klines]
-                    return pd.Series(close_prices)
-                except (IndexError, ValueError) as e:
-                    logger.error(f"Error processing kline data: {e}")
-                    return pd.Series()
+    def timeframe_klines(self, interval, limit=200):
+        """
+        Свечи интервала из resampler без запросов к бирже
+        (базовые свечи синхронизируются в get_klines / close_prices).
+        :return: Срез массива KLINE_DTYPE или None, если интервал не собирается
+        """
+        if self.resampler is None or interval not in self.resampler:
+            logger.error(f"Timeframe {interval} is not resampled for {self.symbol}.")
+            return None
+        data = self.resampler.view(interval, limit)
+        return data if len(data) else None
+
+    def close_prices(
+        self,
+        interval="5",
+        limit=200,
+        category=None,
+    ):
+        """
+        Возвращает серию цен закрытия (close) Pandas для обработки в библиотеке ta.
+        :param interval: Временной интервал свечей (например, 1, 3, 5, 15 минут и т.д.)
+        :param limit: Количество свечей для получения
+        :param category: Категория инструмента, по умолчанию категория бота
+                         (та же, что у ордеров и get_klines)
+        :return: pd.Series с ценами закрытия, индекс - startTime свечи (мс)
+        """
+        series = self._series(interval, limit, category or self.category)
+        if series is None:
+            import pandas as pd
 
-            else:
-                logger.error(f"API response error: {response['retMsg']}")
-                raise Exception(f"Ошибка получения данных: {response['retMsg']}")
-        except Exception as e:
-            logger.error(f"Exception occurred in close_prices: {e}")
             return pd.Series()
+        return series.closes(limit)
+
+    def get_klines(
+        self,
+        interval="5",
+        limit=200,
+        category=None,
+    ):
+        """
+        Последние свечи (все поля OHLCV) без копирования в pandas.
+        :param category: Категория инструмента, по умолчанию категория бота
+        :return: Срез массива KLINE_DTYPE (поля start, open, high, low, close,
+                 volume, turnover) или None в случае ошибки
+        """
+        series = self._series(interval, limit, category or self.category)
+        if series is None or not len(series):
+            logger.error(f"No historical data returned for {self.symbol}.")
+            return None
+        return series.view(limit)
 
     def get_instrument_info(self):
         """
-        Фильтры заданного инструмента
+        Фильтры заданного инструмента из общего реестра инструментов
         - макс колво знаков в аргументах цены,
         - мин размер ордера в Базовой Валюте,
         - макс размер ордера в БВ
+        Полный набор фильтров (шаг цены, мин сумма ордера) доступен в self.instrument
         """
-        r = HTTP(**self.params).get_instruments_info(
-            symbol=self.symbol,
-            category=self.category,
+        self.instrument = instruments.registry.get(
+            self.symbol,
+            self.category,
+            client=self.client,
         )
-        c = r.get("result", {}).get("list", [])[0]
-        min_qty = c.get("lotSizeFilter", {}).get("minOrderQty", "0.0")
-        qty_decimals = abs(decimal.Decimal(min_qty).as_tuple().exponent)
-        price_decimals = int(c.get("priceScale", "4"))
-        min_qty = float(min_qty)
+        info = self.instrument
 
-        self.log(price_decimals, qty_decimals, min_qty)
-        return price_decimals, qty_decimals, min_qty
+        self.log(info.price_decimals, info.qty_decimals, info.min_qty)
+        return info.price_decimals, info.qty_decimals, info.min_qty
 
     def get_symbol_price(self):
         """
@@ -127,7 +237,7 @@ class Bybit:
         :return: Текущая цена символа в float или None в случае ошибки
         """
         try:
-            response = MarketHTTP(**self.params).get_tickers(
+            response = self.client.get_tickers(
                 category=self.category,
                 symbol=self.symbol,
             )
@@ -145,14 +255,9 @@ class Bybit:
             logger.error(f"Exception occurred while retrieving coin information: {e}")
             return None
 
-    def place_order(self, side, qty):
-        """
-        Размещение заявки на Bybit.
-        :param side: Сторона сделки ("Buy" или "Sell")
-        :param qty: Количество контрактов
-        :return: order_id если заявка успешно размещена, иначе None
-        """
-        args = dict(
+    def order_args(self, side, qty):
+        """Параметры рыночной заявки с новым orderLinkId"""
+        return dict(
             category=self.category,
             symbol=self.symbol,
             side=side,
@@ -162,13 +267,34 @@ class Bybit:
             orderLinkId=str(uuid.uuid4()),
         )
 
+    def place_order(self, side, qty):
+        """
+        Размещение заявки на Bybit.
+        :param side: Сторона сделки ("Buy" или "Sell")
+        :param qty: Количество контрактов
+        :return: order_id если заявка успешно размещена, иначе None
+        """
+        return self._place(self.order_args(side, qty))
+
+    def _place(self, args):
+        """Размещает заявку с готовыми параметрами order_args (см. place_order)"""
+        side = args["side"]
         try:
             self.log("args", args)
-            response = TradeHTTP(**self.params).place_order(**args)
+            response = self.client.place_order(**args)
 
             order_id = None
             if response.get("retCode") == 0:
                 order_id = response.get("result", {}).get("orderId")
+                self.book.apply_order(
+                    dict(
+                        args,
+                        orderId=order_id,
+                        orderStatus="New",
+                        createdTime=str(int(time.time() * 1000)),
+                    )
+                )
+                self.position_id = args["orderLinkId"]
                 logger.info(f"{side} order placed with order ID: {order_id}")
             else:
                 logger.error(f"Failed to place order: {response.get('retMsg')}")
@@ -178,11 +304,231 @@ class Bybit:
             logger.error(f"Exception occurred while placing order: {e}")
             return None
 
+    def submit_order(self, side, qty):
+        """
+        Заявка через общий OrderBatcher (одним batch-запросом с заявками
+        других ботов), без него - отдельным запросом place_order.
+        :return: order_id, UNKNOWN_ORDER (заявка могла исполниться) или None
+        """
+        if self.order_batcher is None:
+            return self.place_order(side=side, qty=qty)
+        args = self.order_args(side, qty)
+        order_id = self.order_batcher.place(args, fallback=self._place)
+        if order_id:
+            self.position_id = args["orderLinkId"]
+            logger.info(f"{side} order placed with order ID: {order_id}")
+        return order_id
+
+    def place_orders(self, orders):
+        """
+        Размещение нескольких заявок batch-запросами /v5/order/create-batch.
+        :param orders: Параметры заявок как у place_order; category и symbol
+                       по умолчанию - бота, orderLinkId генерируется, если не задан
+        :return: {orderLinkId: orderId, None или UNKNOWN_ORDER}
+        """
+        orders = [
+            {
+                "category": self.category,
+                "symbol": self.symbol,
+                **order,
+                "orderLinkId": order.get("orderLinkId") or str(uuid.uuid4()),
+            }
+            for order in orders
+        ]
+        results = self._batch("place", orders)
+        now = str(int(time.time() * 1000))
+        for order in orders:
+            order_id = results[order["orderLinkId"]]
+            # Заявку с неизвестной судьбой книга получит при сверке с биржей
+            if order_id and order_id != UNKNOWN_ORDER:
+                self.book.apply_order(
+                    dict(order, orderId=order_id, orderStatus="New", createdTime=now)
+                )
+        return results
+
+    def amend_order(self, order_id=None, link_id=None, **changes):
+        """
+        Изменение активной заявки (qty, price, triggerPrice, ...).
+        :return: order_id если биржа приняла изменение, иначе None
+        """
+        amend = dict(changes, orderId=order_id, orderLinkId=link_id)
+        return self.amend_orders([amend])[link_id or order_id]
+
+    def amend_orders(self, amends):
+        """
+        Изменение нескольких заявок batch-запросами /v5/order/amend-batch.
+        :param amends: dict с orderId или orderLinkId и изменяемыми полями
+        :return: {orderLinkId или orderId: orderId или None}
+        """
+        amends = self._with_defaults(amends)
+        results = self._batch("amend", amends)
+        now = str(int(time.time() * 1000))
+        for amend in amends:
+            order_id = results[amend.get("orderLinkId") or amend["orderId"]]
+            if order_id:
+                changes = {k: v for k, v in amend.items() if k != "category"}
+                self.book.apply_order(dict(changes, orderId=order_id, updatedTime=now))
+        return results
+
+    def cancel_order(self, order_id=None, link_id=None):
+        """
+        Отмена активной заявки.
+        :return: order_id если биржа подтвердила отмену, иначе None
+        """
+        cancel = dict(orderId=order_id, orderLinkId=link_id)
+        return self.cancel_orders([cancel])[link_id or order_id]
+
+    def cancel_orders(self, cancels):
+        """
+        Отмена нескольких заявок batch-запросами /v5/order/cancel-batch.
+        :param cancels: dict с orderId или orderLinkId (и symbol, если не бота)
+        :return: {orderLinkId или orderId: orderId или None}
+        """
+        cancels = self._with_defaults(cancels)
+        results = self._batch("cancel", cancels)
+        now = str(int(time.time() * 1000))
+        for cancel in cancels:
+            order_id = results[cancel.get("orderLinkId") or cancel["orderId"]]
+            if order_id:
+                self.book.apply_order(
+                    dict(orderId=order_id, orderStatus="Cancelled", updatedTime=now)
+                )
+        return results
+
+    def _with_defaults(self, items):
+        """category и symbol бота по умолчанию, пустые идентификаторы убираются"""
+        return [
+            {
+                "category": self.category,
+                "symbol": self.symbol,
+                **{k: v for k, v in item.items() if v is not None},
+            }
+            for item in items
+        ]
+
+    def _batch(self, action, items):
+        """
+        Отправляет заявки batch-запросами, сгруппированными по category,
+        не больше BATCH_LIMITS заявок в запросе. Результаты сопоставляются
+        с заявками по позиции в retExtInfo.list и ключу orderLinkId (или orderId).
+        Заявки, отклоненные в batch, и все заявки упавшего batch-запроса
+        повторяются отдельными запросами. Запрос place мог упасть уже после того,
+        как биржа его приняла (например, таймаут чтения), а повтор с тем же
+        orderLinkId она отклонит как дубликат: поэтому заявки упавшего batch
+        сначала ищутся на бирже, повторяются только те, которых там нет.
+        :param action: "place", "amend" или "cancel"
+        :return: {orderLinkId или orderId: orderId, None или UNKNOWN_ORDER}
+        """
+        batch_call, single_call = {
+            "place": (self.client.place_batch_order, self.client.place_order),
+            "amend": (self.client.amend_batch_order, self.client.amend_order),
+            "cancel": (self.client.cancel_batch_order, self.client.cancel_order),
+        }[action]
+        groups = {}
+        for item in items:
+            groups.setdefault(item["category"], []).append(item)
+
+        results = {}
+        for category, group in groups.items():
+            size = BATCH_LIMITS.get(category, BATCH_LIMITS["linear"])
+            for lo in range(0, len(group), size):
+                chunk = group[lo : lo + size]
+                failed = chunk
+                try:
+                    request = [
+                        {k: v for k, v in item.items() if k != "category"} for item in chunk
+                    ]
+                    self.log("args", category, request)
+                    response = batch_call(category=category, request=request)
+                    listed = response.get("result", {}).get("list", [])
+                    codes = response.get("retExtInfo", {}).get("list", [])
+                    failed = []
+                    for i, item in enumerate(chunk):
+                        result = listed[i] if i < len(listed) else {}
+                        code = codes[i] if i < len(codes) else {}
+                        if code.get("code", 0) == 0 and result.get("orderId"):
+                            results[_order_key(item)] = result["orderId"]
+                        else:
+                            logger.error(
+                                f"Batch {action} rejected for {item.get('symbol')}: "
+                                f"{code.get('msg')}"
+                            )
+                            failed.append(item)
+                except Exception as e:
+                    if action == "place":
+                        logger.error(f"Batch place failed, looking orders up: {e}")
+                        failed = []
+                        for item in chunk:
+                            order_id = self._lookup_placed(item)
+                            if order_id is None:
+                                failed.append(item)
+                            else:
+                                results[_order_key(item)] = order_id
+                    else:
+                        logger.error(
+                            f"Batch {action} failed, sending orders one by one: {e}"
+                        )
+
+                for item in failed:
+                    results[_order_key(item)] = self._single(action, single_call, item)
+        return results
+
+    def _single(self, action, call, item):
+        """Одна заявка отдельным запросом (fallback для _batch)"""
+        try:
+            response = call(**item)
+            if response.get("retCode") == 0:
+                return response.get("result", {}).get("orderId")
+            logger.error(f"Failed to {action} order: {response.get('retMsg')}")
+        except Exception as e:
+            logger.error(f"Exception occurred while trying to {action} order: {e}")
+        return None
+
+    def _lookup_placed(self, item):
+        """
+        Ищет на бирже заявку, ответ на размещение которой потерян.
+        :return: orderId, None - биржа заявку не знает,
+                 UNKNOWN_ORDER - проверить не удалось
+        """
+        try:
+            order = self.fetch_order(
+                link_id=item["orderLinkId"],
+                symbol=item["symbol"],
+                category=item["category"],
+            )
+        except Exception as e:
+            logger.error(f"State of order {item['orderLinkId']} is unknown: {e}")
+            return UNKNOWN_ORDER
+        return order["orderId"] if order else None
+
+    def fetch_order(self, order_id=None, link_id=None, symbol=None, category=None):
+        """
+        Состояние ордера с биржи: среди активных (/v5/order/realtime),
+        затем в истории ордеров. Найденный ордер записывается в книгу.
+        :return: Ордер из книги или None, если биржа его не знает
+        :raises Exception: Ошибка запроса или ответ с retCode != 0
+        """
+        args = dict(category=category or self.category, symbol=symbol or self.symbol)
+        if order_id:
+            args["orderId"] = order_id
+        else:
+            args["orderLinkId"] = link_id
+        for call in (self.client.get_open_orders, self.client.get_order_history):
+            self.log("args", args)
+            response = call(**args)
+            if response.get("retCode") != 0:
+                raise Exception(f"Order lookup failed: {response.get('retMsg')}")
+            found = response.get("result", {}).get("list", [])
+            if found:
+                self.book.apply_order(found[0])
+                return self.book.get(order_id=found[0]["orderId"])
+        return None
+
     def get_open_positions(self):
         """
         Получает все активные позиции для указанного символа.
         :param symbol: Символ инструмента (например, "BTCUSD").
-        :return: Список активных позиций.
+        :return: Список активных позиций, None - если запрос не удался.
         """
         try:
             response = self.client.get_positions(
@@ -191,19 +537,23 @@ class Bybit:
             )
             if response.get("retCode") == 0:
                 positions = response["result"]["list"]
+                for position in positions:
+                    self.book.apply_position(position)
                 return positions
             else:
                 logger.error(
                     f"Failed to retrieve open positions: {response.get('retMsg')}"
                 )
-                return []
+                return None
         except Exception as e:
             logger.error(f"Exception occurred while retrieving open positions: {e}")
-            return []
+            return None
 
     def set_trailing_stop(self) -> None:
         """
-        Устанавливает трейлинг стоп.
+        Устанавливает трейлинг стоп, если его еще нет.
+        Состояние позиции берется из локальной книги,
+        к бирже за позициями идем, только если она еще неизвестна.
         """
         args = dict(
             category=self.category,
@@ -214,10 +564,16 @@ class Bybit:
         )
         try:
             self.log("args", args)
-            if self.get_open_positions()[0]["trailingStop"] == "0":
-                response = HTTP(**self.params).set_trading_stop(**args)
+            position = self.book.position(self.symbol)
+            if position is None:
+                position = self.get_open_positions()[0]
+            if position["trailingStop"] == "0":
+                response = self.client.set_trading_stop(**args)
 
                 if response.get("retCode") == 0:
+                    self.book.apply_position(
+                        dict(position, trailingStop=args["trailingStop"])
+                    )
                     print("Trailing_stop was set successfully!")
                 else:
                     logger.error(
@@ -227,45 +583,61 @@ class Bybit:
         except Exception as e:
             logger.error(f"Exception occurred while setting trailing stop: {e}")
 
-    def get_trailing_stop_limit_price(self, trades):
+    def attach_trailing_stop(self):
         """
-        Получает стоп-цену.
-        :param trades: Список активных трейдов
+        Устанавливает трейлинг стоп на только что открытую позицию,
+        без предварительного запроса позиций.
+        :return: True, если биржа подтвердила установку
         """
+        if not self.trailing_percent:
+            return False
+        args = dict(
+            category=self.category,
+            symbol=self.symbol,
+            trailingStop=str(self.trailing_percent),
+            tpslMode="Full",
+            positionIdx=0,
+        )
         try:
-            if not trades:
-                logger.error("No trades to get data")
-                return
-            # Получение текущих цен
-            df = self.get_historical_data()
-            if df is None or df.empty:
-                logger.error(f"No latest data returned for {self.symbol}.")
-                return None
+            self.log("args", args)
+            response = self.client.set_trading_stop(**args)
+            if response.get("retCode") == 0:
+                return True
+            logger.error(f"Failed to set trailing stop: {response.get('retMsg')}")
+        except Exception as e:
+            logger.error(f"Exception occurred while setting trailing stop: {e}")
+        return False
 
-            current_price = df.iloc[0]["close"]
-            new_stop_price = 0
-            for trade in trades:
-                if trade["type"] == "long":
-                    # Обновление трейлинг-стопа для длинной позиции
-                    new_stop_price = max(
-                        trade["stop_price"], current_price * (1 - 0.001)
-                    )
-                elif trade["type"] == "short":
-                    # Обновление трейлинг-стопа для короткой позиции
-                    new_stop_price = min(
-                        trade["stop_price"], current_price * (1 + 0.001)
+    def send_stop_loss(self, position, stop):
+        """
+        send для bot.trailing: переносит stopLoss позиции на бирже.
+        :param position: TrailingPosition (символ и positionIdx)
+        :return: True, если биржа приняла стоп
+        """
+        args = dict(
+            category=self.category,
+            symbol=position.symbol,
+            stopLoss=f"{stop:.{self.instrument.price_decimals}f}",
+            tpslMode="Full",
+            positionIdx=position.position_idx,
+        )
+        try:
+            self.log("args", args)
+            response = self.client.set_trading_stop(**args)
+            if response.get("retCode") == 0:
+                if self.book.position(position.symbol, position.position_idx) is not None:
+                    self.book.apply_position(
+                        dict(
+                            symbol=position.symbol,
+                            positionIdx=position.position_idx,
+                            stopLoss=args["stopLoss"],
+                        )
                     )
-                else:
-                    print(trade["type"])
-                if new_stop_price != trade["stop_price"]:
-                    # Установка нового трейлинг-стопа
-
-                    trade["stop_price"] = new_stop_price
-                    print(new_stop_price)
-                    return new_stop_price
-
+                return True
+            logger.error(f"Failed to move stop loss: {response.get('retMsg')}")
         except Exception as e:
-            logger.error(f"Exception occurred while get stop_price: {e}")
+            logger.error(f"Exception occurred while moving stop loss: {e}")
+        return False
 
     def get_historical_data(self):
         """
@@ -278,8 +650,7 @@ class Bybit:
                 logger.error(f"No historical data returned for {self.symbol}.")
                 return None
 
-            df = pd.DataFrame({"close": close_prices})
-            return df
+            return close_prices.to_frame("close")
 
         except Exception as e:
             logger.error(f"Exception occurred while fetching historical data: {e}")
@@ -287,36 +658,38 @@ class Bybit:
 
     def is_position(self):
         """
-        Ищем открытую позицию по orderLinkId (clOrdId) за последние 7 дней.
+        Ищем открытую позицию по orderLinkId (clOrdId) последнего ордера
+        в локальной книге ордеров. Пока ордер в книге не в конечном статусе
+        (исполнение приходит только сверкой), его состояние запрашивается у биржи.
         Возвращает True, если позиция была открыта с типом buy, иначе False.
         """
-        # Параметры запроса
-        params = {
-            "category": self.category,  # Тип продукта (например, spot)
-            "symbol": self.symbol,  # Торговая пара (например, BTCUSDT)
-            "orderType": "Market",  # Тип ордера (например, Market)
-            "orderLinkId": self.position_id,  # Пользовательский идентификатор ордера
-            "orderStatus": "Filled",  # Ищем только исполненные ордера
-        }
-
-        # Выполнение запроса к API
-        response = self.client.get_order_history(**params)
-
-        # Получаем список ордеров
-        orders = response.get("result", {}).get("list", [])
-
-        # Ищем нужный ордер по orderLinkId и проверяем его сторону
-        for order in orders:
-            if order.get("orderLinkId") == self.position_id:
-                logger.debug(f"Order_id:{order.get('orderId')} {order.get('side')}")
-                return order.get("side") == "Buy"
-
-        # Если ордер не найден, возвращаем False
-        return False
+        order = self.book.get(link_id=self.position_id)
+        if order is not None and order.get("orderStatus") not in orders.FINAL_STATUSES:
+            try:
+                order = self.fetch_order(link_id=self.position_id) or order
+            except Exception as e:
+                logger.error(f"Exception occurred while fetching order: {e}")
+        if order is None or order.get("orderStatus") != "Filled":
+            return False
+
+        logger.debug(f"Order_id:{order.get('orderId')} {order.get('side')}")
+        return order.get("side") == "Buy"
+
+    def connection_stats(self):
+        """Сколько соединений с биржей открыто и сколько запросов их переиспользовали"""
+        return self.transport.stats()
+
+    def rate_limit_stats(self):
+        """Ожидание в очереди лимитов запросов по группам эндпоинтов"""
+        return self.transport.rate_stats()
 
     def log(self, *args):
         """
-        Для удобного вывода из методов класса
+        Для удобного вывода из методов класса.
+        При выключенном DEBUG ничего не делает, имя вызывающего метода
+        берется из кадра стека, форматирование откладывается до записи
         """
-        caller = inspect.stack()[1].function
-        logger.debug(f"* {caller} {self.symbol} - {args}")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        caller = sys._getframe(1).f_code.co_name
+        logger.debug("* %s %s - %s", caller, self.symbol, args)
@@ -0,0 +1,205 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import setup_logger
+from .kline_store import interval_to_ms
+from .logger import BASE_DIR
+
+logger = setup_logger(__name__)
+
+ARCHIVE_DIR = os.getenv("KLINE_ARCHIVE_DIR", f"{BASE_DIR}/archive")
+PAGE = 1000  # максимум свечей get_kline за запрос
+
+# Колонки в порядке полей ответа get_kline
+COLUMNS = ("start", "open", "high", "low", "close", "volume", "turnover")
+DTYPES = {column: np.float64 for column in COLUMNS}
+DTYPES["start"] = np.int64
+
+
+class KlineArchive:
+    """
+    Колоночный архив закрытых свечей на диске:
+    {root}/{category}/{symbol}/{interval}/{column}.bin - сырые int64/float64 массивы.
+    Новые свечи дописываются в конец файлов, чтение - через memmap,
+    диапазон по времени отдается срезами без копирования.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.requests = 0
+
+    def _dir(self, symbol, interval, category):
+        return os.path.join(self.root, category, symbol, str(interval))
+
+    def _path(self, symbol, interval, category, column):
+        return os.path.join(self._dir(symbol, interval, category), f"{column}.bin")
+
+    def count(self, symbol, interval, category="linear"):
+        """
+        Число целиком записанных свечей.
+        Берется минимум по колонкам, так что оборванная запись не видна читателю.
+        """
+        sizes = []
+        for column in COLUMNS:
+            path = self._path(symbol, interval, category, column)
+            if not os.path.exists(path):
+                return 0
+            sizes.append(os.path.getsize(path) // np.dtype(DTYPES[column]).itemsize)
+        return min(sizes)
+
+    def _start_column(self, symbol, interval, category, count):
+        return np.memmap(
+            self._path(symbol, interval, category, "start"),
+            dtype=DTYPES["start"],
+            mode="r",
+            shape=(count,),
+        )
+
+    def last_start(self, symbol, interval, category="linear"):
+        """startTime последней сохраненной свечи или None"""
+        count = self.count(symbol, interval, category)
+        if not count:
+            return None
+        return int(self._start_column(symbol, interval, category, count)[-1])
+
+    def _truncate(self, symbol, interval, category, count):
+        """Обрезает колонки до count свечей (после оборванной записи)"""
+        for column in COLUMNS:
+            path = self._path(symbol, interval, category, column)
+            size = count * np.dtype(DTYPES[column]).itemsize
+            if os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def append(self, symbol, interval, category, klines):
+        """
+        Дописывает свечи новее последней сохраненной.
+        :param klines: Закрытые свечи в формате get_kline, в хронологическом порядке
+        :return: Количество добавленных свечей
+        """
+        os.makedirs(self._dir(symbol, interval, category), exist_ok=True)
+        count = self.count(symbol, interval, category)
+        last_start = None
+        if count:
+            self._truncate(symbol, interval, category, count)
+            last_start = int(self._start_column(symbol, interval, category, count)[-1])
+
+        rows = [row for row in klines if last_start is None or int(row[0]) > last_start]
+        if not rows:
+            return 0
+
+        table = np.array(rows, dtype=object)
+        # start пишется последним: пока его нет, свеча не считается записанной
+        for index, column in reversed(list(enumerate(COLUMNS))):
+            values = table[:, index].astype(np.float64).astype(DTYPES[column])
+            with open(self._path(symbol, interval, category, column), "ab") as f:
+                f.write(values.tobytes())
+        return len(rows)
+
+    def read(self, symbol, interval, category="linear", start=None, end=None):
+        """
+        Свечи с start <= startTime < end.
+        :return: dict колонка -> срез memmap (без копирования данных)
+        """
+        count = self.count(symbol, interval, category)
+        if not count:
+            return {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+
+        starts = self._start_column(symbol, interval, category, count)
+        lo = 0 if start is None else int(np.searchsorted(starts, start, "left"))
+        hi = count if end is None else int(np.searchsorted(starts, end, "left"))
+
+        data = {"start": starts[lo:hi]}
+        for column in COLUMNS[1:]:
+            values = np.memmap(
+                self._path(symbol, interval, category, column),
+                dtype=DTYPES[column],
+                mode="r",
+                shape=(count,),
+            )
+            data[column] = values[lo:hi]
+        return data
+
+    def sync(self, client, symbol, interval, category="linear", since=None, now=None):
+        """
+        Догружает закрытые свечи с биржи окнами по PAGE свечей.
+        :param client: pybit HTTP клиент
+        :param since: Начало истории (unix мс) для пустого архива
+        :param now: Текущее время в мс (по умолчанию системное)
+        :return: Количество добавленных свечей
+        """
+        interval_ms = interval_to_ms(interval)
+        if interval_ms is None:
+            raise ValueError(f"Interval {interval} has no fixed length")
+        now = int(time.time() * 1000) if now is None else now
+
+        last_start = self.last_start(symbol, interval, category)
+        start = since if last_start is None else last_start + interval_ms
+        if start is None:
+            raise ValueError("since is required for an empty archive")
+
+        # Только закрытые свечи: startTime + interval <= now
+        last_closed = now - interval_ms
+        appended = 0
+        while start <= last_closed:
+            end = min(start + PAGE * interval_ms - 1, last_closed)
+            self.requests += 1
+            response = client.get_kline(
+                category=category,
+                symbol=symbol,
+                interval=str(interval),
+                start=start,
+                end=end,
+                limit=PAGE,
+            )
+            if response["retCode"] != 0:
+                raise Exception(f"Ошибка получения данных: {response['retMsg']}")
+            rows = response["result"]["list"]
+            rows.reverse()
+            appended += self.append(
+                symbol,
+                interval,
+                category,
+                [row for row in rows if int(row[0]) <= last_closed],
+            )
+            start = end + 1
+
+        logger.info(f"Archived {appended} {interval} klines for {symbol}.")
+        return appended
+
+
+def _parse_date(value):
+    date = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Архив свечей Bybit")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--interval", default="1")
+    parser.add_argument("--category", default="linear")
+    parser.add_argument("--since", type=_parse_date, help="YYYY-MM-DD для пустого архива")
+    parser.add_argument("--root", default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    from .transport import Transport
+
+    transport = Transport(endpoint=os.getenv("BYBIT_ENDPOINT"))
+    archive = KlineArchive(args.root)
+    try:
+        for symbol in args.symbols:
+            added = archive.sync(
+                transport.http, symbol, args.interval, args.category, since=args.since
+            )
+            total = archive.count(symbol, args.interval, args.category)
+            print(f"{symbol}: +{added}, {total} klines")
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
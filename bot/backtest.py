@@ -0,0 +1,295 @@
+import argparse
+import math
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .archive import KlineArchive
+
+KLINE_COLUMNS = ("start", "open", "high", "low", "close", "volume", "turnover")
+
+# Порядок полей trades
+TRADE_FIELDS = ("entry_idx", "exit_idx", "side", "entry", "exit", "qty", "pnl")
+
+
+def load_klines(path):
+    """
+    Загружает свечи из CSV или Parquet в словарь NumPy массивов.
+    Ожидаются колонки start, open, high, low, close (volume, turnover - опционально),
+    порядок строк приводится к хронологическому.
+    Папка архива {root}/{category}/{symbol}/{interval} читается через memmap.
+    """
+    if os.path.isdir(path):
+        base, interval = os.path.split(os.path.normpath(path))
+        base, symbol = os.path.split(base)
+        root, category = os.path.split(base)
+        return KlineArchive(root).read(symbol, interval, category)
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    if "startTime" in df.columns:
+        df = df.rename(columns={"startTime": "start"})
+    df = df.sort_values("start", kind="stable")
+
+    data = {}
+    for column in KLINE_COLUMNS:
+        if column in df.columns:
+            dtype = np.int64 if column == "start" else np.float64
+            data[column] = df[column].to_numpy(dtype=dtype)
+    return data
+
+
+def compute_rsi(close, window=13):
+    """RSI по формуле ta.momentum.RSIIndicator для всей серии"""
+    series = pd.Series(close, copy=False)
+    diff = series.diff(1)
+    up = diff.where(diff > 0, 0.0)
+    down = -diff.where(diff < 0, 0.0)
+    ema_up = up.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    ema_down = down.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down))
+        ).astype(np.float64)
+
+
+def compute_bollinger(close, window=19):
+    """
+    Скользящие среднее и стандартное отклонение (ddof=0), как в ta.volatility.BollingerBands.
+    Полосы для любой ширины: mid +- window_dev * std
+    :return: (mid, std)
+    """
+    rolling = pd.Series(close, copy=False).rolling(window, min_periods=window)
+    return rolling.mean().to_numpy(), rolling.std(ddof=0).to_numpy()
+
+
+def compute_indicators(close, rsi_window=13, bb_window=19, bb_dev=2):
+    """
+    RSI и полосы Боллинджера для всей серии за один векторный проход.
+    :return: (rsi, bollinger_high, bollinger_low, bollinger_mid) - NumPy массивы
+    """
+    rsi = compute_rsi(close, rsi_window)
+    mid, std = compute_bollinger(close, bb_window)
+    return rsi, mid + bb_dev * std, mid - bb_dev * std, mid
+
+
+def generate_signals(
+    close, rsi, bollinger_high, bollinger_low, rsi_buy=35, rsi_sell=65
+):
+    """
+    Условия Bot.generate_signal для каждой свечи.
+    :return: (buy, sell) - булевы массивы
+    """
+    buy = (close < bollinger_low) & (rsi <= rsi_buy)
+    sell = (close > bollinger_high) & (rsi >= rsi_sell)
+    return buy, sell
+
+
+def floor_qty(value, decimals):
+    """Округление количества вниз, как Bot._floor"""
+    factor = 1 / (10**decimals)
+    return (value // factor) * factor
+
+
+@dataclass
+class BacktestResult:
+    trades: np.ndarray
+    equity: np.ndarray
+    bars: int
+    metrics: dict = field(default_factory=dict)
+
+    def report(self):
+        lines = [f"Bars: {self.bars}"]
+        lines += [f"{name}: {value}" for name, value in self.metrics.items()]
+        return "\n".join(lines)
+
+
+class Backtester:
+    """
+    Офлайн прогон правил Bot.generate_signal по истории свечей.
+    Индикаторы и сигналы считаются векторно по всей серии,
+    цикл на Python идет только по сделкам.
+    Исполнение - рыночное по close сигнальной свечи, размер позиции как в
+    Bot.get_valid_order_qty, выход - по противоположному сигналу или трейлинг-стопу.
+    """
+
+    def __init__(
+        self,
+        rsi_window=13,
+        bb_window=19,
+        bb_dev=2,
+        rsi_buy=35,
+        rsi_sell=65,
+        min_notional=20,
+        qty_decimals=3,
+        min_qty=0.0,
+        trailing_stop=None,
+        fee=0.00055,
+    ):
+        """
+        :param trailing_stop: Дистанция трейлинг-стопа в единицах цены
+                              (как trailingStop в set_trading_stop, берется из TRAILING_PERCENT)
+        :param fee: Комиссия тейкера с оборота каждой сделки
+        """
+        self.rsi_window = rsi_window
+        self.bb_window = bb_window
+        self.bb_dev = bb_dev
+        self.rsi_buy = rsi_buy
+        self.rsi_sell = rsi_sell
+        self.min_notional = min_notional
+        self.qty_decimals = qty_decimals
+        self.min_qty = min_qty
+        self.trailing_stop = float(trailing_stop) if trailing_stop else None
+        self.fee = fee
+
+    def signals(self, data):
+        close = data["close"]
+        rsi, high, low, _ = compute_indicators(
+            close, self.rsi_window, self.bb_window, self.bb_dev
+        )
+        return generate_signals(close, rsi, high, low, self.rsi_buy, self.rsi_sell)
+
+    def run(self, data, buy=None, sell=None):
+        """
+        :param data: Словарь массивов open/high/low/close (см. load_klines)
+        :param buy: Готовые сигналы на покупку (если уже посчитаны)
+        :param sell: Готовые сигналы на продажу
+        """
+        close = np.ascontiguousarray(data["close"], dtype=np.float64)
+        high = np.ascontiguousarray(data.get("high", close), dtype=np.float64)
+        low = np.ascontiguousarray(data.get("low", close), dtype=np.float64)
+        open_ = np.ascontiguousarray(data.get("open", close), dtype=np.float64)
+        if buy is None or sell is None:
+            buy, sell = self.signals(data)
+
+        trades = self._simulate(open_, high, low, close, buy, sell)
+        return self._result(trades, len(close))
+
+    def _simulate(self, open_, high, low, close, buy, sell):
+        n = len(close)
+        # Размер ордера на каждой свече; входы с нулевым или меньше min_qty объемом отбрасываются
+        qty = floor_qty(self.min_notional / close, self.qty_decimals)
+        tradable = (qty > 0) & (qty >= self.min_qty)
+        buy_idx = np.flatnonzero(buy)
+        sell_idx = np.flatnonzero(sell)
+        entry_buy_idx = np.flatnonzero(buy & tradable)
+        entry_sell_idx = np.flatnonzero(sell & tradable)
+        trades = []
+
+        t = 0
+        while t < n:
+            # Ближайший сигнал на вход
+            b = entry_buy_idx.searchsorted(t)
+            s = entry_sell_idx.searchsorted(t)
+            next_buy = entry_buy_idx[b] if b < len(entry_buy_idx) else n
+            next_sell = entry_sell_idx[s] if s < len(entry_sell_idx) else n
+            entry = min(next_buy, next_sell)
+            if entry >= n:
+                break
+            side = 1 if next_buy <= next_sell else -1
+            entry_price = close[entry]
+
+            # Выход по противоположному сигналу
+            opposite = sell_idx if side == 1 else buy_idx
+            o = opposite.searchsorted(entry, side="right")
+            exit_idx = opposite[o] if o < len(opposite) else n - 1
+            exit_price = close[exit_idx]
+
+            if self.trailing_stop:
+                hit = self._find_stop(
+                    side, entry, exit_idx, entry_price, open_, high, low
+                )
+                if hit is not None:
+                    exit_idx, exit_price = hit
+
+            size = qty[entry]
+            pnl = side * (exit_price - entry_price) * size
+            pnl -= self.fee * size * (entry_price + exit_price)
+            trades.append((entry, exit_idx, side, entry_price, exit_price, size, pnl))
+            t = exit_idx + 1
+
+        return np.array(trades, dtype=np.float64).reshape(-1, len(TRADE_FIELDS))
+
+    def _find_stop(self, side, entry, last, entry_price, open_, high, low):
+        """
+        Первая свеча в (entry, last], на которой срабатывает трейлинг-стоп.
+        Экстремум считается по предыдущим свечам, поиск идет блоками растущего размера.
+        :return: (индекс, цена исполнения) или None
+        """
+        distance = self.trailing_stop
+        extreme = entry_price
+        start = entry + 1
+        chunk = 256
+        while start <= last:
+            stop = min(start + chunk, last + 1)
+            if side == 1:
+                prev = np.maximum.accumulate(high[start:stop])
+                peak = np.concatenate(([extreme], np.maximum(prev[:-1], extreme)))
+                stops = peak - distance
+                hits = low[start:stop] <= stops
+            else:
+                prev = np.minimum.accumulate(low[start:stop])
+                peak = np.concatenate(([extreme], np.minimum(prev[:-1], extreme)))
+                stops = peak + distance
+                hits = high[start:stop] >= stops
+
+            if hits.any():
+                j = int(hits.argmax())
+                idx = start + j
+                # При гэпе исполнение по open
+                if side == 1:
+                    price = min(stops[j], open_[idx])
+                else:
+                    price = max(stops[j], open_[idx])
+                return idx, price
+
+            extreme = max(extreme, prev[-1]) if side == 1 else min(extreme, prev[-1])
+            start = stop
+            chunk *= 2
+        return None
+
+    @staticmethod
+    def _result(trades, bars):
+        pnl = trades[:, TRADE_FIELDS.index("pnl")] if len(trades) else np.zeros(0)
+        equity = np.cumsum(pnl)
+        peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))
+        drawdown = (peak[1:] - equity).max() if len(equity) else 0.0
+        metrics = {
+            "trades": len(trades),
+            "pnl": float(equity[-1]) if len(equity) else 0.0,
+            "win_rate": float((pnl > 0).mean()) if len(pnl) else math.nan,
+            "max_drawdown": float(drawdown),
+        }
+        return BacktestResult(trades=trades, equity=equity, bars=bars, metrics=metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бэктест правил RSI/Bollinger")
+    parser.add_argument("path", help="CSV, Parquet или папка архива со свечами")
+    parser.add_argument("--qty-decimals", type=int, default=3)
+    parser.add_argument("--min-qty", type=float, default=0.0)
+    parser.add_argument("--min-notional", type=float, default=20)
+    parser.add_argument(
+        "--trailing-stop", type=float, default=os.getenv("TRAILING_PERCENT")
+    )
+    parser.add_argument("--fee", type=float, default=0.00055)
+    args = parser.parse_args(argv)
+
+    backtester = Backtester(
+        min_notional=args.min_notional,
+        qty_decimals=args.qty_decimals,
+        min_qty=args.min_qty,
+        trailing_stop=args.trailing_stop,
+        fee=args.fee,
+    )
+    result = backtester.run(load_klines(args.path))
+    print(result.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import math
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, TimeoutError
+
+from . import setup_logger
+from .api import BATCH_LIMITS
+
+logger = setup_logger(__name__)
+
+# Сколько секунд бот ждет batch, прежде чем отправить заявку отдельным запросом
+PLACE_TIMEOUT = float(os.getenv("ORDER_BATCH_TIMEOUT", 5))
+
+
+class OrderBatcher:
+    """
+    Собирает заявки ботов за короткое окно и отправляет их одним вызовом
+    Bybit.place_orders: заявки всех символов, сработавших на одной свече,
+    уходят одним batch-запросом (на категорию и каждые BATCH_LIMITS заявок).
+    Потокобезопасен: боты ждут результата в своих потоках.
+    """
+
+    def __init__(self, send, window=0.01, schedule=None):
+        """
+        :param send: Bybit.place_orders (или совместимая функция):
+                     список заявок -> {orderLinkId: orderId или None}
+        :param window: Сколько секунд ждать заявки других ботов после первой
+        :param schedule: schedule(delay, flush) - кто и где вызовет flush
+                         по окончании окна (по умолчанию threading.Timer)
+        """
+        self.send = send
+        self.window = window
+        self.schedule = schedule
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, order):
+        """
+        Ставит заявку в текущий batch.
+        :param order: Параметры заявки с orderLinkId
+        :return: Future с orderId (None, если заявка не размещена)
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((order, future))
+            if self._timer is None:
+                self._timer = self._start_timer()
+        return future
+
+    def _start_timer(self):
+        if self.schedule is not None:
+            self.schedule(self.window, self.flush)
+            return True
+        timer = threading.Timer(self.window, self.flush)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def requests(self):
+        """Число batch-запросов для накопленных заявок (по category и BATCH_LIMITS)"""
+        with self._lock:
+            counts = Counter(order["category"] for order, _ in self._pending)
+        return sum(
+            math.ceil(count / BATCH_LIMITS.get(category, BATCH_LIMITS["linear"]))
+            for category, count in counts.items()
+        )
+
+    def place(self, order, timeout=PLACE_TIMEOUT, fallback=None):
+        """
+        Заявка в batch с ожиданием результата.
+        Если batch не ушел за timeout, заявка забирается из него
+        и отправляется через fallback (отдельным запросом).
+        Заявка, чей batch уже отправляется, ждет его ответа.
+        :param fallback: fallback(order) -> orderId или None
+        :return: orderId или None
+        """
+        future = self.submit(order)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if not self._withdraw(future):
+                return future.result()
+        logger.error(f"Batch for order {order['orderLinkId']} was not sent in {timeout} s")
+        return fallback(order) if fallback is not None else None
+
+    def _withdraw(self, future):
+        """Убирает заявку из еще не отправленного batch"""
+        with self._lock:
+            for i, (_, pending) in enumerate(self._pending):
+                if pending is future:
+                    del self._pending[i]
+                    return True
+        return False
+
+    def flush(self):
+        """Отправляет накопленные заявки, не дожидаясь окна"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            timer, self._timer = self._timer, None
+        if isinstance(timer, threading.Timer):
+            timer.cancel()
+        if not pending:
+            return
+        self.batches += 1
+        try:
+            results = self.send([order for order, _ in pending])
+        except Exception as e:
+            logger.error(f"Batch order submission failed: {e}")
+            results = {}
+        for order, future in pending:
+            future.set_result(results.get(order["orderLinkId"]))
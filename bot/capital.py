@@ -0,0 +1,36 @@
+import threading
+
+
+class CapitalLimit:
+    """
+    Лимит на капитал в открытых позициях, USDT.
+    spent - сумма, зарезервированная под открытые позиции ботов:
+    резерв возвращается, когда позиция закрывается или сокращается.
+    Один экземпляр может разделяться несколькими ботами (по одному на символ),
+    резервирование атомарно и безопасно для вызова из разных потоков.
+    """
+
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.spent = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.limit - self.spent
+
+    def can_spend(self, amount):
+        return (self.spent + amount) <= self.limit
+
+    def reserve(self, amount):
+        """Резервирует сумму под ордер, возвращает False если лимит превышен"""
+        with self._lock:
+            if not self.can_spend(amount):
+                return False
+            self.spent += amount
+            return True
+
+    def release(self, amount):
+        """Возвращает сумму: ордер не размещен или позиция закрыта"""
+        with self._lock:
+            self.spent = max(self.spent - amount, 0.0)
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from pybit import exceptions
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+# Коды ответа Bybit, означающие проблему с ключами, а не с сетью:
+# неверный ключ, подпись, нет прав, не прошла аутентификация, чужой IP, ключ истек
+AUTH_ERROR_CODES = frozenset({10003, 10004, 10005, 10007, 10010, 33004})
+
+
+class HealthMonitor:
+    """
+    Фоновая проверка аккаунта вместо check_permissions на каждой итерации.
+    Ключи проверяются один раз при старте, баланс обновляется
+    в отдельном потоке раз в interval секунд (или из приватного потока wallet).
+    Торговля блокируется только при ошибке аутентификации,
+    сетевые сбои оставляют последнее известное состояние.
+    Один экземпляр может разделяться ботами с общими ключами.
+    """
+
+    def __init__(self, client, interval=60, account_type="UNIFIED", coin="USDT"):
+        self.client = client
+        self.interval = interval
+        self.account_type = account_type
+        self.coin = coin
+        self.balance = None  # None - баланс еще не известен
+        self.updated_at = None
+        self.auth_failed = False
+        self.error = None
+        self.requests = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def trading_allowed(self):
+        return not self.auth_failed
+
+    def can_trade(self, order_cost):
+        """
+        Разрешена ли торговля и хватает ли кэшированного баланса на ордер.
+        Запросов к бирже не делает.
+        """
+        if self.auth_failed:
+            return False
+        return self.balance is None or order_cost <= self.balance
+
+    def _parse_balance(self, account):
+        total = account.get("totalAvailableBalance")
+        if total:
+            return float(total)
+        for coin in account.get("coin", []):
+            if coin.get("coin") == self.coin:
+                return float(coin.get("walletBalance") or 0)
+        return 0.0
+
+    def _set_balance(self, balance):
+        with self._lock:
+            self.balance = balance
+            self.updated_at = time.time()
+            self.auth_failed = False
+            self.error = None
+
+    def refresh(self):
+        """
+        Один запрос баланса.
+        :return: True, если ответ получен
+        """
+        self.requests += 1
+        try:
+            response = self.client.get_wallet_balance(accountType=self.account_type)
+        except exceptions.InvalidRequestError as e:
+            self.error = e
+            if e.status_code in AUTH_ERROR_CODES:
+                if not self.auth_failed:
+                    logger.error(f"API keys rejected, trading is blocked: {e}")
+                self.auth_failed = True
+            else:
+                logger.error(f"Wallet balance request failed: {e}")
+            return False
+        except exceptions.FailedRequestError as e:
+            self.error = e
+            if e.status_code == 401:
+                self.auth_failed = True
+            logger.error(f"Wallet balance request failed: {e}")
+            return False
+
+        accounts = response.get("result", {}).get("list", [])
+        self._set_balance(self._parse_balance(accounts[0]) if accounts else 0.0)
+        return True
+
+    def handle_wallet(self, message):
+        """Обработчик сообщения приватного потока wallet: обновляет баланс без REST"""
+        for account in message.get("data", []):
+            if account.get("accountType", self.account_type) == self.account_type:
+                self._set_balance(self._parse_balance(account))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health monitor error: {e}")
+
+    def start(self):
+        """Проверяет ключи и запускает фоновое обновление (повторный вызов ничего не делает)"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="health-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,430 @@
+import math
+from bisect import bisect_right
+
+NAN = float("nan")
+
+# Признаки модели (TradingModel) по последней закрытой свече, в порядке вектора
+FEATURES = (
+    "rsi",  # RSI / 100
+    "bb_position",  # положение close внутри полос: 0 - нижняя, 1 - верхняя
+    "bb_width",  # ширина полос относительно средней
+    "close_to_mid",  # отклонение close от средней полосы
+    "return_1",  # доходность последней свечи
+    "volatility",  # экспоненциальное СКО доходностей (alpha = 1 / bb_window)
+)
+
+# Схема старой trading_model.pkl без поля features (5 признаков)
+LEGACY_FEATURES = (
+    "close",  # цена закрытия
+    "macd",  # MACD(12, 26)
+    "macd_signal",  # сигнальная линия MACD(9)
+    "macd_diff",  # гистограмма: macd - macd_signal
+    "close_diff",  # изменение цены закрытия за свечу
+)
+
+# Вектор IndicatorEngine.model_features(): из него TradingModel берет столбцы своей схемы
+MODEL_FEATURES = FEATURES + LEGACY_FEATURES
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер фиксированного размера.
+    Хранит последние size значений скользящего окна,
+    push возвращает вытесненное значение (или None, пока окно не заполнено)
+    """
+
+    __slots__ = ("_data", "_size", "_pos", "_count")
+
+    def __init__(self, size):
+        self._data = [0.0] * size
+        self._size = size
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def full(self):
+        return self._count == self._size
+
+    def oldest(self):
+        """Значение, которое будет вытеснено следующим push"""
+        if not self.full:
+            return None
+        return self._data[self._pos]
+
+    def push(self, value):
+        evicted = self.oldest()
+        self._data[self._pos] = value
+        self._pos = (self._pos + 1) % self._size
+        if not self.full:
+            self._count += 1
+        return evicted
+
+    def clear(self):
+        self._pos = 0
+        self._count = 0
+
+
+class WilderRSI:
+    """
+    Потоковый RSI со сглаживанием Уайлдера.
+    Повторяет ta.momentum.RSIIndicator (ewm(alpha=1/window, adjust=False))
+    операция в операцию, поэтому результат совпадает с ta побитово.
+    """
+
+    __slots__ = ("window", "_alpha", "_old_wt", "_state")
+
+    def __init__(self, window=13):
+        self.window = window
+        self._alpha = 1 / window
+        # При adjust=False pandas каждый шаг сбрасывает вес к 1 и умножает на (1 - alpha)
+        self._old_wt = 1.0 * (1.0 - self._alpha)
+        self._state = None  # (prev_close, avg_up, avg_down, nobs)
+
+    def reset(self):
+        self._state = None
+
+    def _ewm(self, weighted, cur):
+        # Как в pandas: при совпадении значений не пересчитываем (защита от накопления ошибки)
+        if weighted != cur:
+            weighted = self._old_wt * weighted + self._alpha * cur
+            weighted /= self._old_wt + self._alpha
+        return weighted
+
+    def _step(self, close):
+        if self._state is None:
+            # Первый diff в ta равен NaN и превращается в 0.0 / -0.0
+            return close, 0.0, -0.0, 1
+        prev_close, avg_up, avg_down, nobs = self._state
+        diff = close - prev_close
+        up = diff if diff > 0 else 0.0
+        down = -(diff if diff < 0 else 0.0)
+        return (
+            close,
+            self._ewm(avg_up, up),
+            self._ewm(avg_down, down),
+            nobs + 1,
+        )
+
+    def _value(self, state):
+        _, avg_up, avg_down, nobs = state
+        if nobs < self.window:
+            return NAN
+        if avg_down == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_up / avg_down))
+
+    def update(self, close):
+        """Добавляет закрытую свечу и возвращает значение RSI"""
+        self._state = self._step(close)
+        return self._value(self._state)
+
+    def peek(self, close):
+        """Значение RSI для незакрытой свечи без изменения состояния"""
+        return self._value(self._step(close))
+
+
+class RollingBollinger:
+    """
+    Потоковые полосы Боллинджера на кольцевом буфере.
+    Скользящие среднее и дисперсия пересчитываются за O(1) тем же
+    алгоритмом (Уэлфорд + суммирование Кэхэна), что и pandas rolling,
+    поэтому результат побитово совпадает с ta.volatility.BollingerBands.
+    """
+
+    __slots__ = ("window", "window_dev", "_buffer", "_state")
+
+    def __init__(self, window=19, window_dev=2):
+        self.window = window
+        self.window_dev = window_dev
+        self._buffer = RingBuffer(window)
+        self._state = None
+
+    def reset(self):
+        self._buffer.clear()
+        self._state = None
+
+    @staticmethod
+    def _initial_state(value):
+        # [nobs, sum_x, neg_ct, comp_add, comp_remove, same_ct, prev_value,
+        #  var_nobs, mean_x, ssqdm_x, var_comp_add, var_comp_remove, var_same_ct, var_prev]
+        return [0, 0.0, 0, 0.0, 0.0, 0, value, 0.0, 0.0, 0.0, 0.0, 0.0, 0, value]
+
+    @staticmethod
+    def _add(s, val):
+        # roll_mean: add_mean
+        s[0] += 1
+        y = val - s[3]
+        t = s[1] + y
+        s[3] = t - s[1] - y
+        s[1] = t
+        if math.copysign(1.0, val) < 0:
+            s[2] += 1
+        s[5] = s[5] + 1 if val == s[6] else 1
+        s[6] = val
+
+        # roll_var: add_var
+        s[7] += 1
+        s[12] = s[12] + 1 if val == s[13] else 1
+        s[13] = val
+        prev_mean = s[8] - s[10]
+        y = val - s[10]
+        t = y - s[8]
+        s[10] = t + s[8] - y
+        s[8] = s[8] + t / s[7]
+        s[9] = s[9] + (val - prev_mean) * (val - s[8])
+
+    @staticmethod
+    def _remove(s, val):
+        # roll_mean: remove_mean
+        s[0] -= 1
+        y = -val - s[4]
+        t = s[1] + y
+        s[4] = t - s[1] - y
+        s[1] = t
+        if math.copysign(1.0, val) < 0:
+            s[2] -= 1
+
+        # roll_var: remove_var
+        s[7] -= 1
+        if s[7]:
+            prev_mean = s[8] - s[11]
+            y = val - s[11]
+            t = y - s[8]
+            s[11] = t + s[8] - y
+            s[8] = s[8] - t / s[7]
+            s[9] = s[9] - (val - prev_mean) * (val - s[8])
+        else:
+            s[8] = 0.0
+            s[9] = 0.0
+
+    def _step(self, state, close, evicted):
+        s = self._initial_state(close) if state is None else list(state)
+        if evicted is not None:
+            self._remove(s, evicted)
+        self._add(s, close)
+        return s
+
+    def _value(self, s):
+        nobs = s[0]
+        if nobs < self.window:
+            return NAN, NAN, NAN
+
+        mavg = s[1] / nobs
+        if s[5] >= nobs:
+            mavg = s[6]
+        elif s[2] == 0 and mavg < 0:
+            mavg = 0.0
+        elif s[2] == nobs and mavg > 0:
+            mavg = 0.0
+
+        # std(ddof=0)
+        var_nobs = s[7]
+        if var_nobs == 1 or s[12] >= var_nobs:
+            var = 0.0
+        else:
+            var = s[9] / var_nobs
+        std = math.sqrt(var) if var >= 0 else 0.0
+
+        return (
+            mavg + self.window_dev * std,
+            mavg,
+            mavg - self.window_dev * std,
+        )
+
+    def update(self, close):
+        """Добавляет закрытую свечу, возвращает (high, mid, low)"""
+        evicted = self._buffer.push(close)
+        self._state = self._step(self._state, close, evicted)
+        return self._value(self._state)
+
+    def peek(self, close):
+        """Полосы для незакрытой свечи без изменения состояния"""
+        return self._value(self._step(self._state, close, self._buffer.oldest()))
+
+
+class StreamingMACD:
+    """
+    Потоковый MACD: EMA с adjust=False и прогревом min_periods,
+    как ta.trend.MACD. Сигнальная линия считается по значениям MACD
+    начиная с первого прогретого.
+    """
+
+    __slots__ = ("window_fast", "window_slow", "window_sign", "_state")
+
+    def __init__(self, window_fast=12, window_slow=26, window_sign=9):
+        self.window_fast = window_fast
+        self.window_slow = window_slow
+        self.window_sign = window_sign
+        self._state = None
+
+    def reset(self):
+        self._state = None
+
+    def update(self, close):
+        """Добавляет закрытую свечу, возвращает (macd, signal); NaN до прогрева"""
+        if self._state is None:
+            # [fast, slow, signal, nobs, signal_nobs]
+            self._state = [close, close, None, 1, 0]
+        else:
+            s = self._state
+            s[0] += 2 / (self.window_fast + 1) * (close - s[0])
+            s[1] += 2 / (self.window_slow + 1) * (close - s[1])
+            s[3] += 1
+        s = self._state
+        if s[3] < max(self.window_fast, self.window_slow):
+            return NAN, NAN
+
+        macd = s[0] - s[1]
+        if s[2] is None:
+            s[2] = macd
+        else:
+            s[2] += 2 / (self.window_sign + 1) * (macd - s[2])
+        s[4] += 1
+        return macd, s[2] if s[4] >= self.window_sign else NAN
+
+
+class IndicatorEngine:
+    """
+    Потоковый расчет индикаторов для generate_signal.
+    Засевается один раз историей закрытых свечей,
+    затем обновляется по одной закрытой свече за O(1).
+    Последняя (формирующаяся) свеча считается через peek и состояние не меняет.
+    """
+
+    def __init__(self, rsi_window=13, bb_window=19, bb_dev=2):
+        self.rsi = WilderRSI(window=rsi_window)
+        self.bollinger = RollingBollinger(window=bb_window, window_dev=bb_dev)
+        self.macd = StreamingMACD()
+        self._vol_alpha = 1 / bb_window
+        self.reset()
+
+    def reset(self):
+        self.rsi.reset()
+        self.bollinger.reset()
+        self.macd.reset()
+        self.last_key = None
+        self.latest = None  # индикаторы последней закрытой свечи
+        self._prev_close = None
+        self._return = NAN
+        self._return_var = None
+        self._close_diff = NAN
+        self._macd = (NAN, NAN)
+
+    def _update_returns(self, close):
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            return
+        self._close_diff = close - prev_close
+        self._return = close / prev_close - 1
+        square = self._return * self._return
+        if self._return_var is None:
+            self._return_var = square
+        else:
+            self._return_var += self._vol_alpha * (square - self._return_var)
+
+    def update(self, close, key=None):
+        """Добавляет закрытую свечу и возвращает значения индикаторов"""
+        close = float(close)
+        rsi = self.rsi.update(close)
+        high, mid, low = self.bollinger.update(close)
+        self._macd = self.macd.update(close)
+        self._update_returns(close)
+        self.last_key = key
+        self.latest = self._as_dict(close, rsi, high, mid, low)
+        return self.latest
+
+    def features(self):
+        """
+        Вектор признаков FEATURES по последней закрытой свече, за O(1) из состояния.
+        До прогрева индикаторов содержит NaN.
+        """
+        latest = self.latest
+        if latest is None:
+            return (NAN,) * len(FEATURES)
+        close = latest["close"]
+        high = latest["Bollinger_High"]
+        low = latest["Bollinger_Low"]
+        mid = latest["Bollinger_Mid"]
+        band = high - low
+        position = (close - low) / band if band else 0.5
+        volatility = (
+            math.sqrt(self._return_var) if self._return_var is not None else NAN
+        )
+        return (
+            latest["RSI"] / 100,
+            position,
+            band / mid if mid else NAN,
+            close / mid - 1 if mid else NAN,
+            self._return,
+            volatility,
+        )
+
+    def model_features(self):
+        """
+        Вектор MODEL_FEATURES: FEATURES и признаки старой схемы LEGACY_FEATURES.
+        TradingModel выбирает из него столбцы своей схемы.
+        """
+        if self.latest is None:
+            return (NAN,) * len(MODEL_FEATURES)
+        macd, signal = self._macd
+        return self.features() + (
+            self.latest["close"],
+            macd,
+            signal,
+            macd - signal,
+            self._close_diff,
+        )
+
+    def peek(self, close):
+        """Значения индикаторов для незакрытой свечи"""
+        close = float(close)
+        rsi = self.rsi.peek(close)
+        high, mid, low = self.bollinger.peek(close)
+        return self._as_dict(close, rsi, high, mid, low)
+
+    def seed(self, closes, keys=None):
+        """Заново засевает состояние историей закрытых свечей"""
+        self.reset()
+        if keys is None:
+            keys = range(len(closes))
+        for key, close in zip(keys, closes):
+            self.update(close, key)
+
+    def sync(self, keys, closes):
+        """
+        Синхронизирует состояние со свежей выборкой свечей.
+        :param keys: Отсортированные по возрастанию ключи свечей (startTime)
+        :param closes: Цены закрытия, последняя свеча считается незакрытой
+        :return: dict со значениями индикаторов для последней свечи
+        """
+        if not len(closes):
+            return None
+        closed = len(keys) - 1
+
+        start = None
+        if self.last_key is not None:
+            pos = bisect_right(keys, self.last_key, 0, closed)
+            if pos and keys[pos - 1] == self.last_key:
+                start = pos
+        if start is None:
+            # Первый вызов или разрыв в истории - засеваем заново
+            self.seed(closes[:closed], keys[:closed])
+        else:
+            for i in range(start, closed):
+                self.update(closes[i], keys[i])
+
+        return self.peek(closes[closed])
+
+    @staticmethod
+    def _as_dict(close, rsi, high, mid, low):
+        return {
+            "close": close,
+            "RSI": rsi,
+            "Bollinger_High": high,
+            "Bollinger_Low": low,
+            "Bollinger_Mid": mid,
+        }
@@ -0,0 +1,168 @@
+import decimal
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from . import setup_logger
+from .logger import BASE_DIR
+
+logger = setup_logger(__name__)
+
+CACHE_PATH = os.getenv("INSTRUMENTS_CACHE", f"{BASE_DIR}/cache/instruments.json")
+CACHE_TTL = int(os.getenv("INSTRUMENTS_TTL", 24 * 60 * 60))
+
+
+def _decimals(value):
+    return abs(decimal.Decimal(value).as_tuple().exponent)
+
+
+@dataclass(frozen=True)
+class InstrumentInfo:
+    """Фильтры инструмента из get_instruments_info"""
+
+    symbol: str
+    price_decimals: int
+    qty_decimals: int
+    min_qty: float
+    max_qty: float
+    qty_step: float
+    tick_size: float
+    min_notional: float
+
+    @classmethod
+    def from_api(cls, item):
+        lot = item.get("lotSizeFilter", {})
+        price = item.get("priceFilter", {})
+        min_qty = lot.get("minOrderQty", "0.0")
+        return cls(
+            symbol=item["symbol"],
+            price_decimals=int(item.get("priceScale", "4")),
+            qty_decimals=_decimals(min_qty),
+            min_qty=float(min_qty),
+            max_qty=float(lot.get("maxOrderQty", "0")),
+            qty_step=float(lot.get("qtyStep", min_qty)),
+            tick_size=float(price.get("tickSize", "0")),
+            min_notional=float(lot.get("minNotionalValue", "0")),
+        )
+
+
+class InstrumentRegistry:
+    """
+    Кэш фильтров всех инструментов категории.
+    Загружается одним постраничным запросом get_instruments_info,
+    хранится в памяти (общий для всех ботов процесса) и в файле с TTL,
+    поэтому при теплом кэше старт не делает ни одного запроса.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.requests = 0
+        self._categories = {}  # category -> (saved_at, {symbol: InstrumentInfo})
+        self._raw = {}  # category -> {"saved_at": ..., "items": {symbol: item}}
+        self._misses = {}  # (category, symbol) -> время, когда символа не оказалось
+        self._lock = threading.Lock()
+        self._disk_loaded = False
+
+    def _fresh(self, saved_at):
+        return time.time() - saved_at < self.ttl
+
+    def _load_disk(self):
+        self._disk_loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load instruments cache {self.path}: {e}")
+            return
+        for category, entry in self._raw.items():
+            self._categories[category] = (
+                entry["saved_at"],
+                {s: InstrumentInfo.from_api(i) for s, i in entry["items"].items()},
+            )
+
+    def _save_disk(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._raw, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save instruments cache {self.path}: {e}")
+
+    def _fetch(self, client, category):
+        """Все инструменты категории, с пагинацией по nextPageCursor"""
+        items = {}
+        cursor = None
+        while True:
+            args = dict(category=category, limit=1000)
+            if cursor:
+                args["cursor"] = cursor
+            self.requests += 1
+            response = client.get_instruments_info(**args)
+            if response.get("retCode") != 0:
+                raise RuntimeError(
+                    f"Failed to load {category} instruments: {response.get('retMsg')}"
+                )
+            result = response.get("result", {})
+            for item in result.get("list", []):
+                items[item["symbol"]] = item
+            cursor = result.get("nextPageCursor")
+            if not cursor:
+                return items
+
+    def refresh(self, client, category="linear"):
+        """
+        Перезагружает категорию с биржи и сохраняет на диск.
+        При ошибке биржи кэш не меняется, ошибка пробрасывается.
+        """
+        items = self._fetch(client, category)
+        saved_at = time.time()
+        self._raw[category] = {"saved_at": saved_at, "items": items}
+        self._categories[category] = (
+            saved_at,
+            {s: InstrumentInfo.from_api(i) for s, i in items.items()},
+        )
+        self._save_disk()
+        logger.info(f"Loaded {len(items)} {category} instruments.")
+
+    def get(self, symbol, category="linear", client=None):
+        """
+        Фильтры символа из памяти; при пустом или устаревшем кэше,
+        а также для неизвестного символа категория перезагружается с биржи.
+        Символ, которого нет и после перезагрузки, запоминается на ttl:
+        повторные запросы его фильтров не перезагружают категорию.
+        Если биржа вернула ошибку, используется прежний (устаревший) кэш.
+        """
+        key = (category, symbol)
+        with self._lock:
+            if not self._disk_loaded:
+                self._load_disk()
+
+            saved_at, items = self._categories.get(category, (0, {}))
+            missed = key in self._misses and self._fresh(self._misses[key])
+            stale = not self._fresh(saved_at)
+            if client and (stale or (symbol not in items and not missed)):
+                try:
+                    self.refresh(client, category)
+                    saved_at, items = self._categories[category]
+                    if symbol not in items:
+                        self._misses[key] = time.time()
+                except Exception as e:
+                    logger.error(f"Failed to refresh {category} instruments: {e}")
+
+            info = items.get(symbol)
+            if info is None:
+                raise KeyError(f"Unknown {category} instrument: {symbol}")
+            return info
+
+
+# Общий реестр для всех ботов процесса
+registry = InstrumentRegistry()
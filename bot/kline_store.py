@@ -0,0 +1,250 @@
+import json
+import os
+from itertools import chain
+
+import numpy as np
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+MINUTE_MS = 60_000
+
+# Поля свечи в порядке ответа get_kline
+KLINE_FIELDS = ("start", "open", "high", "low", "close", "volume", "turnover")
+KLINE_DTYPE = np.dtype(
+    [(field, np.int64 if field == "start" else np.float64) for field in KLINE_FIELDS]
+)
+INTERVAL_MS = {"D": 1440 * MINUTE_MS, "W": 7 * 1440 * MINUTE_MS}
+
+
+def interval_to_ms(interval):
+    """
+    Длительность свечи в мс для интервала Bybit ("1", "5", "60", "D", "W").
+    Для "M" длительность непостоянна - возвращается None
+    """
+    interval = str(interval)
+    if interval.isdigit():
+        return int(interval) * MINUTE_MS
+    return INTERVAL_MS.get(interval)
+
+
+def parse_klines(klines, out=None, newest_first=False):
+    """
+    Разбирает свечи в формате get_kline в структурированный массив KLINE_DTYPE
+    одним проходом по строкам, без промежуточных списков и разворота.
+    :param klines: Список строк [startTime, open, high, low, close, volume, turnover]
+                   или уже разобранный массив KLINE_DTYPE
+    :param out: Заранее выделенный массив, результат пишется в его начало
+    :param newest_first: Строки идут от новых к старым, как в ответе Bybit
+    :return: Срез out (или нового массива) в хронологическом порядке
+    """
+    n = len(klines)
+    if out is None:
+        out = np.empty(n, dtype=KLINE_DTYPE)
+    view = out[:n]
+    if not n:
+        return view
+    if isinstance(klines, np.ndarray):
+        view[:] = klines[::-1] if newest_first else klines
+        return view
+
+    table = np.fromiter(
+        chain.from_iterable(klines), dtype=np.float64, count=n * len(KLINE_FIELDS)
+    ).reshape(n, len(KLINE_FIELDS))
+    if newest_first:
+        table = table[::-1]
+    for i, field in enumerate(KLINE_FIELDS):
+        view[field] = table[:, i]
+    return view
+
+
+class KlineSeries:
+    """
+    История свечей одного инструмента в хронологическом порядке.
+    Хранится в заранее выделенном структурированном массиве KLINE_DTYPE
+    (с запасом на maxlen свечей, сдвиг раз в maxlen добавлений),
+    view() отдает срез без копирования.
+    """
+
+    def __init__(self, maxlen=1000, rows=None, interval_ms=None):
+        self.maxlen = maxlen
+        self.interval_ms = interval_ms
+        self._buf = np.empty(2 * maxlen, dtype=KLINE_DTYPE)
+        self._lo = self._hi = 0
+        self.version = 0
+        self._cache_key = None
+        self._cache = None
+        if rows:
+            self.replace(rows)
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    @property
+    def last_start(self):
+        """startTime последней (возможно, еще не закрытой) свечи"""
+        if self._hi == self._lo:
+            return None
+        return int(self._buf["start"][self._hi - 1])
+
+    @property
+    def rows(self):
+        """Свечи списками [startTime, open, ...] - для сохранения на диск"""
+        return self.view().tolist()
+
+    def view(self, limit=None):
+        """
+        Последние limit свечей - срез внутреннего массива без копирования.
+        Срез отражает следующие обновления истории, для хранения нужен .copy()
+        """
+        lo = self._lo if limit is None else max(self._lo, self._hi - limit)
+        return self._buf[lo : self._hi]
+
+    def replace(self, klines):
+        """
+        Полностью заменяет историю.
+        :param klines: Свечи в хронологическом порядке (список строк или массив KLINE_DTYPE)
+        """
+        klines = klines[-self.maxlen :]
+        parse_klines(klines, out=self._buf)
+        self._lo, self._hi = 0, len(klines)
+        self.version += 1
+
+    def _append(self, rows):
+        count = len(rows)
+        if self._hi + count > len(self._buf):
+            # Переносим хвост в начало буфера, освобождая место
+            keep = min(len(self), self.maxlen - count)
+            self._buf[:keep] = self._buf[self._hi - keep : self._hi]
+            self._lo, self._hi = 0, keep
+        self._buf[self._hi : self._hi + count] = rows
+        self._hi += count
+        self._lo = max(self._lo, self._hi - self.maxlen)
+
+    def upsert(self, row):
+        """
+        Записывает одну свечу за O(1): свеча с last_start заменяется на месте,
+        более новая добавляется в конец.
+        :param row: Кортеж (start, open, high, low, close, volume, turnover)
+        """
+        if self._hi > self._lo and self._buf["start"][self._hi - 1] == row[0]:
+            self._buf[self._hi - 1] = row
+        else:
+            self._append(np.array([row], dtype=KLINE_DTYPE))
+        self.version += 1
+
+    def merge(self, klines):
+        """
+        Досливает свежие свечи к истории.
+        Последняя сохраненная свеча (она могла еще формироваться) заменяется на месте.
+        :param klines: Свечи в хронологическом порядке (список строк или массив KLINE_DTYPE),
+                       начиная с last_start или следующей за ней свечи
+        :return: (ok, appended) - ok=False если между историей и ответом есть разрыв,
+                 appended - количество новых свечей
+        """
+        if not len(klines):
+            return True, 0
+        last_start = self.last_start
+        if last_start is None:
+            self.replace(klines)
+            return True, len(klines)
+
+        rows = parse_klines(klines)
+        if rows["start"][0] > last_start + (self.interval_ms or 0):
+            # Пропущены свечи между историей и ответом
+            return False, 0
+
+        rows = rows[rows["start"] >= last_start]
+        changed = False
+        if len(rows) and rows["start"][0] == last_start:
+            if self._buf[self._hi - 1] != rows[0]:
+                self._buf[self._hi - 1] = rows[0]
+                changed = True
+            rows = rows[1:]
+
+        if len(rows) > self.maxlen:
+            self.replace(rows)
+            return True, len(rows)
+        if len(rows):
+            self._append(rows)
+            changed = True
+
+        if changed:
+            self.version += 1
+        return True, len(rows)
+
+    def closes(self, limit=None):
+        """
+        Серия цен закрытия последних limit свечей, индекс - startTime.
+        Пока история не менялась, возвращается один и тот же объект.
+        """
+        key = (self.version, limit)
+        if self._cache_key != key:
+            import pandas as pd  # Тяжелый импорт - только для pandas-потребителей
+
+            data = self.view(limit)
+            self._cache = pd.Series(data["close"], index=data["start"])
+            self._cache_key = key
+        return self._cache
+
+
+class KlineStore:
+    """
+    Локальный кэш свечей по ключу (symbol, interval, category).
+    Позволяет запрашивать у биржи только свечи новее последней сохраненной.
+    При заданном cache_dir история переживает перезапуск бота.
+    """
+
+    def __init__(self, cache_dir=None, maxlen=1000):
+        self.cache_dir = cache_dir
+        self.maxlen = maxlen
+        self._series = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, symbol, interval, category):
+        key = (symbol, str(interval), category)
+        series = self._series.get(key)
+        if series is None:
+            series = KlineSeries(
+                maxlen=self.maxlen,
+                rows=self._load(key),
+                interval_ms=interval_to_ms(interval),
+            )
+            self._series[key] = series
+        return series
+
+    def _path(self, key):
+        symbol, interval, category = key
+        return os.path.join(self.cache_dir, f"{category}_{symbol}_{interval}.json")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["rows"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load kline cache {path}: {e}")
+            return None
+
+    def save(self, symbol, interval, category):
+        """Сохраняет историю на диск (если задан cache_dir)"""
+        if not self.cache_dir:
+            return
+        key = (symbol, str(interval), category)
+        series = self._series.get(key)
+        if series is None:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"rows": series.rows}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to save kline cache {path}: {e}")
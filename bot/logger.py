@@ -1,39 +1,175 @@
+import atexit
+import json
 import logging
 
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Настройки из окружения, перечитываются при запуске писателя (см. _load_config)
+LOG_DIR = None
+LOG_LEVEL = None
+LOG_MAX_BYTES = None
+LOG_BACKUP_COUNT = None
+LOG_ROTATE_WHEN = None
+LOG_JSON = False
+
+_queue = queue.SimpleQueue()
+_listener = None
+_lock = threading.Lock()
+_loggers = set()  # имена логгеров, настроенных через setup_logger
+
+
+def _load_config():
+    """
+    Читает настройки логов из окружения при запуске писателя, а не при
+    импорте: переменные из .env, загруженного после import bot, тоже действуют.
+    """
+    global LOG_DIR, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN, LOG_JSON
+    LOG_DIR = os.getenv("LOG_DIR", f"{BASE_DIR}/logs")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "ERROR")
+    # Ротация по размеру (по умолчанию 50 МБ x 10) или по времени, если задан LOG_ROTATE_WHEN
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 50 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 10))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")  # например, "midnight"
+    LOG_JSON = os.getenv("LOG_JSON") == "1"
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _formatter():
+    if LOG_JSON:
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+
+
+def _log_filename(module_name):
+    return os.path.splitext(os.path.basename(module_name))[0]
+
+
+class _FileRouter(logging.Handler):
+    """
+    Раскладывает записи по файлам модулей (bot.api -> bot.log, __main__ -> __main__.log).
+    Работает только в потоке QueueListener.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._handlers = {}
+
+    def _handler(self, filename):
+        handler = self._handlers.get(filename)
+        if handler is None:
+            path = f"{LOG_DIR}/{filename}.log"
+            if LOG_ROTATE_WHEN:
+                handler = TimedRotatingFileHandler(
+                    path,
+                    when=LOG_ROTATE_WHEN,
+                    backupCount=LOG_BACKUP_COUNT,
+                    encoding="utf-8",
+                )
+            else:
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=LOG_MAX_BYTES,
+                    backupCount=LOG_BACKUP_COUNT,
+                    encoding="utf-8",  # Добавляем поддержку UTF-8
+                )
+            handler.setFormatter(_formatter())
+            self._handlers[filename] = handler
+        return handler
+
+    def emit(self, record):
+        self._handler(_log_filename(record.name)).handle(record)
+
+    def flush(self):
+        for handler in self._handlers.values():
+            handler.flush()
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+def _start_listener():
+    """Один фоновый писатель логов на процесс"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        _load_config()
+        os.makedirs(LOG_DIR, exist_ok=True)
+        # Уровень из окружения и для логгеров, созданных до запуска писателя
+        for name in _loggers:
+            logging.getLogger(name).setLevel(LOG_LEVEL)
+
+        # Добавляем обработчик для вывода в консоль
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(_formatter())
+        console_handler.setLevel(logging.INFO)  # Установите уровень лога для консоли
+
+        _listener = QueueListener(
+            _queue,
+            _FileRouter(),
+            console_handler,
+            respect_handler_level=True,
+        )
+        _listener.start()
+
+
+def shutdown_logging():
+    """
+    Дописывает все записи из очереди и закрывает файлы.
+    Вызывается при остановке бота (и автоматически при выходе из процесса).
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
 
 def setup_logger(module_name):
     logger = logging.getLogger(module_name)
-    logger.setLevel(logging.ERROR)
-    filename = os.path.splitext(os.path.basename(module_name))[0]
+    _loggers.add(module_name)
+    _start_listener()
+    logger.setLevel(LOG_LEVEL)
 
     # Проверяем, был ли уже добавлен обработчик
     if not logger.handlers:
-        # Добавляем обработчик для записи в файл
-        file_handler = RotatingFileHandler(
-            f"{BASE_DIR}/logs/{filename}.log",
-            maxBytes=100000,
-            backupCount=5,
-            encoding="utf-8",  # Добавляем поддержку UTF-8
-        )
-        formatter = logging.Formatter(
-            "%(asctime)s - %(levelname)s - %(message)s",
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-
-        # Добавляем обработчик для вывода в консоль
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        console_handler.setLevel(logging.INFO)  # Установите уровень лога для консоли
-        console_handler.setStream(
-            sys.stdout
-        )  # Используем sys.stdout для поддержки UTF-8
-        logger.addHandler(console_handler)
+        # Запись на диск и в консоль идет в фоновом потоке,
+        # вызывающий поток только кладет запись в очередь
+        logger.addHandler(QueueHandler(_queue))
 
     return logger
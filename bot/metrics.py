@@ -0,0 +1,338 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+# Верхние границы корзин гистограмм, секунд
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10)
+PROFILE_INTERVAL = 0.005  # период сэмплирования профилировщика, секунд
+
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: накопительные корзины, сумма и число"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя - +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self, name, labels):
+        lines = []
+        seen = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            seen += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {seen}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Метрики горячего пути: гистограммы задержек по этапам итерации,
+    число запросов и ошибок по эндпоинтам, отклонение ритма цикла от INTERVAL.
+    Выключенные метрики ничего не записывают: stage() отдает общий
+    пустой контекст, остальные методы выходят после проверки флага.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._stages = {}
+        self._requests = collections.Counter()
+        self._errors = collections.Counter()
+        self._latency = {}
+        self._jitter = Histogram()
+        self._lock = threading.Lock()
+        self._server = None
+        self._dump_stop = threading.Event()
+        self._dump_thread = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name):
+        """Контекстный менеджер, измеряющий этап: with metrics.stage("klines"): ..."""
+        if not self.enabled:
+            return _NOOP
+        return _Stage(self, name)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def request(self, endpoint, seconds, error=False):
+        """Запрос к бирже: путь эндпоинта, длительность, ошибка ли"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._requests[endpoint] += 1
+            if error:
+                self._errors[endpoint] += 1
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+
+    def loop(self, period, interval):
+        """
+        Итерация цикла с периодом period при заданном interval.
+        Записывается отклонение |period - interval|.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._jitter.observe(abs(period - interval))
+
+    def snapshot(self):
+        """Сводка: p50/p99 по этапам и эндпоинтам (оценка по корзинам), счетчики"""
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": h.count,
+                        "p50": h.quantile(0.5),
+                        "p99": h.quantile(0.99),
+                    }
+                    for name, h in self._stages.items()
+                },
+                "requests": dict(self._requests),
+                "errors": dict(self._errors),
+                "jitter": {
+                    "count": self._jitter.count,
+                    "p50": self._jitter.quantile(0.5),
+                    "p99": self._jitter.quantile(0.99),
+                },
+            }
+
+    def render(self):
+        """Текст в формате экспозиции Prometheus"""
+        lines = ["# TYPE trading_stage_seconds histogram"]
+        with self._lock:
+            for name, histogram in sorted(self._stages.items()):
+                lines += histogram.render("trading_stage_seconds", f'stage="{name}"')
+            lines.append("# TYPE trading_requests_total counter")
+            for endpoint, count in sorted(self._requests.items()):
+                lines.append(f'trading_requests_total{{endpoint="{endpoint}"}} {count}')
+            lines.append("# TYPE trading_request_errors_total counter")
+            for endpoint, count in sorted(self._errors.items()):
+                lines.append(
+                    f'trading_request_errors_total{{endpoint="{endpoint}"}} {count}'
+                )
+            lines.append("# TYPE trading_request_seconds histogram")
+            for endpoint, histogram in sorted(self._latency.items()):
+                lines += histogram.render(
+                    "trading_request_seconds", f'endpoint="{endpoint}"'
+                )
+            lines.append("# TYPE trading_loop_jitter_seconds histogram")
+            lines += self._jitter.render("trading_loop_jitter_seconds", 'loop="main"')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._requests.clear()
+            self._errors.clear()
+            self._latency.clear()
+            self._jitter = Histogram()
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Локальный HTTP-сервер в фоновом потоке:
+        GET /metrics - метрики, /profile/start и /profile/stop - профилировщик.
+        :return: Фактический порт (для port=0)
+        """
+        if self._server is not None:
+            return self._server.server_address[1]
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        )
+        thread.start()
+        port = self._server.server_address[1]
+        logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+        return port
+
+    def _dump(self, path, interval):
+        while not self._dump_stop.wait(interval):
+            self.dump(path)
+
+    def dump(self, path):
+        """Атомарная запись метрик в файл (для node_exporter textfile и т.п.)"""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to dump metrics to {path}: {e}")
+
+    def start_dump(self, path, interval=60):
+        """Периодическая запись метрик в файл (повторный вызов ничего не делает)"""
+        if self._dump_thread is not None:
+            return
+        self._dump_stop.clear()
+        self._dump_thread = threading.Thread(
+            target=self._dump, args=(path, interval), name="metrics-dump", daemon=True
+        )
+        self._dump_thread.start()
+
+    def stop(self):
+        self._dump_stop.set()
+        if self._dump_thread is not None:
+            self._dump_thread.join()
+            self._dump_thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик: фоновый поток раз в interval снимает стеки
+    всех потоков через sys._current_frames и считает одинаковые стеки.
+    Результат - свернутые стеки (формат flamegraph.pl / speedscope).
+    Пока не запущен, на работу бота не влияет.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """Запуск сбора (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stacks.clear()
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Остановка сбора.
+        :return: Свернутые стеки: "frame;frame;frame count" по строке на стек
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+                self._thread = None
+            return "\n".join(
+                f"{stack} {count}" for stack, count in self._stacks.most_common()
+            )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            body = metrics.render()
+        elif url.path == "/profile/start":
+            interval = parse_qs(url.query).get("interval")
+            if interval:
+                profiler.interval = float(interval[0])
+            profiler.start()
+            body = "profiler started\n"
+        elif url.path == "/profile/stop":
+            body = profiler.stop() + "\n"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics http: {format % args}")
+
+
+# Общие метрики и профилировщик процесса
+metrics = Metrics(enabled=os.getenv("METRICS") == "1")
+profiler = SamplingProfiler()
@@ -0,0 +1,151 @@
+import os
+import threading
+
+import numpy as np
+
+from . import setup_logger
+from .indicators import FEATURES, LEGACY_FEATURES, MODEL_FEATURES
+from .logger import BASE_DIR
+
+logger = setup_logger(__name__)
+
+MODEL_PATH = os.getenv(
+    "MODEL_PATH", os.path.join(os.path.dirname(BASE_DIR), "trading_model.pkl")
+)
+
+
+class TradingModel:
+    """
+    Классификатор-фильтр сигналов (по умолчанию RandomForest из trading_model.pkl).
+    Артефакт - dict с model, scaler и, опционально, features (схема признаков).
+    Артефакт без features на 5 признаков читается по старой схеме LEGACY_FEATURES.
+    Модель загружается при первом предсказании, а не при импорте;
+    неудачная загрузка запоминается и не повторяется на каждом предсказании.
+    Предсказания кэшируются по символу и ключу закрытой свечи:
+    пока свеча не закрылась, модель повторно не вызывается.
+    """
+
+    def __init__(self, model_path=MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+        self.scaler = None
+        self.features = FEATURES
+        self.calls = 0
+        self.load_error = None
+        self._columns = None
+        self._cache = {}  # symbol -> (key, prediction)
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.model is not None and self.scaler is not None
+
+    def load_model(self):
+        """
+        Загружает артефакт модели.
+        :raises FileNotFoundError: Файла модели нет
+        :raises ValueError: Модель ждет другое число признаков, чем дает схема
+        """
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"Model file not found: {self.model_path}")
+
+        import joblib  # Тяжелый импорт - только при загрузке модели
+
+        artifact = joblib.load(self.model_path)
+        model = artifact["model"]
+        features = artifact.get("features")
+        if not features:
+            legacy = getattr(model, "n_features_in_", None) == len(LEGACY_FEATURES)
+            features = LEGACY_FEATURES if legacy else FEATURES
+        features = tuple(features)
+        unknown = set(features) - set(MODEL_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown model features: {sorted(unknown)}")
+
+        expected = getattr(model, "n_features_in_", len(features))
+        if expected != len(features):
+            raise ValueError(
+                f"Model expects {expected} features, schema has {len(features)}"
+            )
+
+        self.model = model
+        self.scaler = artifact["scaler"]
+        self.features = features
+        self._columns = [MODEL_FEATURES.index(name) for name in features]
+        self.load_error = None
+        self._cache.clear()
+        logger.info(f"Model loaded from {self.model_path}: {features}")
+
+    def ensure_loaded(self):
+        """
+        Ленивая загрузка, безопасна при вызове из нескольких потоков.
+        :return: True, если модель загружена. Ошибка загрузки логируется один раз,
+            дальше модель считается недоступной без повторного чтения файла.
+        """
+        if self.loaded:
+            return True
+        with self._lock:
+            if not self.loaded and self.load_error is None:
+                try:
+                    self.load_model()
+                except Exception as e:
+                    self.load_error = e
+                    logger.error(f"Model is unavailable: {e}")
+        return self.loaded
+
+    def predict(self, X):
+        """
+        Предсказание для матрицы признаков.
+        :raises ValueError: Модель или scaler не загружены
+        """
+        if not self.loaded:
+            raise ValueError("Model or scaler is not loaded or trained.")
+        self.calls += 1
+        return self.model.predict(self.scaler.transform(X))
+
+    def cached(self, symbol, key):
+        """Предсказание для закрытой свечи key, если оно уже есть"""
+        entry = self._cache.get(symbol)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        return None
+
+    def predict_batch(self, items):
+        """
+        Предсказания для многих символов одним вызовом модели.
+        :param items: Список (symbol, key закрытой свечи, вектор MODEL_FEATURES).
+            Модели на схеме из FEATURES достаточно его начала - вектора FEATURES
+        :return: dict symbol -> 0/1, None для символов с непрогретыми признаками
+            и для всех символов, если модель недоступна
+        :raises ValueError: Вектор короче, чем нужно схеме модели
+        """
+        if not self.ensure_loaded():
+            return {symbol: None for symbol, _, _ in items}
+        result = {}
+        stale = []
+        for symbol, key, features in items:
+            entry = self._cache.get(symbol)
+            if entry is not None and entry[0] == key:
+                result[symbol] = entry[1]
+            else:
+                stale.append((symbol, key, features))
+
+        if stale:
+            X = np.array([features for _, _, features in stale], dtype=np.float64)
+            width = max(self._columns) + 1
+            if X.shape[1] < width:
+                raise ValueError(
+                    f"Model features {self.features} need {width} input columns "
+                    f"(MODEL_FEATURES), got {X.shape[1]}"
+                )
+            if self._columns != list(range(X.shape[1])):
+                X = X[:, self._columns]
+            ready = ~np.isnan(X).any(axis=1)
+            predictions = np.full(len(stale), -1)
+            if ready.any():
+                predictions[ready] = self.predict(X[ready])
+            for (symbol, key, _), prediction in zip(stale, predictions):
+                value = int(prediction) if prediction >= 0 else None
+                self._cache[symbol] = (key, value)
+                result[symbol] = value
+        return result
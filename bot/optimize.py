@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import math
+import os
+import random
+import shutil
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .backtest import (
+    Backtester,
+    compute_bollinger,
+    compute_rsi,
+    generate_signals,
+    load_klines,
+)
+
+PARAMS = ("rsi_window", "bb_window", "bb_dev", "rsi_buy", "rsi_sell")
+METRICS = ("trades", "pnl", "win_rate", "max_drawdown")
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+# Состояние процесса-воркера: массивы цен открыты через memmap, а не переданы pickle
+_worker = {}
+
+
+def _init_worker(data_dir, backtest_kwargs):
+    _worker["data"] = {
+        column: np.load(os.path.join(data_dir, f"{column}.npy"), mmap_mode="r")
+        for column in PRICE_COLUMNS
+    }
+    _worker["backtest_kwargs"] = backtest_kwargs
+    _rsi.cache_clear()
+    _bollinger.cache_clear()
+
+
+@lru_cache(maxsize=8)
+def _rsi(window):
+    return compute_rsi(_worker["data"]["close"], window)
+
+
+@lru_cache(maxsize=8)
+def _bollinger(window):
+    return compute_bollinger(_worker["data"]["close"], window)
+
+
+def _evaluate_group(rsi_window, bb_window, combos):
+    """
+    Прогоняет комбинации (bb_dev, rsi_buy, rsi_sell) для одной пары окон.
+    RSI и скользящие среднее/отклонение считаются один раз на окно и
+    переиспользуются между задачами внутри воркера.
+    """
+    data = _worker["data"]
+    close = data["close"]
+    rsi = _rsi(rsi_window)
+    mid, std = _bollinger(bb_window)
+
+    rows = []
+    for bb_dev, rsi_buy, rsi_sell in combos:
+        backtester = Backtester(
+            rsi_window=rsi_window,
+            bb_window=bb_window,
+            bb_dev=bb_dev,
+            rsi_buy=rsi_buy,
+            rsi_sell=rsi_sell,
+            **_worker["backtest_kwargs"],
+        )
+        buy, sell = generate_signals(
+            close, rsi, mid + bb_dev * std, mid - bb_dev * std, rsi_buy, rsi_sell
+        )
+        result = backtester.run(data, buy=buy, sell=sell)
+        rows.append(
+            dict(
+                rsi_window=rsi_window,
+                bb_window=bb_window,
+                bb_dev=bb_dev,
+                rsi_buy=rsi_buy,
+                rsi_sell=rsi_sell,
+                **result.metrics,
+            )
+        )
+    return rows
+
+
+def parameter_grid(grid, samples=None, seed=None):
+    """
+    Все комбинации параметров или случайная выборка из них.
+    :param grid: dict параметр -> список значений
+    :param samples: Размер случайной выборки (None - полный перебор)
+    """
+    combos = list(itertools.product(*(grid[name] for name in PARAMS)))
+    if samples is not None and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return [dict(zip(PARAMS, combo)) for combo in combos]
+
+
+def split_tasks(combos, workers):
+    """
+    Задачи воркерам: комбинации группируются по паре окон
+    (rsi_window, bb_window), группы режутся на части примерно по
+    len(combos) / workers, чтобы перебор одной пары окон занял все ядра.
+    :return: Список (rsi_window, bb_window, [(bb_dev, rsi_buy, rsi_sell), ...])
+    """
+    groups = defaultdict(list)
+    for combo in combos:
+        key = (combo["rsi_window"], combo["bb_window"])
+        groups[key].append((combo["bb_dev"], combo["rsi_buy"], combo["rsi_sell"]))
+
+    size = max(1, math.ceil(len(combos) / max(workers, 1)))
+    # Сортировка по rsi_window повышает попадания в кэш RSI у воркера
+    return [
+        (rsi_window, bb_window, group[lo : lo + size])
+        for (rsi_window, bb_window), group in sorted(groups.items())
+        for lo in range(0, len(group), size)
+    ]
+
+
+class ParameterSweep:
+    """
+    Перебор порогов RSI/Bollinger по одной истории на всех ядрах.
+    Цены один раз сохраняются в .npy и открываются воркерами через memmap,
+    задачи сгруппированы по паре окон (rsi_window, bb_window) и
+    поделены на части по числу воркеров (см. split_tasks).
+    """
+
+    def __init__(self, data, workers=None, **backtest_kwargs):
+        self.data = data
+        self.workers = workers or os.cpu_count()
+        self.backtest_kwargs = backtest_kwargs
+
+    def _dump(self, data_dir):
+        close = np.ascontiguousarray(self.data["close"], dtype=np.float64)
+        for column in PRICE_COLUMNS:
+            values = self.data.get(column, close)
+            np.save(
+                os.path.join(data_dir, f"{column}.npy"),
+                np.ascontiguousarray(values, dtype=np.float64),
+            )
+
+    def run(self, combos):
+        """
+        :param combos: Список dict с параметрами (см. parameter_grid)
+        :return: DataFrame с метриками, отсортированный по pnl
+        """
+        tasks = split_tasks(combos, self.workers)
+        data_dir = tempfile.mkdtemp(prefix="sweep_")
+        try:
+            self._dump(data_dir)
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(data_dir, self.backtest_kwargs),
+            ) as pool:
+                futures = [pool.submit(_evaluate_group, *task) for task in tasks]
+                rows = [row for future in futures for row in future.result()]
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        table = pd.DataFrame(rows, columns=[*PARAMS, *METRICS])
+        return table.sort_values(
+            ["pnl", "max_drawdown"], ascending=[False, True], ignore_index=True
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор параметров RSI/Bollinger")
+    parser.add_argument("path", help="CSV, Parquet или папка архива со свечами")
+    parser.add_argument("--rsi-window", type=int, nargs="+", default=[9, 13, 17, 21])
+    parser.add_argument("--bb-window", type=int, nargs="+", default=[15, 19, 25, 30])
+    parser.add_argument("--bb-dev", type=float, nargs="+", default=[1.5, 2, 2.5, 3])
+    parser.add_argument("--rsi-buy", type=float, nargs="+", default=[20, 25, 30, 35])
+    parser.add_argument("--rsi-sell", type=float, nargs="+", default=[65, 70, 75, 80])
+    parser.add_argument("--samples", type=int, default=None, help="Случайный поиск")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--qty-decimals", type=int, default=3)
+    parser.add_argument(
+        "--trailing-stop", type=float, default=os.getenv("TRAILING_PERCENT")
+    )
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    grid = {
+        "rsi_window": args.rsi_window,
+        "bb_window": args.bb_window,
+        "bb_dev": args.bb_dev,
+        "rsi_buy": args.rsi_buy,
+        "rsi_sell": args.rsi_sell,
+    }
+    sweep = ParameterSweep(
+        load_klines(args.path),
+        workers=args.workers,
+        qty_decimals=args.qty_decimals,
+        trailing_stop=args.trailing_stop,
+    )
+    table = sweep.run(parameter_grid(grid, samples=args.samples, seed=args.seed))
+    table.to_csv(args.out, index=False)
+    print(table.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import json
+import os
+import threading
+import time
+
+from . import setup_logger
+from .logger import BASE_DIR
+
+logger = setup_logger(__name__)
+
+BOOK_PATH = os.getenv("ORDER_BOOK_PATH", f"{BASE_DIR}/cache/orders.json")
+HISTORY_PAGE = 50  # максимум get_order_history за запрос
+# Сколько секунд хранить ордера в конечном статусе. По умолчанию - без удаления:
+# книга хранит историю и за пределами 7-дневного окна истории Bybit
+RETENTION = int(os.getenv("ORDER_RETENTION", 0)) or None
+FINAL_STATUSES = frozenset(
+    ("Filled", "Cancelled", "Rejected", "Deactivated", "PartiallyFilledCanceled")
+)
+
+
+def _updated(record):
+    return int(record.get("updatedTime") or record.get("createdTime") or 0)
+
+
+class OrderBook:
+    """
+    Локальное состояние ордеров и позиций.
+    Ордера индексированы по orderId и orderLinkId, позиции - по символу,
+    поиск не ходит в сеть. Пополняется ответами place_order, сообщениями
+    приватных потоков order / execution / position и периодической сверкой
+    с get_order_history (с пагинацией по cursor).
+    Ордера в конечном статусе старше retention (если задан) удаляются. На диске книга
+    хранится журналом JSON строк: save дописывает только изменения
+    и переписывает файл целиком, когда журнал сильно длиннее книги.
+    """
+
+    def __init__(self, path=BOOK_PATH, retention=RETENTION):
+        self.path = path
+        self.retention = retention
+        self.requests = 0
+        self._orders = {}  # orderId -> ордер
+        self._links = {}  # orderLinkId -> orderId
+        self._positions = {}  # (symbol, positionIdx) -> позиция
+        # Изменения с последней записи на диск
+        self._changed_orders = set()
+        self._changed_positions = set()
+        self._dropped = set()
+        self._lines = None  # строк в журнале, None - файл нужно переписать
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        lines = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        # Снимок старого формата переписывается журналом при записи
+                        if not self._replay(json.loads(line)):
+                            lines = None
+                        elif lines is not None:
+                            lines += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load order book {self.path}: {e}")
+            lines = None
+        self._changed_orders.clear()
+        self._changed_positions.clear()
+        self._dropped.clear()
+        self._lines = lines
+
+    def _replay(self, record):
+        """
+        Строка журнала: order, position или drop.
+        :return: False для снимка старого формата {"orders": [...], "positions": [...]}
+        """
+        if "order" in record:
+            self._put_order(record["order"])
+        elif "position" in record:
+            self._put_position(record["position"])
+        elif "drop" in record:
+            self._drop(record["drop"])
+        else:
+            for order in record.get("orders", []):
+                self._put_order(order)
+            for position in record.get("positions", []):
+                self._put_position(position)
+            return False
+        return True
+
+    def _expired(self, order, now_ms):
+        return (
+            self.retention is not None
+            and order.get("orderStatus") in FINAL_STATUSES
+            and _updated(order) < now_ms - self.retention * 1000
+        )
+
+    def prune(self, now_ms=None):
+        """
+        Удаляет ордера в конечном статусе, обновленные раньше retention секунд назад.
+        :return: Число удаленных ордеров
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        with self._lock:
+            self._ensure_loaded()
+            expired = [i for i, order in self._orders.items() if self._expired(order, now_ms)]
+            for order_id in expired:
+                self._drop(order_id)
+            return len(expired)
+
+    def _drop(self, order_id):
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        if self._links.get(order.get("orderLinkId")) == order_id:
+            del self._links[order["orderLinkId"]]
+        self._changed_orders.discard(order_id)
+        self._dropped.add(order_id)
+
+    def save(self):
+        """
+        Записывает изменения с прошлой записи в конец журнала; если журнал
+        длиннее книги вдвое, атомарно переписывает его снимком книги
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                self._ensure_loaded()
+                self.prune()
+                changes = (
+                    [{"order": self._orders[i]} for i in self._changed_orders]
+                    + [{"position": self._positions[k]} for k in self._changed_positions]
+                    + [{"drop": i} for i in self._dropped]
+                )
+                self._changed_orders.clear()
+                self._changed_positions.clear()
+                self._dropped.clear()
+                live = len(self._orders) + len(self._positions)
+                rewrite = self._lines is None or self._lines + len(changes) > 2 * live + 100
+                if rewrite:
+                    changes = [{"order": order} for order in self._orders.values()] + [
+                        {"position": position} for position in self._positions.values()
+                    ]
+                elif not changes:
+                    return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                payload = "".join(json.dumps(record) + "\n" for record in changes)
+                if rewrite:
+                    tmp_path = f"{self.path}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(payload)
+                    os.replace(tmp_path, self.path)
+                    self._lines = len(changes)
+                else:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload)
+                    self._lines += len(changes)
+            except OSError as e:
+                # Изменения не записаны: в следующий раз файл переписывается целиком
+                self._lines = None
+                logger.error(f"Failed to save order book {self.path}: {e}")
+
+    def _put_order(self, order):
+        order_id = order.get("orderId")
+        if not order_id:
+            return
+        current = self._orders.get(order_id)
+        if current is not None:
+            # Конечный статус не сменяется активным, а активный конечным - всегда:
+            # время ордера из ответа place_order локальное и может обгонять биржу
+            status = order.get("orderStatus")
+            finished = current.get("orderStatus") in FINAL_STATUSES
+            if finished and status is not None and status not in FINAL_STATUSES:
+                return  # устаревшее обновление
+            closing = status in FINAL_STATUSES and not finished
+            if not closing and _updated(order) < _updated(current):
+                return  # устаревшее обновление
+            order = {**current, **order}
+            if order == current:
+                return
+        elif self._expired(order, int(time.time() * 1000)):
+            return  # старый закрытый ордер из истории биржи
+        self._orders[order_id] = order
+        self._changed_orders.add(order_id)
+        self._dropped.discard(order_id)
+        if order.get("orderLinkId"):
+            self._links[order["orderLinkId"]] = order_id
+
+    def _put_position(self, position):
+        key = (position.get("symbol"), int(position.get("positionIdx") or 0))
+        current = self._positions.get(key)
+        if current is not None:
+            if _updated(position) < _updated(current):
+                return
+            position = {**current, **position}
+            if position == current:
+                return
+        self._positions[key] = position
+        self._changed_positions.add(key)
+
+    def apply_order(self, order):
+        """Ордер из ответа place_order, потока order или истории ордеров"""
+        with self._lock:
+            self._ensure_loaded()
+            self._put_order(order)
+
+    def apply_execution(self, execution):
+        """Исполнение из потока execution: накапливает исполненное количество"""
+        with self._lock:
+            self._ensure_loaded()
+            order = self._orders.get(execution.get("orderId"))
+            if order is None:
+                self._put_order(
+                    {
+                        "orderId": execution.get("orderId"),
+                        "orderLinkId": execution.get("orderLinkId"),
+                        "symbol": execution.get("symbol"),
+                        "side": execution.get("side"),
+                        "cumExecQty": execution.get("execQty", "0"),
+                    }
+                )
+                return
+            executed = float(order.get("cumExecQty") or 0) + float(
+                execution.get("execQty") or 0
+            )
+            order["cumExecQty"] = str(executed)
+            if execution.get("leavesQty") == "0":
+                order["orderStatus"] = "Filled"
+            self._changed_orders.add(order["orderId"])
+
+    def apply_position(self, position):
+        """Позиция из get_positions или потока position"""
+        with self._lock:
+            self._ensure_loaded()
+            self._put_position(position)
+
+    def handle_message(self, message):
+        """
+        Обработчик приватного потока Bybit (topic order, execution, position),
+        например callback для pybit WebSocket(channel_type="private")
+        """
+        topic = message.get("topic", "")
+        handlers = {
+            "order": self.apply_order,
+            "execution": self.apply_execution,
+            "position": self.apply_position,
+        }
+        handler = handlers.get(topic.split(".")[0])
+        if handler is None:
+            return
+        for item in message.get("data", []):
+            handler(item)
+
+    def get(self, order_id=None, link_id=None):
+        """Ордер по orderId или orderLinkId, None если неизвестен"""
+        with self._lock:
+            self._ensure_loaded()
+            if order_id is None:
+                order_id = self._links.get(link_id)
+            return self._orders.get(order_id)
+
+    def position(self, symbol, position_idx=0):
+        """Последнее известное состояние позиции, None если неизвестно"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._positions.get((symbol, position_idx))
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._orders)
+
+    def reconcile(self, client, category="linear", symbol=None):
+        """
+        Сверка с биржей: вся история ордеров за доступное окно
+        (страницами по nextPageCursor) и открытые позиции.
+        :return: Число полученных ордеров
+        """
+        args = dict(category=category, limit=HISTORY_PAGE)
+        if symbol:
+            args["symbol"] = symbol
+        received = 0
+        cursor = None
+        while True:
+            if cursor:
+                args["cursor"] = cursor
+            self.requests += 1
+            result = client.get_order_history(**args).get("result", {})
+            for order in result.get("list", []):
+                self.apply_order(order)
+                received += 1
+            cursor = result.get("nextPageCursor")
+            if not cursor:
+                break
+
+        position_args = dict(category=category)
+        if symbol:
+            position_args["symbol"] = symbol
+        else:
+            position_args["settleCoin"] = "USDT"
+        self.requests += 1
+        response = client.get_positions(**position_args)
+        for position in response.get("result", {}).get("list", []):
+            self.apply_position(position)
+
+        self.save()
+        return received
+
+    def _run(self, client, category, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.reconcile(client, category)
+            except Exception as e:
+                logger.error(f"Order book reconciliation failed: {e}")
+
+    def start(self, client, category="linear", interval=300):
+        """Фоновая сверка раз в interval секунд (повторный вызов ничего не делает)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(client, category, interval),
+            name="order-book",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.save()
+
+
+# Общая книга ордеров для всех ботов процесса
+book = OrderBook()
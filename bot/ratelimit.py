@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Лимиты (запросов в секунду) по группам эндпоинтов, совпадение по префиксу пути.
+# Рыночные данные ограничены по IP (600 запросов за 5 с), остальные - по UID на эндпоинт
+DEFAULT_RATE_LIMITS = {
+    "/v5/market/": 120,
+    "/v5/order/": 10,
+    "/v5/position/": 10,
+    "/v5/account/": 10,
+}
+IP_RATE_LIMIT = 120
+DEFAULT_RATE = 10
+
+# Чем меньше число, тем раньше запрос получает токен общего лимита IP
+PRIORITIES = {
+    "/v5/order/": 0,
+    "/v5/position/": 1,
+    "/v5/account/": 2,
+    "/v5/market/": 3,
+}
+LOWEST_PRIORITY = 4
+
+# Группы с одним ведром на префикс; для остальных ведро на каждый путь
+SHARED_GROUPS = ("/v5/market/",)
+# Одинаковые одновременные GET этих групп выполняются одним запросом
+COALESCED_GROUPS = ("/v5/market/",)
+
+
+def match_prefix(path, prefixes):
+    """Самый длинный префикс из prefixes, с которого начинается path"""
+    best = None
+    for prefix in prefixes:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return best
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket с приоритетами:
+    токен получает ожидающий с наименьшим приоритетом (при равенстве - пришедший раньше).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0  # monotonic, до сброса лимита на бирже
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, priority=LOWEST_PRIORITY, weight=1):
+        """
+        Блокирует до получения токена.
+        :return: Время ожидания в секундах
+        """
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = None
+                    if self._waiters[0] == ticket:
+                        delay = self.blocked_until - now
+                        if delay <= 0:
+                            if self.tokens >= weight:
+                                self.tokens -= weight
+                                return now - start
+                            delay = (weight - self.tokens) / self.rate
+                    # Не первый в очереди ждет, пока его не разбудит ушедший первый
+                    self._cond.wait(delay)
+            finally:
+                if self._waiters[0] == ticket:
+                    heapq.heappop(self._waiters)
+                else:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def calibrate(self, limit=None, remaining=None, reset_at=None):
+        """
+        Подстройка под ответ биржи (заголовки X-Bapi-Limit*).
+        :param limit: Лимит эндпоинта в секунду
+        :param remaining: Сколько запросов осталось в текущем окне
+        :param reset_at: Время сброса лимита, unix мс
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.rate = self.capacity = float(limit)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if remaining <= 0 and reset_at:
+                    self.blocked_until = now + max(reset_at / 1000 - time.time(), 0)
+            self._cond.notify_all()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _header(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    """
+    Планировщик запросов к Bybit: ведро токенов на группу эндпоинтов
+    плюс общий лимит IP, в котором ордера обслуживаются раньше рыночных данных.
+    Лимиты уточняются по заголовкам ответов, одинаковые одновременные
+    чтения рыночных данных схлопываются в один запрос.
+    """
+
+    def __init__(self, limits=None, ip_rate=IP_RATE_LIMIT, priorities=None):
+        self.limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self.priorities = dict(PRIORITIES if priorities is None else priorities)
+        self.ip_bucket = TokenBucket(ip_rate) if ip_rate else None
+        self._buckets = {}
+        self._inflight = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def group(self, path):
+        """Ключ ведра: общий префикс для рыночных данных, иначе сам путь"""
+        prefix = match_prefix(path, SHARED_GROUPS)
+        return prefix or path
+
+    def priority(self, path):
+        prefix = match_prefix(path, self.priorities)
+        return self.priorities[prefix] if prefix is not None else LOWEST_PRIORITY
+
+    def coalescable(self, path):
+        return match_prefix(path, COALESCED_GROUPS) is not None
+
+    def _bucket(self, group):
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(group)
+                if bucket is None:
+                    prefix = match_prefix(group, self.limits)
+                    rate = self.limits[prefix] if prefix is not None else DEFAULT_RATE
+                    bucket = self._buckets[group] = TokenBucket(rate)
+        return bucket
+
+    def _metric(self, group):
+        metric = self._metrics.get(group)
+        if metric is None:
+            metric = self._metrics.setdefault(
+                group,
+                {"requests": 0, "coalesced": 0, "waited": 0, "wait_total": 0.0, "wait_max": 0.0},
+            )
+        return metric
+
+    def acquire(self, path):
+        """
+        Блокирует, пока запрос не уложится в лимиты группы и IP.
+        :return: Время ожидания в очереди, секунд
+        """
+        group = self.group(path)
+        priority = self.priority(path)
+        wait = self._bucket(group).acquire(priority)
+        if self.ip_bucket is not None:
+            wait += self.ip_bucket.acquire(priority)
+
+        with self._lock:
+            metric = self._metric(group)
+            metric["requests"] += 1
+            if wait > 0.001:
+                metric["waited"] += 1
+            metric["wait_total"] += wait
+            metric["wait_max"] = max(metric["wait_max"], wait)
+        return wait
+
+    def update(self, path, headers):
+        """Калибровка ведра группы по X-Bapi-Limit, -Status, -Reset-Timestamp"""
+        remaining = _header(headers, "X-Bapi-Limit-Status")
+        if remaining is None:
+            return
+        self._bucket(self.group(path)).calibrate(
+            limit=_header(headers, "X-Bapi-Limit"),
+            remaining=remaining,
+            reset_at=_header(headers, "X-Bapi-Limit-Reset-Timestamp"),
+        )
+
+    def coalesce(self, key, path, send):
+        """
+        Выполняет send() или дожидается результата такого же запроса в полете.
+        :return: (результат, True если он получен чужим запросом)
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+
+        if leader:
+            try:
+                call.result = send()
+                return call.result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.done.set()
+
+        call.done.wait()
+        with self._lock:
+            self._metric(self.group(path))["coalesced"] += 1
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def stats(self):
+        """
+        Метрики по группам: число запросов, схлопнутых чтений,
+        запросов, ждавших в очереди, и время ожидания (среднее и максимум, сек)
+        """
+        with self._lock:
+            result = {}
+            for group, metric in self._metrics.items():
+                stats = dict(metric)
+                stats["wait_avg"] = (
+                    metric["wait_total"] / metric["requests"] if metric["requests"] else 0.0
+                )
+                result[group] = stats
+            return result
@@ -0,0 +1,218 @@
+"""
+Свечи старших интервалов (5, 15, 60 минут, 4 часа...) из одного потока
+базовых свечей (обычно минутных) без отдельных запросов get_kline.
+Свеча интервала N минут начинается в start // (N * 60000) * (N * 60000)
+и собирается как на бирже: open первой базовой свечи, максимум high,
+минимум low, close последней, сумма volume и turnover.
+"""
+
+import numpy as np
+
+from .kline_store import KLINE_DTYPE, KlineSeries, interval_to_ms
+
+
+def resample(rows, interval_ms):
+    """
+    Векторная сборка свечей интервала interval_ms из базовых свечей.
+    :param rows: Базовые свечи KLINE_DTYPE в хронологическом порядке без пропусков
+    :return: Новый массив KLINE_DTYPE; первая свеча может быть неполной,
+             если rows начинаются не с начала интервала
+    """
+    if not len(rows):
+        return np.empty(0, dtype=KLINE_DTYPE)
+    starts = rows["start"]
+    buckets = starts - starts % interval_ms
+    index = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[index[1:], len(rows)] - 1
+
+    out = np.empty(len(index), dtype=KLINE_DTYPE)
+    out["start"] = buckets[index]
+    out["open"] = rows["open"][index]
+    out["high"] = np.maximum.reduceat(rows["high"], index)
+    out["low"] = np.minimum.reduceat(rows["low"], index)
+    out["close"] = rows["close"][ends]
+    out["volume"] = np.add.reduceat(rows["volume"], index)
+    out["turnover"] = np.add.reduceat(rows["turnover"], index)
+    return out
+
+
+class _Frame:
+    """
+    Свечи одного старшего интервала в кольцевом KlineSeries.
+    _acc - текущая свеча, собранная только из закрытых базовых свечей:
+    незакрытая базовая свеча каждый раз накладывается на нее заново,
+    поэтому ее обновления не копятся в volume.
+    """
+
+    def __init__(self, interval_ms, maxlen):
+        self.interval_ms = interval_ms
+        self.series = KlineSeries(maxlen=maxlen, interval_ms=interval_ms)
+        self.reset()
+
+    def reset(self):
+        self.series.replace([])
+        self._acc = None
+        # Начало первой свечи, собранной из базовых (раньше - история биржи)
+        self.derived_from = None
+        self.backfilled = None
+
+    def seed(self, rows):
+        """Собирает свечи из закрытых базовых свечей, неполная первая отбрасывается"""
+        self.reset()
+        if not len(rows):
+            return
+        starts = rows["start"]
+        first = int(starts[0])
+        if first % self.interval_ms:
+            # История начинается внутри интервала - начала свечи у нас нет
+            first = first - first % self.interval_ms + self.interval_ms
+            rows = rows[np.searchsorted(starts, first, "left") :]
+        bars = resample(rows, self.interval_ms)
+        if not len(bars):
+            return
+        self.series.replace(bars)
+        self.derived_from = int(bars["start"][0])
+        self._acc = bars[-1].item()
+
+    def update(self, row, closed):
+        """O(1): накладывает базовую свечу на текущую свечу интервала"""
+        start = int(row[0])
+        bucket = start - start % self.interval_ms
+        acc = self._acc
+        if acc is None or acc[0] != bucket:
+            if start != bucket:
+                # Начало этой свечи пропущено - собираем со следующей
+                self._acc = None
+                return
+            bar = (bucket, row[1], row[2], row[3], row[4], row[5], row[6])
+            if self.derived_from is None:
+                self.derived_from = bucket
+        else:
+            bar = (
+                bucket,
+                acc[1],
+                max(acc[2], row[2]),
+                min(acc[3], row[3]),
+                row[4],
+                acc[5] + row[5],
+                acc[6] + row[6],
+            )
+        self.series.upsert(bar)
+        if closed:
+            self._acc = bar
+
+    def backfill(self, klines):
+        """Дополняет историю закрытыми свечами биржи старше derived_from"""
+        if self.derived_from is None:
+            return 0
+        klines = np.asarray(klines, dtype=KLINE_DTYPE)
+        older = klines[klines["start"] < self.derived_from]
+        derived = self.series.view()
+        derived = derived[derived["start"] >= self.derived_from]
+        self.series.replace(np.concatenate((older, derived)))
+        self.backfilled = self.derived_from
+        return len(older)
+
+
+class Resampler:
+    """
+    Инкрементальная сборка нескольких интервалов из базовых свечей:
+    O(1) на базовую свечу для каждого интервала, результаты - в кольцевых
+    буферах KlineSeries (view без копирования).
+    Интервалы, свечи которых на бирже выровнены не от эпохи ("W", "M"),
+    не поддерживаются.
+    """
+
+    def __init__(self, timeframes=("5", "15", "60", "240"), base_interval="1", maxlen=1000):
+        self.base_interval = str(base_interval)
+        self.base_ms = interval_to_ms(base_interval)
+        if self.base_ms is None or self.base_interval == "W":
+            raise ValueError(f"Unsupported base interval {base_interval}")
+        self.frames = {}
+        for interval in timeframes:
+            interval_ms = interval_to_ms(interval)
+            if interval_ms is None or str(interval) == "W" or interval_ms % self.base_ms:
+                raise ValueError(
+                    f"Interval {interval} is not a multiple of base interval {base_interval}"
+                )
+            self.frames[str(interval)] = _Frame(interval_ms, maxlen)
+        # startTime последней закрытой базовой свечи
+        self.last_key = None
+
+    def __contains__(self, interval):
+        return str(interval) in self.frames
+
+    @property
+    def base_limit(self):
+        """Сколько базовых свечей запрашивать, чтобы собрать хотя бы одну полную свечу"""
+        ratio = max((f.interval_ms // self.base_ms for f in self.frames.values()), default=1)
+        return min(2 * ratio + 1, 1000)
+
+    def reset(self):
+        self.last_key = None
+        for frame in self.frames.values():
+            frame.reset()
+
+    def seed(self, rows):
+        """Заново собирает все интервалы из закрытых базовых свечей"""
+        for frame in self.frames.values():
+            frame.seed(rows)
+        self.last_key = int(rows["start"][-1]) if len(rows) else None
+
+    def update(self, row, closed=True):
+        """
+        Базовая свеча из потока (например, kline WebSocket).
+        :param row: (start, open, high, low, close, volume, turnover)
+        :param closed: Свеча закрыта; незакрытая может приходить многократно
+        """
+        if self.last_key is not None and int(row[0]) <= self.last_key:
+            return
+        row = tuple(float(value) for value in row)
+        for frame in self.frames.values():
+            frame.update(row, closed)
+        if closed:
+            self.last_key = int(row[0])
+
+    def sync(self, rows):
+        """
+        Синхронизация со свежей выборкой базовых свечей (как IndicatorEngine.sync).
+        :param rows: Свечи KLINE_DTYPE в хронологическом порядке,
+                     последняя считается незакрытой
+        """
+        if not len(rows):
+            return
+        keys = rows["start"]
+        closed = len(rows) - 1
+
+        start = None
+        if self.last_key is not None:
+            pos = int(np.searchsorted(keys[:closed], self.last_key, "right"))
+            if pos and keys[pos - 1] == self.last_key:
+                start = pos
+        if start is None:
+            # Первый вызов или разрыв в истории - собираем заново
+            self.seed(rows[:closed])
+        else:
+            for row in rows[start:closed].tolist():
+                self.update(row, closed=True)
+        self.update(rows[closed].item(), closed=False)
+
+    def series(self, interval):
+        return self.frames[str(interval)].series
+
+    def view(self, interval, limit=None):
+        """Последние limit свечей интервала, последняя может быть незакрытой"""
+        return self.frames[str(interval)].series.view(limit)
+
+    def needs_history(self, interval):
+        """Собранные свечи есть, но история биржи до них еще не подгружена"""
+        frame = self.frames[str(interval)]
+        return frame.derived_from is not None and frame.backfilled != frame.derived_from
+
+    def backfill(self, interval, klines):
+        """
+        Подгружает более старые свечи интервала из ответа биржи.
+        :param klines: Свечи KLINE_DTYPE в хронологическом порядке
+        :return: Количество добавленных свечей
+        """
+        return self.frames[str(interval)].backfill(klines)
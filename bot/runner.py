@@ -0,0 +1,289 @@
+import asyncio
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from . import orders, setup_logger
+from .batch import OrderBatcher
+from .capital import CapitalLimit
+from .health import HealthMonitor
+from .metrics import metrics
+from .transport import Transport
+
+logger = setup_logger(__name__)
+
+
+class RateBudget:
+    """
+    Асинхронный token bucket: общий бюджет запросов к бирже
+    для всех ботов в процессе. Ожидающие обслуживаются по очереди.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, weight=1):
+        if self._lock is None:
+            # Lock создается внутри работающего event loop
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                await asyncio.sleep((weight - self._tokens) / self.rate)
+
+
+class ModelBatcher:
+    """
+    Собирает запросы предсказаний от ботов за короткое окно
+    и выполняет их одним вызовом TradingModel.predict_batch.
+    """
+
+    def __init__(self, model, window=0.002):
+        self.model = model
+        self.window = window
+        self.batches = 0
+        self._pending = []
+        self._handle = None
+
+    async def predict(self, symbol, key, features):
+        cached = self.model.cached(symbol, key)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((symbol, key, features, future))
+        if self._handle is None:
+            self._handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        pending, self._pending, self._handle = self._pending, [], None
+        self.batches += 1
+        try:
+            result = self.model.predict_batch(
+                [(symbol, key, features) for symbol, key, features, _ in pending]
+            )
+        except Exception as e:
+            logger.error(f"Model prediction failed: {e}")
+            result = {}
+        for symbol, _, _, future in pending:
+            if not future.done():
+                future.set_result(result.get(symbol))
+
+
+class AsyncRunner:
+    """
+    Запускает несколько Bot (по одному на символ) в одном event loop.
+    Блокирующие запросы pybit выполняются в общем пуле потоков,
+    расчет индикаторов и сигнала - в самом loop.
+    Боты разделяют пул HTTP-соединений, бюджет запросов и лимит капитала.
+    """
+
+    # Вес итерации в запросах: свечи и (при сигнале) тикер + позиции + трейлинг + ордер
+    TICK_WEIGHT = 1
+    TRADE_WEIGHT = 4
+
+    def __init__(
+        self,
+        bots,
+        interval=1,
+        rate_limit=100,
+        max_workers=32,
+        health=None,
+        book=None,
+        model=None,
+        batch_window=None,
+    ):
+        """
+        :param health: Общий HealthMonitor ботов, запускается вместе с runner
+        :param book: Общая OrderBook ботов, сверяется с биржей в фоне
+        :param model: TradingModel - фильтр сигналов, предсказания
+                      для всех символов собираются в общие батчи
+        :param batch_window: Окно сбора заявок ботов в один batch-запрос, секунд
+                             (None или 0 - каждая заявка отдельным запросом).
+                             Batch уходит из отдельного потока и оплачивается
+                             из бюджета запросов один раз на batch-запрос
+        """
+        self.bots = list(bots)
+        self.batcher = ModelBatcher(model) if model is not None else None
+        self.order_batcher = None
+        self._loop = None
+        self._batch_executor = None
+        if batch_window and self.bots:
+            # Свой поток для batch: потоки пула runner могут быть заняты ботами,
+            # которые ждут этот же batch
+            self._batch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="order-batch"
+            )
+            self.order_batcher = OrderBatcher(
+                self.bots[0].place_orders, batch_window, schedule=self._schedule_batch
+            )
+            for bot in self.bots:
+                bot.order_batcher = self.order_batcher
+        self.health = health
+        self.book = book
+        self.interval = interval
+        self.budget = RateBudget(rate_limit)
+        self.max_workers = max_workers
+        self.ticks = 0
+        self._stopped = False
+
+    @classmethod
+    def from_symbols(
+        cls,
+        symbols,
+        capital,
+        interval=1,
+        rate_limit=100,
+        max_workers=32,
+        bot_factory=None,
+        model=None,
+        batch_window=None,
+    ):
+        """
+        Создает ботов для списка символов с общим транспортом и капиталом.
+        :param capital: Общий лимит расходов в USDT на все символы
+        :param model: TradingModel для фильтрации сигналов всех ботов
+        :param batch_window: Окно сбора заявок в batch, по умолчанию
+                             ORDER_BATCH_WINDOW из окружения (не задано - без batch)
+        """
+        if batch_window is None:
+            batch_window = float(os.getenv("ORDER_BATCH_WINDOW", 0))
+        if bot_factory is None:
+            from .trade_logic import Bot as bot_factory
+
+        transport = Transport(
+            api_key=os.getenv("API_KEY"),
+            api_secret=os.getenv("API_SECRET"),
+            pool_size=max_workers,
+            endpoint=os.getenv("BYBIT_ENDPOINT"),
+        )
+        shared_capital = CapitalLimit(capital)
+        health = HealthMonitor(
+            transport.http, interval=int(os.getenv("HEALTH_INTERVAL", 60))
+        )
+        bots = [
+            bot_factory(
+                symbol=symbol,
+                interval=interval,
+                capital=shared_capital,
+                transport=transport,
+                health=health,
+            )
+            for symbol in symbols
+        ]
+        return cls(
+            bots,
+            interval=interval,
+            rate_limit=rate_limit,
+            max_workers=max_workers,
+            health=health,
+            book=orders.book,
+            model=model,
+            batch_window=batch_window,
+        )
+
+    async def tick(self, bot):
+        """Одна итерация бота: загрузка свечей, сигнал, ордер"""
+        await self.budget.acquire(self.TICK_WEIGHT)
+        with metrics.stage("klines"):
+            data = await asyncio.to_thread(bot.get_klines)
+        if data is None:
+            logger.error(f"Failed to fetch latest data for {bot.symbol}.")
+            return None
+
+        with metrics.stage("signal"):
+            signal = bot.generate_signal(data)
+        if self.batcher is not None:
+            # Прогноз нужен каждому символу раз в свечу: батч собирается со всех ботов
+            prediction = await self.batcher.predict(bot.symbol, *bot.model_input())
+            if signal is not None:
+                signal = bot.filter_signal(signal, prediction)
+        if signal is None:
+            return None
+
+        # Заявка в batch оплачивается вместе с batch-запросом (_flush_batch)
+        weight = self.TRADE_WEIGHT - (self.order_batcher is not None)
+        await self.budget.acquire(weight)
+        return await asyncio.to_thread(bot.execute_trade_by_base, signal)
+
+    def _schedule_batch(self, delay, flush):
+        """Окно batch отсчитывает event loop runner (вызывается из потоков ботов)"""
+        loop = self._loop
+        loop.call_soon_threadsafe(
+            loop.call_later, delay, lambda: loop.create_task(self._flush_batch(flush))
+        )
+
+    async def _flush_batch(self, flush):
+        await self.budget.acquire(self.order_batcher.requests())
+        await self._loop.run_in_executor(self._batch_executor, flush)
+
+    async def run_bot(self, bot, iterations=None):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        last_tick = None
+        done = 0
+        while not self._stopped and (iterations is None or done < iterations):
+            now = loop.time()
+            if last_tick is not None:
+                metrics.loop(now - last_tick, self.interval)
+            last_tick = now
+            try:
+                await self.tick(bot)
+            except Exception as e:
+                logger.error(f"Exception occurred in {bot.symbol} loop: {e}")
+                logger.error(traceback.format_exc())
+            done += 1
+            self.ticks += 1
+
+            # Держим ритм interval без накопления дрейфа
+            next_run += self.interval
+            delay = next_run - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_run = loop.time()
+
+    async def run(self, iterations=None):
+        """
+        Основной цикл всех ботов.
+        :param iterations: Число итераций на бота (None - бесконечно)
+        """
+        loop = self._loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_workers))
+        logger.info(f"Async runner started for {len(self.bots)} symbols.")
+        if self.health is not None:
+            # Ключи общие для всех ботов - проверяем один раз, баланс обновляется в фоне
+            await asyncio.to_thread(self.health.start)
+        if self.book is not None and self.bots:
+            bot = self.bots[0]
+            self.book.start(
+                bot.client,
+                bot.category,
+                interval=int(os.getenv("ORDER_RECONCILE_INTERVAL", 300)),
+            )
+        await asyncio.gather(*(self.run_bot(bot, iterations) for bot in self.bots))
+
+    def stop(self):
+        self._stopped = True
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+        if self.health is not None:
+            self.health.stop()
+        if self.book is not None:
+            self.book.stop()
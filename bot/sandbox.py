@@ -0,0 +1,1021 @@
+"""
+Локальная замена биржи Bybit для тестов и нагрузочных прогонов.
+HTTP (v5 REST) и публичный WebSocket с рыночными данными,
+настраиваемыми задержкой, ошибками и лимитами запросов.
+Запуск: python -m bot.sandbox --port 8800 --ws-port 8801 --symbols BTCUSDT,ETHUSDT
+Бот подключается через BYBIT_ENDPOINT=http://127.0.0.1:8800
+и BYBIT_WS_ENDPOINT=ws://127.0.0.1:8801.
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import itertools
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+MINUTE = 60_000
+INTERVALS = (1, 3, 5, 15, 30, 60, 120, 240, 360, 720)
+KLINE_LIMIT = 1000
+HISTORY_LIMIT = 50
+# Ордеров в одном batch-запросе по категориям
+BATCH_LIMITS = {"linear": 20, "inverse": 20, "option": 20, "spot": 10}
+INSTRUMENTS_LIMIT = 1000
+
+# Лимиты приватных эндпоинтов в секунду на ключ, рыночные данные - на IP
+DEFAULT_LIMITS = {
+    "/v5/order/": 10,
+    "/v5/position/": 10,
+    "/v5/account/": 10,
+    "/v5/market/": 120,
+}
+DEFAULT_PRICES = {"BTCUSDT": 60000.0, "ETHUSDT": 3000.0, "DOGEUSDT": 0.1}
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class SandboxError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _fmt(value, scale):
+    return f"{value:.{max(scale, 0)}f}"
+
+
+class _Market:
+    """
+    Рынок одного символа: минутные свечи случайного блуждания.
+    Внутри незакрытой минуты цена движется от open к заранее известному close.
+    """
+
+    def __init__(self, symbol, price, start_ms, history, rng, volatility):
+        self.symbol = symbol
+        magnitude = math.floor(math.log10(price))
+        self.price_scale = int(np.clip(5 - magnitude, 1, 8))
+        self.qty_scale = int(np.clip(magnitude - 1, 0, 3))
+        self.tick_size = 10.0**-self.price_scale
+        self.qty_step = 10.0**-self.qty_scale
+        self.rng = rng
+        self.volatility = volatility
+        self.starts = np.empty(0, dtype=np.int64)
+        self.bars = np.empty((0, 5))  # open, high, low, close, volume
+        current = start_ms // MINUTE * MINUTE
+        self._generate(current - history * MINUTE, history + 1, price)
+
+    def _generate(self, first_start, count, prev_close):
+        returns = self.rng.normal(0, self.volatility, count)
+        closes = prev_close * np.exp(np.cumsum(returns))
+        opens = np.r_[prev_close, closes[:-1]]
+        wick = np.abs(self.rng.normal(0, self.volatility / 2, (2, count)))
+        bars = np.column_stack(
+            (
+                opens,
+                np.maximum(opens, closes) * (1 + wick[0]),
+                np.minimum(opens, closes) * (1 - wick[1]),
+                closes,
+                self.rng.gamma(2.0, 50.0, count),
+            )
+        )
+        # Цены и объемы кратны шагам, как на бирже: свечи старших интервалов
+        # складываются из минутных без погрешности округления
+        bars[:, :4] = np.round(bars[:, :4] / self.tick_size) * self.tick_size
+        bars[:, 4] = np.round(bars[:, 4] / self.qty_step) * self.qty_step
+        starts = first_start + np.arange(count, dtype=np.int64) * MINUTE
+        self.starts = np.concatenate((self.starts, starts))
+        self.bars = np.concatenate((self.bars, bars))
+
+    def advance(self, now_ms):
+        """Догенерирует минуты до текущей (незакрытой) включительно"""
+        current = now_ms // MINUTE * MINUTE
+        missing = (current - int(self.starts[-1])) // MINUTE
+        if missing > 0:
+            self._generate(int(self.starts[-1]) + MINUTE, missing, self.bars[-1, 3])
+
+    def price(self, now_ms):
+        """Текущая цена, округленная до шага цены"""
+        self.advance(now_ms)
+        bar = self.bars[-1]
+        progress = (now_ms - int(self.starts[-1])) / MINUTE
+        price = bar[0] + (bar[3] - bar[0]) * progress
+        return round(price / self.tick_size) * self.tick_size
+
+    def klines(self, now_ms, interval, start=None, end=None, limit=200):
+        """
+        Свечи интервала interval минут в формате get_kline, от новых к старым.
+        Последняя свеча незакрыта, ее close - текущая цена.
+        """
+        self.advance(now_ms)
+        bucket = interval * MINUTE
+        end = now_ms if end is None else min(end, now_ms)
+        hi = int(np.searchsorted(self.starts, end, "right"))
+        first = int(self.starts[0]) if start is None else start
+        # Начало первой целой свечи интервала в истории
+        first = max(first, -(-int(self.starts[0]) // bucket) * bucket)
+        first = max(first, (end // bucket - limit + 1) * bucket)
+        lo = int(np.searchsorted(self.starts, first, "left"))
+        if lo >= hi:
+            return []
+
+        starts = self.starts[lo:hi]
+        bars = self.bars[lo:hi].copy()
+        if hi == len(self.starts):
+            # Текущая минута еще не закрыта
+            last = bars[-1]
+            last[3] = self.price(now_ms)
+            last[1], last[2] = max(last[0], last[3]), min(last[0], last[3])
+            volume = last[4] * (now_ms - int(starts[-1])) / MINUTE
+            last[4] = round(volume / self.qty_step) * self.qty_step
+
+        keys = starts // bucket
+        index = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[index[1:], len(keys)] - 1
+        opens = bars[index, 0]
+        highs = np.maximum.reduceat(bars[:, 1], index)
+        lows = np.minimum.reduceat(bars[:, 2], index)
+        closes = bars[ends, 3]
+        volumes = np.add.reduceat(bars[:, 4], index)
+        turnovers = np.add.reduceat(bars[:, 4] * bars[:, 3], index)
+
+        rows = []
+        for i in range(len(index) - 1, -1, -1):
+            rows.append(
+                [
+                    str(int(keys[index[i]]) * bucket),
+                    _fmt(opens[i], self.price_scale),
+                    _fmt(highs[i], self.price_scale),
+                    _fmt(lows[i], self.price_scale),
+                    _fmt(closes[i], self.price_scale),
+                    _fmt(volumes[i], self.qty_scale),
+                    _fmt(turnovers[i], 4),
+                ]
+            )
+        return rows
+
+    def instrument(self):
+        return {
+            "symbol": self.symbol,
+            "contractType": "LinearPerpetual",
+            "status": "Trading",
+            "baseCoin": self.symbol[:-4],
+            "quoteCoin": "USDT",
+            "priceScale": str(self.price_scale),
+            "priceFilter": {
+                "minPrice": _fmt(self.tick_size, self.price_scale),
+                "maxPrice": "1999999.8",
+                "tickSize": _fmt(self.tick_size, self.price_scale),
+            },
+            "lotSizeFilter": {
+                "maxOrderQty": "1000000",
+                "minOrderQty": _fmt(self.qty_step, self.qty_scale),
+                "qtyStep": _fmt(self.qty_step, self.qty_scale),
+                "minNotionalValue": "5",
+            },
+        }
+
+
+class SandboxExchange:
+    """
+    Эмулятор эндпоинтов Bybit v5, которыми пользуется бот:
+    get_kline, get_tickers, get_instruments_info, place_order, amend_order,
+    cancel_order (и их batch-варианты), get_open_orders, get_positions,
+    set_trading_stop, get_order_history, get_wallet_balance. Рыночные ордера исполняются сразу по ask/bid,
+    лимитные ждут цены, стопы и трейлинг стопы срабатывают по текущей цене.
+    Используется напрямую (handle) или через локальные HTTP и WebSocket серверы.
+    """
+
+    PUBLIC = ("/v5/market/",)
+
+    def __init__(
+        self,
+        symbols=None,
+        prices=None,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        limits=None,
+        api_keys=None,
+        balance=10_000.0,
+        speed=1.0,
+        history=2_000,
+        volatility=0.001,
+        spread_ticks=1,
+        ws_interval=0.1,
+        seed=0,
+    ):
+        """
+        :param latency: Задержка ответа, секунд
+        :param jitter: Случайная добавка к задержке, от 0 до jitter секунд
+        :param error_rate: Доля запросов, получающих retCode 10016 (ошибка сервиса)
+        :param limits: Лимиты в секунду по префиксам путей, {} - без лимитов
+        :param api_keys: Допустимые ключи, None - любой непустой
+        :param speed: Ускорение часов биржи (60 - минутная свеча за секунду)
+        :param history: Сколько минутных свечей сгенерировать в прошлое
+        """
+        prices = dict(prices or {})
+        for symbol in symbols or (prices and list(prices)) or ["BTCUSDT"]:
+            prices.setdefault(symbol, DEFAULT_PRICES.get(symbol, 100.0))
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.api_keys = set(api_keys) if api_keys is not None else None
+        self.speed = speed
+        self.spread_ticks = spread_ticks
+        self.ws_interval = ws_interval
+        self.wallet = float(balance)
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+
+        self._random = random.Random(seed)
+        self._t0 = time.monotonic()
+        self._start_ms = int(time.time() * 1000)
+        rng = np.random.default_rng(seed)
+        self.markets = {
+            symbol: _Market(symbol, price, self._start_ms, history, rng, volatility)
+            for symbol, price in prices.items()
+        }
+        self.orders = {}  # orderId -> ордер
+        self._links = {}  # orderLinkId -> orderId
+        self._history = []  # orderId в порядке создания
+        self.positions = {}  # symbol -> позиция
+        self._windows = {}  # (ключ, путь) -> [секунда, число запросов]
+        self._faults = collections.deque()
+        self._lock = threading.RLock()
+        self._http = None
+        self._ws = None
+
+        self.routes = {
+            ("GET", "/v5/market/kline"): self._kline,
+            ("GET", "/v5/market/tickers"): self._tickers,
+            ("GET", "/v5/market/instruments-info"): self._instruments,
+            ("POST", "/v5/order/create"): self._create,
+            ("POST", "/v5/order/amend"): self._amend,
+            ("POST", "/v5/order/cancel"): self._cancel,
+            ("POST", "/v5/order/create-batch"): lambda params: self._batch(self._create, params),
+            ("POST", "/v5/order/amend-batch"): lambda params: self._batch(self._amend, params),
+            ("POST", "/v5/order/cancel-batch"): lambda params: self._batch(self._cancel, params),
+            ("GET", "/v5/order/history"): self._order_history,
+            ("GET", "/v5/order/realtime"): self._open_orders,
+            ("GET", "/v5/position/list"): self._positions,
+            ("POST", "/v5/position/trading-stop"): self._trading_stop,
+            ("GET", "/v5/account/wallet-balance"): self._wallet_balance,
+        }
+
+    # Часы и цены
+
+    def now(self):
+        """Время биржи, unix мс (с учетом ускорения speed)"""
+        elapsed = (time.monotonic() - self._t0) * self.speed
+        return self._start_ms + int(elapsed * 1000)
+
+    def _market(self, symbol):
+        market = self.markets.get(symbol)
+        if market is None:
+            raise SandboxError(10001, f"symbol invalid: {symbol}")
+        return market
+
+    def _quote(self, market, now):
+        """(bid, ask, last)"""
+        last = market.price(now)
+        spread = market.tick_size * self.spread_ticks
+        return last - spread, last + spread, last
+
+    # Внедрение сбоев
+
+    def inject(self, path, code=10016, message="Service unavailable", status=200, count=1):
+        """Следующие count запросов к path получат ошибку code (или HTTP status)"""
+        with self._lock:
+            for _ in range(count):
+                self._faults.append((path, code, message, status))
+
+    def _take_fault(self, path):
+        with self._lock:
+            for fault in self._faults:
+                if fault[0] == path:
+                    self._faults.remove(fault)
+                    return fault
+        return None
+
+    def _rate_limit(self, key, path):
+        """
+        Окно в одну секунду на (ключ, путь).
+        :return: (разрешен ли запрос, заголовки X-Bapi-Limit*)
+        """
+        prefix = None
+        for candidate in self.limits:
+            if path.startswith(candidate) and (prefix is None or len(candidate) > len(prefix)):
+                prefix = candidate
+        if prefix is None:
+            return True, {}
+        limit = self.limits[prefix]
+        second = int(time.time())
+        with self._lock:
+            window = self._windows.setdefault((key, path), [second, 0])
+            if window[0] != second:
+                window[:] = [second, 0]
+            window[1] += 1
+            used = window[1]
+        headers = {
+            "X-Bapi-Limit": str(limit),
+            "X-Bapi-Limit-Status": str(max(limit - used, 0)),
+            "X-Bapi-Limit-Reset-Timestamp": str((second + 1) * 1000),
+        }
+        return used <= limit, headers
+
+    # Обработка запроса
+
+    def handle(self, method, path, params=None, headers=None, client="127.0.0.1"):
+        """
+        Один запрос к бирже.
+        :param params: Параметры query (GET) или тела (POST)
+        :return: (HTTP статус, тело ответа dict, заголовки)
+        """
+        params = params or {}
+        headers = headers or {}
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        self.requests[path] += 1
+        handler = self.routes.get((method, path))
+        if handler is None:
+            self.errors[path] += 1
+            return 404, {"retCode": 10404, "retMsg": "Not found"}, {}
+
+        api_key = headers.get("X-BAPI-API-KEY") or headers.get("x-bapi-api-key")
+        public = path.startswith(self.PUBLIC)
+        allowed, limit_headers = self._rate_limit(client if public else api_key, path)
+        try:
+            if not allowed:
+                if public:
+                    return 403, {"retCode": 10018, "retMsg": "IP rate limit"}, {}
+                raise SandboxError(10006, "Too many visits!")
+            if not public:
+                if not api_key or (self.api_keys is not None and api_key not in self.api_keys):
+                    raise SandboxError(10003, "API key is invalid.")
+            fault = self._take_fault(path)
+            if fault is not None:
+                _, code, message, status = fault
+                if status != 200:
+                    return status, {"retCode": code, "retMsg": message}, {}
+                raise SandboxError(code, message)
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise SandboxError(10016, "Service unavailable")
+
+            with self._lock:
+                result = handler(params)
+            ext_info = {}
+            if isinstance(result, tuple):
+                # batch: коды ошибок по каждому ордеру
+                result, ext_info = result
+            body = {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": ext_info}
+        except SandboxError as e:
+            self.errors[path] += 1
+            body = {"retCode": e.code, "retMsg": e.message, "result": {}, "retExtInfo": {}}
+        body["time"] = self.now()
+        return 200, body, limit_headers
+
+    # Рыночные данные
+
+    def _kline(self, params):
+        interval = params.get("interval", "1")
+        if not str(interval).isdigit() or int(interval) not in INTERVALS:
+            raise SandboxError(10001, f"Invalid interval: {interval}")
+        market = self._market(params.get("symbol"))
+        limit = min(int(params.get("limit", 200)), KLINE_LIMIT)
+        start = int(params["start"]) if params.get("start") else None
+        end = int(params["end"]) if params.get("end") else None
+        return {
+            "category": params.get("category", "linear"),
+            "symbol": market.symbol,
+            "list": market.klines(self.now(), int(interval), start, end, limit),
+        }
+
+    def _ticker(self, market, now):
+        bid, ask, last = self._quote(market, now)
+        day = market.klines(now, 60, start=now - 24 * 60 * MINUTE, limit=24)
+        prev = float(day[-1][1]) if day else last
+        scale = market.price_scale
+        return {
+            "symbol": market.symbol,
+            "lastPrice": _fmt(last, scale),
+            "bid1Price": _fmt(bid, scale),
+            "ask1Price": _fmt(ask, scale),
+            "markPrice": _fmt(last, scale),
+            "prevPrice24h": _fmt(prev, scale),
+            "price24hPcnt": f"{last / prev - 1:.6f}",
+            "highPrice24h": max((row[2] for row in day), key=float, default=_fmt(last, scale)),
+            "lowPrice24h": min((row[3] for row in day), key=float, default=_fmt(last, scale)),
+            "volume24h": f"{sum(float(row[5]) for row in day):.{market.qty_scale}f}",
+            "turnover24h": f"{sum(float(row[6]) for row in day):.4f}",
+        }
+
+    def _tickers(self, params):
+        now = self.now()
+        if params.get("symbol"):
+            markets = [self._market(params["symbol"])]
+        else:
+            markets = list(self.markets.values())
+        self._check_triggers(now)
+        return {
+            "category": params.get("category", "linear"),
+            "list": [self._ticker(market, now) for market in markets],
+        }
+
+    def _instruments(self, params):
+        if params.get("symbol"):
+            items = [self._market(params["symbol"]).instrument()]
+            cursor = None
+        else:
+            limit = min(int(params.get("limit", 500)), INSTRUMENTS_LIMIT)
+            offset = int(params.get("cursor") or 0)
+            markets = list(self.markets.values())
+            items = [market.instrument() for market in markets[offset : offset + limit]]
+            cursor = str(offset + limit) if offset + limit < len(markets) else ""
+        return {
+            "category": params.get("category", "linear"),
+            "list": items,
+            "nextPageCursor": cursor or "",
+        }
+
+    # Ордера и позиции
+
+    def _find_order(self, params):
+        order_id = params.get("orderId") or self._links.get(params.get("orderLinkId"))
+        order = self.orders.get(order_id)
+        if order is None or order["symbol"] != params.get("symbol", order["symbol"]):
+            raise SandboxError(110001, "Order does not exist.")
+        return order
+
+    def _create(self, params):
+        market = self._market(params.get("symbol"))
+        side = params.get("side")
+        if side not in ("Buy", "Sell"):
+            raise SandboxError(10001, f"Invalid side: {side}")
+        order_type = params.get("orderType", "Market")
+        try:
+            qty = float(params.get("qty"))
+        except (TypeError, ValueError):
+            raise SandboxError(10001, "Qty invalid")
+        steps = qty / market.qty_step
+        if qty < market.qty_step or abs(steps - round(steps)) > 1e-6:
+            raise SandboxError(10001, f"Qty invalid: {params.get('qty')}")
+        link_id = params.get("orderLinkId") or str(uuid.uuid4())
+        if link_id in self._links:
+            raise SandboxError(110072, "OrderLinkedID is duplicate")
+        price = None
+        if order_type == "Limit":
+            try:
+                price = float(params.get("price"))
+            except (TypeError, ValueError):
+                raise SandboxError(10001, "Price invalid")
+
+        now = self.now()
+        order = {
+            "orderId": str(uuid.uuid4()),
+            "orderLinkId": link_id,
+            "symbol": market.symbol,
+            "side": side,
+            "orderType": order_type,
+            "price": params.get("price", "0"),
+            "qty": params.get("qty"),
+            "timeInForce": params.get("timeInForce", "GTC"),
+            "orderStatus": "New",
+            "cumExecQty": "0",
+            "avgPrice": "0",
+            "reduceOnly": bool(params.get("reduceOnly")),
+            "createdTime": str(now),
+            "updatedTime": str(now),
+        }
+        self.orders[order["orderId"]] = order
+        self._links[link_id] = order["orderId"]
+        self._history.append(order["orderId"])
+
+        bid, ask, _ = self._quote(market, now)
+        if order_type == "Market":
+            self._fill(order, ask if side == "Buy" else bid, now)
+        elif (side == "Buy" and ask <= price) or (side == "Sell" and bid >= price):
+            self._fill(order, price, now)
+        elif order["timeInForce"] in ("IOC", "FOK"):
+            order["orderStatus"] = "Cancelled"
+        return {"orderId": order["orderId"], "orderLinkId": link_id}
+
+    def _amend(self, params):
+        order = self._find_order(params)
+        if order["orderStatus"] not in ("New", "PartiallyFilled"):
+            raise SandboxError(110001, "Order does not exist or too late to replace.")
+        for field in ("qty", "price"):
+            if params.get(field) is not None:
+                order[field] = str(params[field])
+        order["updatedTime"] = str(self.now())
+        self._check_triggers(self.now())
+        return {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+    def _cancel(self, params):
+        order = self._find_order(params)
+        if order["orderStatus"] not in ("New", "PartiallyFilled"):
+            raise SandboxError(110001, "Order does not exist or too late to cancel.")
+        order["orderStatus"] = "Cancelled"
+        order["updatedTime"] = str(self.now())
+        return {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+    def _batch(self, handler, params):
+        """
+        create-batch / amend-batch / cancel-batch: ордера обрабатываются по одному,
+        ошибка ордера не отменяет остальные и попадает в retExtInfo.list
+        """
+        category = params.get("category", "linear")
+        items = params.get("request") or []
+        limit = BATCH_LIMITS.get(category, BATCH_LIMITS["linear"])
+        if not items or len(items) > limit:
+            raise SandboxError(10001, f"Batch size must be between 1 and {limit}")
+        results, codes = [], []
+        for item in items:
+            try:
+                result = handler(dict(item, category=category))
+                codes.append({"code": 0, "msg": "OK"})
+            except SandboxError as e:
+                result = {"orderId": "", "orderLinkId": item.get("orderLinkId", "")}
+                codes.append({"code": e.code, "msg": e.message})
+            results.append(dict(result, category=category, symbol=item.get("symbol", "")))
+        return {"list": results}, {"list": codes}
+
+    def _fill(self, order, price, now):
+        qty = float(order["qty"])
+        order.update(
+            orderStatus="Filled",
+            cumExecQty=order["qty"],
+            avgPrice=str(round(price, 10)),
+            updatedTime=str(now),
+        )
+        position = self._position(order["symbol"])
+        size = float(position["size"]) * (1 if position["side"] == "Buy" else -1)
+        delta = qty if order["side"] == "Buy" else -qty
+        avg = float(position["avgPrice"] or 0)
+        new_size = round(size + delta, 8)
+        if size and (size > 0) != (delta > 0):
+            # Сокращение или разворот: фиксируем результат по закрытой части
+            closed = min(abs(delta), abs(size))
+            self.wallet += closed * (price - avg) * (1 if size > 0 else -1)
+            if abs(delta) > abs(size):
+                avg = price
+        else:
+            avg = (abs(size) * avg + qty * price) / abs(new_size) if new_size else 0.0
+        if not new_size:
+            avg = 0.0
+            position.update(trailingStop="0", stopLoss="", takeProfit="", _peak=None)
+
+        position.update(
+            side="Buy" if new_size > 0 else "Sell" if new_size < 0 else "",
+            size=_fmt(abs(new_size), self.markets[order["symbol"]].qty_scale)
+            if new_size
+            else "0",
+            avgPrice=str(round(avg, 10)),
+            positionValue=str(round(abs(new_size) * avg, 8)),
+            updatedTime=str(now),
+        )
+
+    def _position(self, symbol):
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = {
+                "symbol": symbol,
+                "positionIdx": 0,
+                "side": "",
+                "size": "0",
+                "avgPrice": "0",
+                "positionValue": "0",
+                "trailingStop": "0",
+                "stopLoss": "",
+                "takeProfit": "",
+                "createdTime": str(self.now()),
+                "updatedTime": str(self.now()),
+                "_peak": None,
+            }
+        return position
+
+    def _check_triggers(self, now):
+        """Исполнение лимитных ордеров и срабатывание стопов по текущей цене"""
+        for order_id in self._history:
+            order = self.orders[order_id]
+            if order["orderStatus"] != "New" or order["orderType"] != "Limit":
+                continue
+            bid, ask, _ = self._quote(self.markets[order["symbol"]], now)
+            price = float(order["price"])
+            if (order["side"] == "Buy" and ask <= price) or (
+                order["side"] == "Sell" and bid >= price
+            ):
+                self._fill(order, price, now)
+
+        for symbol, position in self.positions.items():
+            if not float(position["size"]):
+                continue
+            last = self.markets[symbol].price(now)
+            long = position["side"] == "Buy"
+            stop = float(position["stopLoss"] or 0)
+            trailing = float(position["trailingStop"] or 0)
+            if trailing:
+                peak = position["_peak"]
+                peak = last if peak is None else (max(peak, last) if long else min(peak, last))
+                position["_peak"] = peak
+                trail_stop = peak - trailing if long else peak + trailing
+                stop = max(stop, trail_stop) if long else min(stop or trail_stop, trail_stop)
+            if stop and ((long and last <= stop) or (not long and last >= stop)):
+                closing = {
+                    "orderId": str(uuid.uuid4()),
+                    "orderLinkId": "",
+                    "symbol": symbol,
+                    "side": "Sell" if long else "Buy",
+                    "orderType": "Market",
+                    "qty": position["size"],
+                    "stopOrderType": "TrailingStop" if trailing else "StopLoss",
+                    "createdTime": str(now),
+                }
+                self.orders[closing["orderId"]] = closing
+                self._history.append(closing["orderId"])
+                self._fill(closing, last, now)
+
+    def _positions(self, params):
+        self._check_triggers(self.now())
+        if params.get("symbol"):
+            symbols = [self._market(params["symbol"]).symbol]
+        else:
+            symbols = [s for s, p in self.positions.items() if float(p["size"])]
+        result = []
+        for symbol in symbols:
+            position = dict(self._position(symbol))
+            del position["_peak"]
+            last = self.markets[symbol].price(self.now())
+            size = float(position["size"]) * (1 if position["side"] == "Buy" else -1)
+            position["markPrice"] = _fmt(last, self.markets[symbol].price_scale)
+            position["unrealisedPnl"] = str(
+                round(size * (last - float(position["avgPrice"])), 8)
+            )
+            result.append(position)
+        return {"category": params.get("category", "linear"), "list": result}
+
+    def _trading_stop(self, params):
+        market = self._market(params.get("symbol"))
+        position = self._position(market.symbol)
+        if not float(position["size"]):
+            raise SandboxError(10001, "can not set tp/sl/ts for zero position")
+        for field in ("trailingStop", "stopLoss", "takeProfit"):
+            if params.get(field) is not None:
+                position[field] = str(params[field])
+        if params.get("trailingStop") is not None:
+            position["_peak"] = None
+        position["updatedTime"] = str(self.now())
+        return {}
+
+    def _order_history(self, params):
+        self._check_triggers(self.now())
+        orders = [self.orders[order_id] for order_id in reversed(self._history)]
+        return self._order_page(params, orders)
+
+    def _open_orders(self, params):
+        """/v5/order/realtime: активные ордера, с openOnly=1 - закрытые"""
+        self._check_triggers(self.now())
+        closed = str(params.get("openOnly") or "0") != "0"
+        orders = [
+            self.orders[order_id]
+            for order_id in reversed(self._history)
+            if (self.orders[order_id]["orderStatus"] in ("New", "PartiallyFilled")) != closed
+        ]
+        return self._order_page(params, orders)
+
+    def _order_page(self, params, orders):
+        limit = min(int(params.get("limit", 20)), HISTORY_LIMIT)
+        offset = int(params.get("cursor") or 0)
+        for field in ("symbol", "orderId", "orderLinkId"):
+            if params.get(field):
+                orders = [o for o in orders if o.get(field) == params[field]]
+        page = orders[offset : offset + limit]
+        cursor = str(offset + limit) if offset + limit < len(orders) else ""
+        return {
+            "category": params.get("category", "linear"),
+            "list": [dict(order) for order in page],
+            "nextPageCursor": cursor,
+        }
+
+    def _wallet_balance(self, params):
+        used = sum(float(p["positionValue"]) for p in self.positions.values()) / 10
+        return {
+            "list": [
+                {
+                    "accountType": params.get("accountType", "UNIFIED"),
+                    "totalAvailableBalance": str(self.wallet - used),
+                    "coin": [{"coin": "USDT", "walletBalance": str(self.wallet)}],
+                }
+            ]
+        }
+
+    # Серверы
+
+    def start(self, port=0, ws_port=0, host="127.0.0.1"):
+        """Запускает HTTP и WebSocket серверы в фоновых потоках"""
+        self._http = ThreadingHTTPServer((host, port), _handler(self))
+        self._http.daemon_threads = True
+        threading.Thread(
+            target=self._http.serve_forever, name="sandbox-http", daemon=True
+        ).start()
+        self._ws = _StreamServer(self, host, ws_port)
+        self._ws.start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self._http.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self):
+        return self._ws.url
+
+    def stop(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        if self._ws is not None:
+            self._ws.stop()
+            self._ws = None
+
+    def __enter__(self):
+        if self._http is None:
+            self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _handler(exchange):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, как у настоящей биржи
+
+        def _respond(self, params):
+            status, body, headers = exchange.handle(
+                self.command,
+                urlsplit(self.path).path,
+                params,
+                self.headers,
+                client=self.client_address[0],
+            )
+            data = json.dumps(body, separators=(",", ":")).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._respond(dict(parse_qsl(urlsplit(self.path).query)))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            try:
+                params = json.loads(raw or b"{}")
+            except ValueError:
+                params = {}
+            self._respond(params)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# Минимальный WebSocket (RFC 6455): только текстовые кадры, без расширений
+
+
+def recv_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return data
+
+
+def read_frame(conn):
+    """:return: (opcode, payload)"""
+    first, second = recv_exact(conn, 2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack(">H", recv_exact(conn, 2))
+    elif length == 127:
+        (length,) = struct.unpack(">Q", recv_exact(conn, 8))
+    mask = recv_exact(conn, 4) if second & 0x80 else b"\x00" * 4
+    payload = recv_exact(conn, length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def send_frame(conn, payload, opcode=0x1):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    conn.sendall(header + payload)
+
+
+def handshake(conn):
+    """Ответ на HTTP Upgrade запрос клиента"""
+    request = b""
+    while b"\r\n\r\n" not in request:
+        chunk = conn.recv(1024)
+        if not chunk:
+            raise ConnectionError("client closed")
+        request += chunk
+    key = ""
+    for line in request.decode().split("\r\n"):
+        if line.lower().startswith("sec-websocket-key:"):
+            key = line.split(":", 1)[1].strip()
+    accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest())
+    conn.sendall(
+        b"HTTP/1.1 101 Switching Protocols\r\n"
+        b"Upgrade: websocket\r\n"
+        b"Connection: Upgrade\r\n"
+        b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+    )
+
+
+class _StreamServer:
+    """
+    Публичный поток: на подписку kline.{interval}.{symbol} и tickers.{symbol}
+    раз в ws_interval отдает незакрытую свечу и тикер,
+    при смене свечи - сначала закрытую (confirm=true).
+    """
+
+    def __init__(self, exchange, host, port):
+        self.exchange = exchange
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen()
+        self.url = f"ws://{host}:{self._sock.getsockname()[1]}"
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._accept, name="sandbox-ws", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        topics = []
+        lock = threading.Lock()
+        closed = threading.Event()
+
+        def send(message):
+            with lock:
+                send_frame(conn, json.dumps(message, separators=(",", ":")).encode())
+
+        def read():
+            try:
+                while True:
+                    opcode, payload = read_frame(conn)
+                    if opcode == 0x8:
+                        break
+                    if opcode != 0x1:
+                        continue
+                    request = json.loads(payload)
+                    conn_id = f"sandbox-{next(self._ids)}"
+                    if request.get("op") == "subscribe":
+                        topics.extend(request.get("args", []))
+                        send(
+                            {"success": True, "ret_msg": "", "conn_id": conn_id, "op": "subscribe"}
+                        )
+                    elif request.get("op") == "ping":
+                        send({"success": True, "ret_msg": "pong", "conn_id": conn_id, "op": "ping"})
+            except (ConnectionError, OSError, ValueError):
+                pass
+            finally:
+                closed.set()
+
+        try:
+            with conn:
+                handshake(conn)
+                threading.Thread(target=read, daemon=True).start()
+                last_start = {}
+                snapshot_sent = set()
+                while not closed.wait(self.exchange.ws_interval) and not self._stopped.is_set():
+                    for topic in list(topics):
+                        self._push(send, topic, last_start, snapshot_sent)
+        except (ConnectionError, OSError):
+            pass
+
+    def _push(self, send, topic, last_start, snapshot_sent):
+        exchange = self.exchange
+        now = exchange.now()
+        parts = topic.split(".")
+        with exchange._lock:
+            if parts[0] == "tickers" and len(parts) == 2:
+                market = exchange.markets.get(parts[1])
+                if market is None:
+                    return
+                ticker = exchange._ticker(market, now)
+                kind = "delta" if topic in snapshot_sent else "snapshot"
+                snapshot_sent.add(topic)
+                send({"topic": topic, "type": kind, "data": ticker, "ts": now})
+            elif parts[0] == "kline" and len(parts) == 3:
+                market = exchange.markets.get(parts[2])
+                if market is None or not parts[1].isdigit():
+                    return
+                interval = int(parts[1])
+                rows = market.klines(now, interval, limit=2)
+                if not rows:
+                    return
+                previous = last_start.get(topic)
+                last_start[topic] = rows[0][0]
+                candles = []
+                if previous is not None and previous != rows[0][0] and len(rows) > 1:
+                    candles.append((rows[1], True))
+                candles.append((rows[0], False))
+                data = [
+                    {
+                        "start": int(row[0]),
+                        "end": int(row[0]) + interval * MINUTE - 1,
+                        "interval": parts[1],
+                        "open": row[1],
+                        "close": row[4],
+                        "high": row[2],
+                        "low": row[3],
+                        "volume": row[5],
+                        "turnover": row[6],
+                        "confirm": confirm,
+                        "timestamp": now,
+                    }
+                    for row, confirm in candles
+                ]
+                send({"topic": topic, "type": "snapshot", "data": data, "ts": now})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная замена биржи Bybit")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--ws-port", type=int, default=8801)
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка, сек")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--speed", type=float, default=1.0, help="Ускорение часов")
+    parser.add_argument("--no-limits", action="store_true")
+    args = parser.parse_args(argv)
+
+    exchange = SandboxExchange(
+        symbols=args.symbols.split(","),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        speed=args.speed,
+        limits={} if args.no_limits else None,
+    ).start(args.port, args.ws_port)
+    print(f"REST: {exchange.url}  WebSocket: {exchange.ws_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    main()
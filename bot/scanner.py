@@ -0,0 +1,345 @@
+"""
+Сканер рынка: правила Bot.generate_signal сразу по всем инструментам категории.
+Цены закрытия хранятся в матрице символы x свечи, RSI и полосы Боллинджера
+считаются для всех символов одним векторным проходом.
+После начальной загрузки истории на каждое обновление нужен один запрос
+get_tickers без symbol: lastPrice - close текущей (незакрытой) свечи.
+Запуск: python -m bot.scanner --interval 5 --top 10
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from . import setup_logger
+from .kline_store import interval_to_ms, parse_klines
+
+logger = setup_logger(__name__)
+
+NAN = float("nan")
+
+
+class MarketScanner:
+    """
+    Матрица цен закрытия (символы x bars свечей) с запасом на bars столбцов,
+    как KlineSeries: сдвиг раз в bars свечей, view() без копирования.
+    Последний столбец - незакрытая свеча, состояние RSI (как у WilderRSI)
+    ведется по закрытым столбцам и обновляется за O(символов) на свечу.
+    """
+
+    def __init__(
+        self,
+        interval="5",
+        bars=200,
+        rsi_window=13,
+        bb_window=19,
+        bb_dev=2,
+        rsi_buy=35,
+        rsi_sell=65,
+        top=20,
+        category="linear",
+        quote="USDT",
+    ):
+        self.interval = str(interval)
+        self.interval_ms = interval_to_ms(interval)
+        if self.interval_ms is None or self.interval == "W":
+            raise ValueError(f"Unsupported interval {interval}")
+        self.bars = bars
+        self.rsi_window = rsi_window
+        self.bb_window = bb_window
+        self.bb_dev = bb_dev
+        self.rsi_buy = rsi_buy
+        self.rsi_sell = rsi_sell
+        self.top = top
+        self.category = category
+        self.quote = quote
+
+        self._alpha = 1 / rsi_window
+        self._old_wt = 1.0 * (1.0 - self._alpha)
+        self.symbols = []  # строка матрицы -> symbol
+        self._rows = {}  # symbol -> строка матрицы
+        self._buf = np.full((0, 2 * bars), NAN)
+        self._lo = self._hi = 0
+        self.current = None  # startTime незакрытой свечи (последний столбец)
+        # Состояние RSI по закрытым свечам: prev_close, avg_up, avg_down, nobs
+        self._rsi = (np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=np.int64))
+        # Символы, пришедшие в последнем снимке тикеров
+        self._seen = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def view(self):
+        """Матрица цен закрытия в хронологическом порядке столбцов, без копирования"""
+        return self._buf[:, self._lo : self._hi]
+
+    # Символы и история
+
+    def _add_symbols(self, symbols):
+        symbols = [s for s in dict.fromkeys(symbols) if s not in self._rows]
+        if not symbols:
+            return
+        for symbol in symbols:
+            self._rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        count = len(symbols)
+        self._buf = np.vstack((self._buf, np.full((count, self._buf.shape[1]), NAN)))
+        prev, up, down, nobs = self._rsi
+        self._rsi = (
+            np.r_[prev, np.full(count, NAN)],
+            np.r_[up, np.zeros(count)],
+            np.r_[down, np.full(count, -0.0)],
+            np.r_[nobs, np.zeros(count, dtype=np.int64)],
+        )
+        self._seen = np.r_[self._seen, np.zeros(count, dtype=bool)]
+
+    def load_history(self, histories):
+        """
+        Загружает историю свечей и заново считает состояние RSI.
+        :param histories: {symbol: свечи KLINE_DTYPE или строки get_kline}
+                          в хронологическом порядке, последняя - незакрытая
+        """
+        histories = {s: parse_klines(k) for s, k in histories.items() if len(k)}
+        if not histories:
+            return
+        self._add_symbols(histories)
+        if self.current is None:
+            self.current = max(int(k["start"][-1]) for k in histories.values())
+            self._lo, self._hi = 0, self.bars
+
+        last = self._hi - 1
+        for symbol, klines in histories.items():
+            cols = last - (self.current - klines["start"]) // self.interval_ms
+            keep = (cols >= self._lo) & (cols <= last)
+            self._buf[self._rows[symbol], cols[keep]] = klines["close"][keep]
+        self._reseed()
+
+    def _reseed(self):
+        """Состояние RSI заново по всем закрытым столбцам - цикл по свечам, не по символам"""
+        count = len(self.symbols)
+        state = (
+            np.full(count, NAN),
+            np.zeros(count),
+            np.full(count, -0.0),
+            np.zeros(count, dtype=np.int64),
+        )
+        for col in range(self._lo, self._hi - 1):
+            state = self._rsi_step(state, self._buf[:, col])
+        self._rsi = state
+
+    # Индикаторы
+
+    def _ewm(self, weighted, cur):
+        # Как WilderRSI._ewm: при совпадении значений не пересчитываем
+        updated = (self._old_wt * weighted + self._alpha * cur) / (self._old_wt + self._alpha)
+        return np.where(weighted != cur, updated, weighted)
+
+    def _rsi_step(self, state, close):
+        """Шаг WilderRSI для всех символов сразу; NaN в close - свечи нет, состояние не меняется"""
+        prev, up, down, nobs = state
+        diff = close - prev
+        cur_up = np.where(diff > 0, diff, 0.0)
+        cur_down = -np.where(diff < 0, diff, 0.0)
+        first = np.isnan(prev)
+        new_up = np.where(first, 0.0, self._ewm(up, cur_up))
+        new_down = np.where(first, -0.0, self._ewm(down, cur_down))
+        valid = ~np.isnan(close)
+        return (
+            np.where(valid, close, prev),
+            np.where(valid, new_up, up),
+            np.where(valid, new_down, down),
+            nobs + valid,
+        )
+
+    def _rsi_value(self, state):
+        _, up, down, nobs = state
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(down == 0, 100.0, 100 - (100 / (1 + up / down)))
+        return np.where(nobs < self.rsi_window, NAN, rsi)
+
+    # Обновление цен
+
+    def _close_candle(self):
+        """Закрывает последний столбец и открывает следующий с той же ценой"""
+        closed = self._buf[:, self._hi - 1]
+        self._rsi = self._rsi_step(self._rsi, closed)
+        if self._hi == self._buf.shape[1]:
+            keep = self.bars - 1
+            self._buf[:, :keep] = self._buf[:, self._hi - keep : self._hi]
+            self._lo, self._hi = 0, keep
+        self._buf[:, self._hi] = closed
+        self._hi += 1
+        self._lo = max(self._lo, self._hi - self.bars)
+        self.current += self.interval_ms
+
+    def update_tickers(self, tickers, now_ms):
+        """
+        Снимок тикеров (result.list ответа get_tickers) как цены незакрытой свечи.
+        Смена свечи закрывает предыдущую: состояние RSI сдвигается на столбец.
+        :param now_ms: Время снимка, unix мс (поле time ответа)
+        """
+        bucket = now_ms - now_ms % self.interval_ms
+        if self.current is None:
+            self.current = bucket
+            self._lo, self._hi = 0, 1
+        elif bucket > self.current:
+            steps = (bucket - self.current) // self.interval_ms
+            if steps > self.bars:
+                # Пропущено больше всей истории - старые цены не нужны
+                self.current = bucket - self.bars * self.interval_ms
+                steps = self.bars
+            for _ in range(steps):
+                self._close_candle()
+
+        quote = self.quote
+        rows = self._rows
+        symbols, prices = [], []
+        for item in tickers:
+            symbol = item["symbol"]
+            if symbol.endswith(quote):
+                symbols.append(symbol)
+                prices.append(item["lastPrice"])
+        new = [symbol for symbol in symbols if symbol not in rows]
+        if new:
+            self._add_symbols(new)
+        index = np.fromiter((rows[symbol] for symbol in symbols), np.int64, len(symbols))
+        self._buf[index, self._hi - 1] = np.array(prices, dtype=np.float64)
+        self._seen[:] = False
+        self._seen[index] = True
+
+    def indicators(self):
+        """
+        Индикаторы незакрытой свечи всех символов (строки - как в self.symbols).
+        :return: (close, rsi, bollinger_high, bollinger_low, bb_position) - NumPy массивы;
+                 NaN, пока у символа меньше bb_window свечей
+        """
+        view = self.view()
+        close = view[:, -1]
+        rsi = self._rsi_value(self._rsi_step(self._rsi, close))
+        if view.shape[1] < self.bb_window:
+            nan = np.full(len(close), NAN)
+            return close, rsi, nan, nan, nan
+        window = view[:, -self.bb_window :]
+        mid = window.mean(axis=1)
+        std = window.std(axis=1)
+        high = mid + self.bb_dev * std
+        low = mid - self.bb_dev * std
+        with np.errstate(divide="ignore", invalid="ignore"):
+            position = (close - low) / (high - low)
+        return close, rsi, high, low, position
+
+    def scan(self):
+        """
+        Условия Bot.generate_signal для незакрытой свечи всех символов.
+        :return: Список dict (symbol, signal 1 - Buy / 0 - Sell, close, RSI,
+                 Bollinger_High, Bollinger_Low, bb_position, score) - сначала
+                 самые дальние выходы за полосы; не больше top
+        """
+        if not len(self.symbols):
+            return []
+        close, rsi, high, low, position = self.indicators()
+
+        buy = (close < low) & (rsi <= self.rsi_buy) & self._seen
+        sell = (close > high) & (rsi >= self.rsi_sell) & self._seen
+        # Насколько цена вышла за полосу, в ширинах полосы
+        score = np.where(buy, -position, position - 1)
+        index = np.flatnonzero(buy | sell)
+        if len(index) > self.top:
+            index = index[np.argpartition(-score[index], self.top - 1)[: self.top]]
+        index = index[np.argsort(-score[index], kind="stable")]
+
+        return [
+            {
+                "symbol": self.symbols[i],
+                "signal": 1 if buy[i] else 0,
+                "close": float(close[i]),
+                "RSI": float(rsi[i]),
+                "Bollinger_High": float(high[i]),
+                "Bollinger_Low": float(low[i]),
+                "bb_position": float(position[i]),
+                "score": float(score[i]),
+            }
+            for i in index
+        ]
+
+    # Биржа
+
+    def load(self, client, symbols=None):
+        """
+        Начальная загрузка истории: по запросу get_kline на символ.
+        :param symbols: Символы, по умолчанию все с quote из get_tickers
+        """
+        if symbols is None:
+            response = client.get_tickers(category=self.category)
+            symbols = [
+                item["symbol"]
+                for item in response["result"]["list"]
+                if item["symbol"].endswith(self.quote)
+            ]
+        histories = {}
+        for symbol in symbols:
+            try:
+                response = client.get_kline(
+                    category=self.category,
+                    symbol=symbol,
+                    interval=self.interval,
+                    limit=self.bars,
+                )
+                rows = response["result"]["list"]
+                histories[symbol] = parse_klines(rows, newest_first=True)
+            except Exception as e:
+                logger.error(f"Failed to load klines for {symbol}: {e}")
+        self.load_history(histories)
+        return len(histories)
+
+    def refresh(self, client):
+        """
+        Один запрос get_tickers по всей категории и скан.
+        :return: Результат scan() или None в случае ошибки
+        """
+        try:
+            response = client.get_tickers(category=self.category)
+        except Exception as e:
+            logger.error(f"Failed to fetch tickers: {e}")
+            return None
+        now_ms = int(response.get("time") or time.time() * 1000)
+        self.update_tickers(response["result"]["list"], now_ms)
+        return self.scan()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сканер сигналов по всем инструментам")
+    parser.add_argument("--interval", default="5", help="Интервал свечей")
+    parser.add_argument("--bars", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--period", type=float, default=10, help="Период обновления, сек")
+    parser.add_argument("--category", default="linear")
+    args = parser.parse_args(argv)
+
+    from .transport import Transport
+
+    transport = Transport(endpoint=os.getenv("BYBIT_ENDPOINT"))
+    scanner = MarketScanner(
+        interval=args.interval, bars=args.bars, top=args.top, category=args.category
+    )
+    print(f"loaded {scanner.load(transport.http)} symbols")
+    try:
+        while True:
+            shortlist = scanner.refresh(transport.http)
+            for item in shortlist or ():
+                side = "Buy" if item["signal"] == 1 else "Sell"
+                print(
+                    f"{item['symbol']:<16} {side:<4} close {item['close']:<12g} "
+                    f"RSI {item['RSI']:5.1f} bb {item['bb_position']:6.2f}"
+                )
+            time.sleep(args.period)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
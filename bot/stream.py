@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+PUBLIC_WS_URL = "wss://stream.bybit.com/v5/public/{category}"
+
+
+class MarketStream:
+    """
+    Подписка на публичные потоки Bybit: свечи (kline) и тикер (tickers).
+    Вызывает on_candle(row, confirmed) на каждое обновление свечи
+    (row в формате ответа get_kline) и хранит последний ask1Price.
+    После переподключения вызывает on_reconnect, чтобы бот
+    мог восполнить пропущенные свечи через REST.
+    """
+
+    def __init__(
+        self,
+        symbol,
+        interval="5",
+        category="linear",
+        url=None,
+        on_candle=None,
+        on_ticker=None,
+        on_reconnect=None,
+        ping_interval=20,
+        reconnect_delay=1,
+        max_reconnects=None,
+    ):
+        self.url = (
+            url
+            or os.getenv("BYBIT_WS_ENDPOINT")
+            or PUBLIC_WS_URL.format(category=category)
+        )
+        self.symbol = symbol
+        self.topics = [f"kline.{interval}.{symbol}", f"tickers.{symbol}"]
+        self.on_candle = on_candle
+        self.on_ticker = on_ticker
+        self.on_reconnect = on_reconnect
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+
+        self.ask = None
+        self.ticker = {}
+        self.connections = 0
+        self._ws = None
+        self._stopped = threading.Event()
+
+    def handle_message(self, raw):
+        """Разбирает одно сообщение потока"""
+        try:
+            message = json.loads(raw)
+            topic = message.get("topic")
+            if topic is None:
+                # Ответы на subscribe / ping
+                if message.get("success") is False:
+                    logger.error(f"Stream request failed: {message.get('ret_msg')}")
+                return
+
+            if topic.startswith("tickers."):
+                self._handle_ticker(message)
+            elif topic.startswith("kline."):
+                self._handle_kline(message)
+        except Exception as e:
+            logger.error(f"Exception occurred while handling stream message: {e}")
+
+    def _handle_ticker(self, message):
+        data = message.get("data", {})
+        # Для linear приходит snapshot, затем delta только с изменившимися полями
+        if message.get("type") == "snapshot":
+            self.ticker = dict(data)
+        else:
+            self.ticker.update(data)
+
+        ask = self.ticker.get("ask1Price")
+        if ask:
+            self.ask = float(ask)
+            if self.on_ticker:
+                self.on_ticker(self.ask)
+
+    def _handle_kline(self, message):
+        for item in message.get("data", []):
+            row = [
+                str(item["start"]),
+                item["open"],
+                item["high"],
+                item["low"],
+                item["close"],
+                item["volume"],
+                item["turnover"],
+            ]
+            if self.on_candle:
+                self.on_candle(row, bool(item.get("confirm")))
+
+    def _on_open(self, ws):
+        self.connections += 1
+        ws.send(json.dumps({"op": "subscribe", "args": self.topics}))
+        if self.connections > 1 and self.on_reconnect:
+            self.on_reconnect()
+
+    def _on_message(self, ws, message):
+        self.handle_message(message)
+
+    def _on_error(self, ws, error):
+        logger.error(f"Market stream error: {error}")
+
+    def run(self):
+        """Блокирующий цикл чтения потока с переподключением"""
+        import websocket  # websocket-client нужен только потоковому режиму
+
+        reconnects = 0
+        while not self._stopped.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            self._ws.run_forever(
+                ping_interval=self.ping_interval,
+                ping_payload=json.dumps({"op": "ping"}),
+            )
+            if self._stopped.is_set():
+                break
+
+            reconnects += 1
+            if self.max_reconnects is not None and reconnects > self.max_reconnects:
+                logger.error("Market stream closed, reconnect limit reached.")
+                break
+            logger.error("Market stream disconnected, reconnecting.")
+            time.sleep(self.reconnect_delay)
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
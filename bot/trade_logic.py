@@ -1,63 +1,301 @@
 import os
+import threading
 import time
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
+import numpy as np
 
+from . import trailing
 from .api import Bybit
+from .capital import CapitalLimit
+from .health import HealthMonitor
+from .indicators import IndicatorEngine
+from .metrics import metrics
+from .resample import Resampler
+from .stream import MarketStream
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Сколько секунд последняя известная цена считается актуальной для расчета ордера
+PRICE_MAX_AGE = float(os.getenv("PRICE_MAX_AGE", 5))
+
+# Минимальная сумма ордера в USDT, если в фильтрах инструмента ее нет
+MIN_NOTIONAL = 20
+
+# Проверки позиции после срабатывания локального стопа: стоп на бирже
+# исполняется не мгновенно, пауза удваивается от 0.5 до 30 с, пока биржа
+# не подтвердит закрытие
+STOP_CONFIRM_DELAY = 0.5
+STOP_CONFIRM_MAX_DELAY = 30
+# После стольких проверок открытая позиция попадает в лог ошибок
+STOP_CONFIRM_WARN_AFTER = 4
+
+# Трейлинг стопы ставятся после подтверждения ордера, не задерживая его
+_stops_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="trailing-stop")
+
 
 class Bot(Bybit):
-    def __init__(self, max_usdt_to_spend=10, interval=1):
-        super(Bot, self).__init__()
-        self.max_usdt_to_spend = int(max_usdt_to_spend)
-        self.spent_usdt = 0  # Инициализация потраченных средств
+    def __init__(
+        self,
+        max_usdt_to_spend=10,
+        interval=1,
+        symbol=None,
+        capital=None,
+        transport=None,
+        health=None,
+        model=None,
+        timeframes=None,
+    ):
+        """
+        :param capital: Общий CapitalLimit для нескольких ботов,
+                        иначе создается собственный на max_usdt_to_spend
+        :param health: Общий HealthMonitor для ботов с одними ключами
+        :param model: TradingModel для фильтрации сигналов (None - без фильтра)
+        :param timeframes: Интервалы, собираемые из свечей BASE_INTERVAL
+                           (по умолчанию TIMEFRAMES из окружения, например "5,15,60,240")
+        """
+        super(Bot, self).__init__(symbol=symbol, transport=transport)
+        self.capital = capital or CapitalLimit(int(max_usdt_to_spend))
+        self.health = health or HealthMonitor(
+            self.client, interval=int(os.getenv("HEALTH_INTERVAL", 60))
+        )
         self.interval = interval
+        self.indicators = IndicatorEngine(rsi_window=13, bb_window=19, bb_dev=2)
+        # Отдельное состояние индикаторов на каждый запрошенный интервал
+        self.timeframe_indicators = {}
+        if timeframes is None and os.getenv("TIMEFRAMES"):
+            timeframes = os.getenv("TIMEFRAMES").split(",")
+        if timeframes:
+            self.resampler = Resampler(
+                timeframes, base_interval=os.getenv("BASE_INTERVAL", "1")
+            )
+        self.model = model
         self.price_decimals, self.qty_decimals, self.min_qty = (
             self.get_instrument_info()
         )
+        # Последняя цена и размер ордера под нее держатся готовыми до сигнала
+        self.ask = None
+        self.ask_at = 0.0
+        self.last_close = None
+        self.last_close_at = 0.0
+        self._sized = (None, None)
+        self.stop_future = None
+        # Позиция бота по его исполненным ордерам (со знаком, в базовой валюте)
+        # и зарезервированный под нее капитал, USDT
+        self.position_qty = 0.0
+        self.exposure = 0.0
+        # Позиции с выбитым локальным стопом, чье закрытие проверяется на бирже
+        self._confirming = set()
+        # Позиция и резерв меняются и торговым потоком, и фоновыми сверками стопов
+        self._position_lock = threading.RLock()
+        # Задержка сигнал -> подтверждение ордера биржей, секунд
+        self.order_latencies = deque(maxlen=1000)
 
         logger.info(
             "Bot initialized with max USDT to spend: %s", self.max_usdt_to_spend
         )
 
+    @property
+    def max_usdt_to_spend(self):
+        return self.capital.limit
+
+    @property
+    def spent_usdt(self):
+        return self.capital.spent
+
     def can_place_order(self, order_cost):
-        """Проверяет, можно ли разместить ордер, не превышая лимит на расходы."""
-        can_place = (self.spent_usdt + order_cost) <= self.max_usdt_to_spend
+        """
+        Проверяет, можно ли разместить ордер, не превышая лимит на расходы
+        и кэшированный баланс аккаунта (без запроса к бирже).
+        """
+        can_place = self.capital.can_spend(order_cost) and self.health.can_trade(
+            order_cost
+        )
         logger.debug(
-            f"Checking if order can be placed: {can_place} (order cost: {order_cost}, spent USDT: {self.spent_usdt})"
+            f"Checking if order can be placed: {can_place} (order cost: {order_cost}, spent USDT: {self.spent_usdt}, balance: {self.health.balance})"
         )
         return can_place
 
-    def calculate_indicators(self, data):
-        """Рассчитывает индикаторы для входных данных."""
+    def closing_qty(self, side, qty):
+        """Часть ордера, закрывающая встречную позицию бота"""
+        delta = qty if side == "Buy" else -qty
+        if self.position_qty * delta >= 0:
+            return 0.0
+        return min(qty, abs(self.position_qty))
+
+    def apply_fill(self, side, qty, reserved):
+        """
+        Учитывает исполненный ордер в позиции бота: закрытая часть позиции
+        возвращает свою долю капитала, reserved остается под открытую часть.
+        :return: True, если ордер открыл позицию (из нулевой или разворотом)
+        """
+        with self._position_lock:
+            before = self.position_qty
+            closed = self.closing_qty(side, qty)
+            if closed:
+                self._reduce_position(closed)
+            self.exposure += reserved
+            self.position_qty = round(
+                self.position_qty + (qty - closed) * (1 if side == "Buy" else -1),
+                self.qty_decimals,
+            )
+            return qty > closed and (before == 0 or closed > 0)
+
+    def _reduce_position(self, qty):
+        """Сокращает позицию бота на qty, освобождая капитал пропорционально"""
+        with self._position_lock:
+            size = abs(self.position_qty)
+            if not size:
+                return
+            released = self.exposure if qty >= size else self.exposure * qty / size
+            self.capital.release(released)
+            self.exposure -= released
+            sign = 1 if self.position_qty > 0 else -1
+            self.position_qty = round(sign * max(size - qty, 0.0), self.qty_decimals)
+            if not self.position_qty:
+                self.exposure = 0.0
+                # Закрытая позиция снимается с локального трейлинг стопа
+                trailing.stops.close(self.symbol)
+
+    def sync_position(self, position):
+        """
+        Сверяет позицию бота со свежей позицией биржи (get_positions):
+        позиция, закрытая или сокращенная стопом на бирже, освобождает капитал.
+        """
+        with self._position_lock:
+            size = float(position.get("size") or 0)
+            if position.get("side") == "Sell":
+                size = -size
+            if size * self.position_qty < 0:
+                size = 0.0  # позиция биржи развернута не ботом: своя закрыта
+            if abs(size) < abs(self.position_qty):
+                self._reduce_position(abs(self.position_qty) - abs(size))
+
+    def refresh_position(self):
+        """
+        Запрашивает позицию символа у биржи и сверяет с позицией бота.
+        Блокировка держится и на время запроса: исполнение ордера ботом
+        не вклинится между ответом биржи и сверкой.
+        :return: False, если позицию получить не удалось
+        """
+        with self._position_lock:
+            positions = self.get_open_positions()
+            if positions is None:
+                return False
+            self.sync_position(positions[0] if positions else {})
+            return True
+
+    def _on_stop_triggered(self, position):
+        """Цена выбила локальный стоп: закрытие позиции проверяется на бирже в фоне"""
+        if position in self._confirming:
+            return  # проверки уже идут
+        self._confirming.add(position)
+        _stops_executor.submit(self._confirm_stop, position)
+
+    def _confirm_stop(self, position, attempt=0):
+        """
+        Сверяет позицию с биржей, пока та не подтвердит закрытие
+        (сверка снимает позицию с сопровождения). Позиция, которую биржа
+        еще держит, остается на сопровождении, проверки повторяются по таймеру
+        с удвоением паузы, не занимая поток пула на время ожидания.
+        """
+        if position.active and position.triggered:
+            with self._position_lock:
+                still_open = not self.refresh_position() or bool(self.position_qty)
+            if still_open:
+                if attempt == STOP_CONFIRM_WARN_AFTER:
+                    logger.error(
+                        f"Trailing stop {position.stop} hit for {self.symbol}, "
+                        f"but the position is still open on the exchange"
+                    )
+                delay = min(STOP_CONFIRM_DELAY * 2**attempt, STOP_CONFIRM_MAX_DELAY)
+                timer = threading.Timer(
+                    delay,
+                    _stops_executor.submit,
+                    args=(self._confirm_stop, position, attempt + 1),
+                )
+                timer.daemon = True
+                timer.start()
+                return
+            trailing.stops.close(self.symbol, position.position_idx)
+        # Закрыта биржей, ордером бота или цена вернулась выше стопа
+        self._confirming.discard(position)
+
+    def reserve_capital(self, amount):
+        """
+        Резервирует капитал под открываемую часть ордера. Если лимит занят
+        открытой позицией бота, сначала проверяет, не закрыта ли она на бирже.
+        """
+        if self.capital.reserve(amount):
+            return True
+        if not self.position_qty or not self.refresh_position():
+            return False
+        return self.capital.reserve(amount)
+
+    def calculate_indicators(self, data, engine=None):
+        """
+        Рассчитывает индикаторы для последней свечи входных данных.
+        Закрытые свечи один раз попадают в потоковый IndicatorEngine,
+        последняя (незакрытая) свеча считается без изменения его состояния.
+        :param data: Массив свечей KLINE_DTYPE (см. get_klines)
+                     или DataFrame с колонкой close, индекс - startTime свечей
+        :param engine: IndicatorEngine интервала, по умолчанию self.indicators
+        :return: dict с close, RSI и полосами Боллинджера или None
+        """
         try:
-            data["RSI"] = RSIIndicator(data["close"], window=13).rsi()
-            bollinger = BollingerBands(data["close"], window=19, window_dev=2)
-            data["Bollinger_High"] = bollinger.bollinger_hband()
-            data["Bollinger_Low"] = bollinger.bollinger_lband()
-            data["Bollinger_Mid"] = bollinger.bollinger_mavg()
+            if isinstance(data, np.ndarray):
+                keys, closes = data["start"], data["close"]
+            else:
+                keys, closes = data.index.to_numpy(), data["close"].to_numpy()
+            if engine is None:
+                engine = self.indicators
+            latest = engine.sync(keys, closes)
+            if latest is not None and engine is self.indicators:
+                self.last_close = latest["close"]
+                self.last_close_at = time.monotonic()
+                # Цена свечи двигает локальные трейлинг стопы символа
+                trailing.stops.on_tick(self.symbol, self.last_close)
             logger.info("Indicators calculated successfully.")
+            return latest
         except Exception as e:
             logger.error(f"Failed to calculate indicators: {e}")
             logger.error(traceback.format_exc())
-        return data
+        return None
 
-    def generate_signal(self, data):
+    def indicators_for(self, timeframe):
+        """IndicatorEngine интервала timeframe (None - основной self.indicators)"""
+        if timeframe is None:
+            return self.indicators
+        engine = self.timeframe_indicators.get(timeframe)
+        if engine is None:
+            engine = IndicatorEngine(rsi_window=13, bb_window=19, bb_dev=2)
+            self.timeframe_indicators[timeframe] = engine
+        return engine
+
+    def generate_signal(self, data=None, timeframe=None):
         """
         Генерирует торговый сигнал на основе данных.
-        :param data: DataFrame с историческими данными
+        :param data: Массив свечей KLINE_DTYPE или DataFrame с историческими данными
+        :param timeframe: Интервал из resampler (например, "15"): свечи берутся
+                          из уже собранных без запросов к бирже, data не нужен
         :return: Торговый сигнал (1 - Buy, 0 - Sell, None - No Signal)
         """
         try:
-            data = self.calculate_indicators(data)
+            if timeframe is not None:
+                timeframe = str(timeframe)
+                data = self.timeframe_klines(timeframe)
+                if data is None:
+                    return None
+            with metrics.stage("indicators"):
+                latest_data = self.calculate_indicators(
+                    data, engine=self.indicators_for(timeframe)
+                )
+            if latest_data is None:
+                return None
             print("Входящие данные:")
-
-            latest_data = data.iloc[-1]
             print(latest_data)
             buy_condition = (latest_data["close"] < latest_data["Bollinger_Low"]) and (
                 latest_data["RSI"] <= 35
@@ -73,19 +311,48 @@ class Bot(Bybit):
                 f"RSI: {latest_data['RSI']}"
             )
 
+            signal = None
             if buy_condition:
                 logger.info("Buy condition met.")
-                return 1  # Buy signal
+                signal = 1  # Buy signal
             elif sell_condition:
                 logger.info("Sell condition met.")
-                return 0  # Sell signal
+                signal = 0  # Sell signal
             else:
                 logger.info("No trading signal generated.")
+
+            if signal is not None and self.model is not None and timeframe is None:
+                signal = self.filter_signal(signal, self.predict())
+            return signal
         except Exception as e:
             logger.error(f"Exception occurred during signal generation: {e}")
             logger.error(traceback.format_exc())
         return None
 
+    def model_input(self):
+        """(ключ последней закрытой свечи, вектор признаков) для TradingModel"""
+        return self.indicators.last_key, self.indicators.model_features()
+
+    def predict(self):
+        """Предсказание модели для последней закрытой свечи (из кэша, если уже было)"""
+        key, features = self.model_input()
+        try:
+            return self.model.predict_batch([(self.symbol, key, features)])[self.symbol]
+        except Exception as e:
+            logger.error(f"Model prediction failed: {e}")
+            return None
+
+    def filter_signal(self, signal, prediction):
+        """
+        Оставляет сигнал, если модель согласна с направлением:
+        покупка при прогнозе роста (1), продажа при прогнозе падения (0).
+        Без прогноза (модель недоступна, признаки не прогреты) сигнал не меняется.
+        """
+        if prediction is None or prediction == signal:
+            return signal
+        logger.info(f"Signal {signal} for {self.symbol} rejected by model.")
+        return None
+
     def adjust_qty(self, qty):
         """Корректирует количество ордера в зависимости от минимально допустимого размера."""
         min_order_value_in_base = self._floor(
@@ -98,7 +365,9 @@ class Bot(Bybit):
         return qty
 
     def get_valid_order_qty(self, current_symbol_price):
-        min_notional = 20  # Минимальная сумма в USDT
+        # Минимальная сумма ордера в USDT берется из фильтров инструмента
+        instrument = getattr(self, "instrument", None)
+        min_notional = getattr(instrument, "min_notional", 0) or MIN_NOTIONAL
         qty = self.floor_qty(min_notional / current_symbol_price)
         return qty
 
@@ -113,63 +382,272 @@ class Bot(Bybit):
     def floor_qty(self, value):
         return self._floor(value, self.qty_decimals)
 
+    def on_ticker(self, ask):
+        """Обработчик тикера: запоминает ask и сразу считает размер ордера под него"""
+        self.ask = ask
+        self.ask_at = time.monotonic()
+        self.order_qty(ask)
+        trailing.stops.on_tick(self.symbol, ask)
+
+    def warm_price(self):
+        """
+        Актуальная цена без запроса к бирже: ask из потока тикера,
+        иначе close последней свечи, по которой считался сигнал.
+        :return: Цена или None, если обе устарели
+        """
+        now = time.monotonic()
+        if self.ask is not None and now - self.ask_at <= PRICE_MAX_AGE:
+            return self.ask
+        if self.last_close is not None and now - self.last_close_at <= PRICE_MAX_AGE:
+            return self.last_close
+        return None
+
+    def order_qty(self, price):
+        """Размер ордера для цены, пересчитывается только при ее изменении"""
+        if self._sized[0] != price:
+            self._sized = (price, self.get_valid_order_qty(price))
+        return self._sized[1]
+
+    def latency_stats(self):
+        """Задержка сигнал -> подтверждение ордера, мс"""
+        values = sorted(self.order_latencies)
+        if not values:
+            return {"orders": 0}
+        n = len(values)
+        return {
+            "orders": n,
+            "p50": values[(n - 1) // 2] * 1000,
+            "p99": values[int((n - 1) * 0.99)] * 1000,
+            "max": values[-1] * 1000,
+        }
+
     def execute_trade_by_base(
         self,
         signal,
+        price=None,
     ):
+        """
+        Размещает рыночный ордер по сигналу.
+        Цена и размер берутся из уже известных данных (REST-запрос тикера
+        только если они устарели), ордер уходит первым,
+        трейлинг стоп ставится на открытую ордером позицию после подтверждения в фоне.
+        :param price: Текущий ask, если он уже известен (например, из потока тикера)
+        """
+        signal_at = time.perf_counter()
         side = "Buy" if signal == 1 else "Sell"
-        curr_price = self.get_symbol_price()
-        valid_qty = self.get_valid_order_qty(
-            current_symbol_price=curr_price,
-        )
+        with metrics.stage("price"):
+            curr_price = price or self.warm_price() or self.get_symbol_price()
+        if not curr_price:
+            logger.error(f"Order for {self.symbol} skipped: no price available.")
+            return None
+        valid_qty = self.order_qty(curr_price)
+        order_cost = valid_qty * curr_price
+        # Капитал резервируется только под открываемую часть ордера,
+        # закрытие встречной позиции бота его не требует
+        closing = self.closing_qty(side, valid_qty)
+        reserved = (valid_qty - closing) * curr_price
+        with metrics.stage("permission"):
+            allowed = self.health.can_trade(reserved)
+        if not allowed:
+            logger.error(
+                f"Order for {self.symbol} skipped: trading is blocked or balance "
+                f"{self.health.balance} is below order cost {reserved}"
+            )
+            return None
+        if reserved and not self.reserve_capital(reserved):
+            if not closing:
+                logger.error(
+                    f"Order for {self.symbol} skipped: cost {order_cost} exceeds "
+                    f"capital limit (spent USDT: {self.spent_usdt})"
+                )
+                return None
+            # Разворот не помещается в лимит: ордер только закрывает позицию
+            valid_qty, reserved = closing, 0.0
 
+        order = None
         try:
-            self.set_trailing_stop()
-        except Exception as e:
-            logger.error(f"Failed to set trailing stop: {e}")
-        try:
-            order = self.place_order(side=side, qty=valid_qty)
-            logger.info(f"Executed {side} order for base {self.symbol}: {order}")
+            with metrics.stage("order"):
+                order = self.submit_order(side=side, qty=valid_qty)
+            if order is None:
+                self.capital.release(reserved)
+                return None
+            # UNKNOWN_ORDER тоже считается исполненным: резерв и позиция
+            # исправятся сверкой с биржей (sync_position)
+            opened = self.apply_fill(side, valid_qty, reserved)
+
+            latency = time.perf_counter() - signal_at
+            self.order_latencies.append(latency)
+            logger.info(
+                f"Executed {side} order for base {self.symbol}: {order}, "
+                f"signal to ack {latency * 1000:.1f} ms"
+            )
+            if opened:
+                # Стоп ставится только на открытую ордером позицию: закрывающий
+                # ордер и добор в ту же сторону его не трогают
+                self.stop_future = _stops_executor.submit(
+                    self._attach_trailing_stop, side, curr_price
+                )
             return order
         except Exception as e:
+            if order is None:
+                self.capital.release(reserved)
             logger.error(f"Exception occurred while executing trade: {e}")
             logger.error(traceback.format_exc())
             return None
 
-    def run(self):
-        """Основной цикл работы бота."""
+    def _attach_trailing_stop(self, side, price):
+        with metrics.stage("trailing_stop"):
+            if self.trailing_mode == "local":
+                return self.track_trailing_stop(side, price)
+            return self.attach_trailing_stop()
 
-        while True:
-            try:
+    def track_trailing_stop(self, side, price):
+        """
+        Ставит позицию под локальный трейлинг стоп (bot.trailing):
+        стоп на TRAILING_PERCENT от лучшей цены - в единицах цены, как
+        trailingStop биржи в attach_trailing_stop, - переносится по тикам
+        через set_trading_stop без запросов позиций.
+        Вызывается только для ордера, открывшего позицию (из нулевой или
+        разворотом), поэтому направление позиции - сторона этого ордера.
+        Закрытие позиции снимает ее с сопровождения (_reduce_position),
+        выбитый стоп - после того, как биржа подтвердит закрытие.
+        :return: True, если позиция поставлена на сопровождение
+        """
+        if not self.trailing_percent:
+            return False
+        if not self.position_qty or (self.position_qty > 0) != (side == "Buy"):
+            return False  # позицию уже закрыл или развернул следующий ордер
+        trailing.stops.open(
+            self.symbol,
+            side,
+            price,
+            distance=float(self.trailing_percent),
+            tick_size=self.instrument.tick_size,
+            send=self.send_stop_loss,
+            on_trigger=self._on_stop_triggered,
+        )
+        return True
+
+    def tick(self):
+        """
+        Одна итерация торговли: свечи -> сигнал -> ордер.
+        :return: Результат execute_trade_by_base или None
+        """
+        with metrics.stage("klines"):
+            latest_data = self.get_klines()
 
-                logger.info("The Bot is starting!")
-                self.check_permissions()
-                logger.info("Permissions checked successfully.")
-                latest_data = self.get_historical_data()
+        if latest_data is None:
+            logger.error(f"Failed to fetch latest data for {self.symbol}.")
+            return None
 
-                if latest_data is None:
-                    logger.error(f"Failed to fetch latest data for {self.symbol}.")
-                    time.sleep(self.interval)
-                    continue
+        with metrics.stage("signal"):
+            signal = self.generate_signal(latest_data)
 
-                signal = self.generate_signal(latest_data)
+        if signal is not None:
+            print(signal)
+            try:
+                order = self.execute_trade_by_base(signal)
+                if order:
+                    print("Ордер успешно размещен")
+                return order
 
-                if signal is not None:
-                    print(signal)
-                    try:
+            except Exception as e:
+                logger.error(f"Exception occurred while executing trade: {e}")
 
-                        if self.execute_trade_by_base(signal):
-                            print("Ордер успешно размещен")
+        else:
+            logger.info("No signal generated.")
+            print("Нет сигнала")
+        return None
 
-                    except Exception as e:
-                        logger.error(f"Exception occurred while executing trade: {e}")
+    def start_reconciliation(self):
+        """Фоновая сверка локальной книги ордеров с биржей"""
+        self.book.start(
+            self.client,
+            self.category,
+            interval=int(os.getenv("ORDER_RECONCILE_INTERVAL", 300)),
+        )
 
-                else:
-                    logger.info("No signal generated.")
-                    print("Нет сигнала")
+    def run(self):
+        """Основной цикл работы бота."""
+        # Ключи, баланс и сверка ордеров идут в фоне, а не на каждой итерации
+        self.health.start()
+        self.start_reconciliation()
+        logger.info("The Bot is starting!")
+
+        last_tick = None
+        while True:
+            # Период между итерациями против interval: tick + sleep + задержки планировщика
+            now = time.perf_counter()
+            if last_tick is not None:
+                metrics.loop(now - last_tick, self.interval)
+            last_tick = now
+            try:
+                with metrics.stage("tick"):
+                    self.tick()
 
             except Exception as e:
                 logger.error(f"Exception occurred in main loop: {e}")
                 logger.error(traceback.format_exc())
 
             time.sleep(self.interval)  # Sleep for 1 second
+
+    def run_stream(self, stream=None, interval="5", limit=200):
+        """
+        Событийный режим работы бота.
+        Сигнал считается в момент закрытия свечи из потока kline,
+        ask для ордера берется из потока tickers.
+        REST используется только для начальной загрузки истории
+        и восстановления пропусков после переподключения.
+        """
+        self.stream_interval = interval
+        self.stream_limit = limit
+        self.stream = stream or MarketStream(
+            self.symbol,
+            interval=interval,
+            category=self.category,
+        )
+        self.stream.on_candle = self.on_candle
+        self.stream.on_ticker = self.on_ticker
+        self.stream.on_reconnect = self.backfill
+
+        logger.info("The Bot is starting in stream mode!")
+        self.health.start()
+        self.start_reconciliation()
+        self.backfill()
+        self.stream.run()
+
+    def backfill(self):
+        """Догружает историю свечей через REST"""
+        closes = self.close_prices(
+            interval=self.stream_interval,
+            limit=self.stream_limit,
+            category=self.category,
+        )
+        if closes.empty:
+            logger.error(f"Failed to backfill klines for {self.symbol}.")
+
+    def on_candle(self, row, confirmed):
+        """Обработчик обновления свечи из потока"""
+        series = self.klines.get(self.symbol, self.stream_interval, self.category)
+        synced, _ = series.merge([row])
+        if not synced:
+            logger.error(f"Kline stream gap for {self.symbol}, repairing via REST.")
+            self.backfill()
+        resampler = self.resampler
+        if resampler is not None and self.stream_interval == resampler.base_interval:
+            resampler.sync(series.view())
+        if not confirmed:
+            return
+        self.klines.save(self.symbol, self.stream_interval, self.category)
+
+        try:
+            data = series.view(self.stream_limit)
+            signal = self.generate_signal(data)
+            if signal is not None:
+                if self.execute_trade_by_base(signal, price=self.warm_price()):
+                    print("Ордер успешно размещен")
+            else:
+                logger.info("No signal generated.")
+        except Exception as e:
+            logger.error(f"Exception occurred while handling candle: {e}")
+            logger.error(traceback.format_exc())
@@ -0,0 +1,368 @@
+"""
+Локальные трейлинг стопы для многих позиций.
+Стоп каждой позиции пересчитывается по тикам цены, а на биржу
+(set_trading_stop с stopLoss) уходит, только когда сдвинулся больше
+чем на threshold_ticks шагов цены с последней отправки.
+Позиции символа лежат в кучах по экстремуму цены и по стопу, поэтому тик
+трогает только позиции, которые он двигает или выбивает: O(log n) на каждую.
+"""
+
+import decimal
+import heapq
+import itertools
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import setup_logger
+
+logger = setup_logger(__name__)
+
+THRESHOLD_TICKS = int(os.getenv("TRAILING_THRESHOLD_TICKS", 1))
+# Повтор неудачной отправки стопа: пауза удваивается от RETRY_DELAY до RETRY_MAX_DELAY
+RETRY_DELAY = float(os.getenv("TRAILING_RETRY_DELAY", 1))
+RETRY_MAX_DELAY = float(os.getenv("TRAILING_RETRY_MAX_DELAY", 60))
+
+
+class TrailingPosition:
+    """
+    Позиция под трейлинг стопом.
+    extreme - лучшая цена с открытия (максимум для long, минимум для short),
+    stop - текущий стоп, sent - последний подтвержденный биржей,
+    triggered - цена дошла до stop, закрытие позиции биржей еще не подтверждено.
+    """
+
+    __slots__ = (
+        "symbol",
+        "position_idx",
+        "long",
+        "percent",
+        "distance",
+        "tick_size",
+        "decimals",
+        "extreme",
+        "stop",
+        "sent",
+        "send",
+        "on_trigger",
+        "triggered",
+        "failures",
+        "version",
+        "active",
+        "_inflight",
+        "_dirty",
+    )
+
+    def __init__(
+        self,
+        symbol,
+        position_idx,
+        long,
+        price,
+        percent,
+        distance,
+        tick_size,
+        send,
+        on_trigger=None,
+    ):
+        self.symbol = symbol
+        self.position_idx = position_idx
+        self.long = long
+        self.percent = percent
+        self.distance = distance
+        self.tick_size = tick_size
+        self.decimals = abs(decimal.Decimal(str(tick_size)).as_tuple().exponent)
+        self.extreme = price
+        self.stop = None
+        self.sent = None
+        self.send = send
+        self.on_trigger = on_trigger
+        self.triggered = False
+        self.failures = 0  # неудачных отправок подряд
+        self.version = 0
+        self.active = True
+        self._inflight = False
+        self._dirty = False
+
+    @property
+    def key(self):
+        return self.symbol, self.position_idx
+
+    def stop_for(self, extreme):
+        """Стоп для экстремума, округленный до шага цены в сторону от цены"""
+        distance = extreme * self.percent / 100 if self.percent else self.distance
+        stop = extreme - distance if self.long else extreme + distance
+        if not self.tick_size:
+            return stop
+        # Погрешность float не должна сдвигать стоп на целый шаг
+        ticks = stop / self.tick_size
+        ticks = math.floor(ticks + 1e-9) if self.long else math.ceil(ticks - 1e-9)
+        return round(ticks * self.tick_size, self.decimals)
+
+
+class _SymbolStops:
+    """
+    Кучи позиций одного символа (записи (ключ, seq, version, позиция),
+    устаревшие записи пропускаются по version):
+    long_extremes - min по экстремуму: цена выше вершины двигает стоп;
+    short_extremes - max по экстремуму: цена ниже вершины двигает стоп;
+    long_stops - max по стопу: цена не выше вершины выбивает стоп;
+    short_stops - min по стопу: цена не ниже вершины выбивает стоп.
+    """
+
+    __slots__ = ("long_extremes", "short_extremes", "long_stops", "short_stops", "live")
+
+    def __init__(self):
+        self.long_extremes = []
+        self.short_extremes = []
+        self.long_stops = []
+        self.short_stops = []
+        self.live = 0
+
+
+class TrailingStopManager:
+    """
+    Трейлинг стопы всех позиций процесса (общий для ботов, см. stops).
+    on_tick вызывается на каждую цену символа (тикер потока, close свечи),
+    сдвиги стопов отправляются через send позиции - в executor, если задан.
+    Для позиции одновременно выполняется не больше одной отправки,
+    обновления во время нее сливаются в одну следующую.
+    """
+
+    def __init__(self, threshold_ticks=THRESHOLD_TICKS, executor=None, on_trigger=None):
+        """
+        :param threshold_ticks: Стоп отправляется, если сдвинулся больше чем на
+                                столько шагов цены с последней отправки
+        :param executor: Пул для отправки стопов (None - отправка в on_tick)
+        :param on_trigger: Вызывается с позицией, чей стоп выбит ценой.
+                           Позиция остается на сопровождении, пока ее не снимут
+                           close (закрытие подтверждено биржей)
+        """
+        self.threshold_ticks = threshold_ticks
+        self.executor = executor
+        self.on_trigger = on_trigger
+        self.sent = 0
+        self._positions = {}  # (symbol, positionIdx) -> TrailingPosition
+        self._symbols = {}  # symbol -> _SymbolStops
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def get(self, symbol, position_idx=0):
+        return self._positions.get((symbol, position_idx))
+
+    def open(
+        self,
+        symbol,
+        side,
+        price,
+        percent=None,
+        distance=None,
+        tick_size=0.0,
+        position_idx=0,
+        send=None,
+        on_trigger=None,
+    ):
+        """
+        Ставит позицию под трейлинг стоп (заменяет прежнюю с тем же ключом).
+        :param side: "Buy" (long) или "Sell" (short)
+        :param price: Цена входа - начальный экстремум
+        :param percent: Отступ стопа от экстремума в процентах
+        :param distance: Отступ стопа в единицах цены (если percent не задан)
+        :param send: send(position, stop) -> True, если биржа приняла стоп
+        :param on_trigger: Вызывается с позицией, когда цена выбила ее стоп
+                           (в дополнение к on_trigger менеджера)
+        :return: Обновления для отправки (см. on_tick)
+        """
+        if not percent and not distance:
+            raise ValueError("Trailing stop needs percent or distance")
+        position = TrailingPosition(
+            symbol,
+            position_idx,
+            side == "Buy",
+            float(price),
+            float(percent or 0),
+            float(distance or 0),
+            float(tick_size or 0),
+            send,
+            on_trigger,
+        )
+        with self._lock:
+            self.close(symbol, position_idx)
+            self._positions[position.key] = position
+            stops = self._symbols.setdefault(symbol, _SymbolStops())
+            stops.live += 1
+            position.stop = position.stop_for(position.extreme)
+            self._push(stops, position)
+            updates = [position] if self._due(position) else []
+        self._dispatch(updates)
+        return updates
+
+    def close(self, symbol, position_idx=0):
+        """Снимает позицию с сопровождения (позиция закрыта)"""
+        with self._lock:
+            position = self._positions.pop((symbol, position_idx), None)
+            if position is None:
+                return None
+            position.active = False
+            position.version += 1
+            stops = self._symbols[symbol]
+            stops.live -= 1
+            if not stops.live:
+                del self._symbols[symbol]
+            return position
+
+    def _push(self, stops, position):
+        """Новые записи позиции в кучи; прежние устаревают по version"""
+        position.version += 1
+        entry = (next(self._seq), position.version, position)
+        if position.long:
+            heapq.heappush(stops.long_extremes, (position.extreme, *entry))
+            heapq.heappush(stops.long_stops, (-position.stop, *entry))
+        else:
+            heapq.heappush(stops.short_extremes, (-position.extreme, *entry))
+            heapq.heappush(stops.short_stops, (position.stop, *entry))
+        if len(stops.long_stops) + len(stops.short_stops) > 4 * stops.live + 64:
+            self._compact(stops)
+
+    def _compact(self, stops):
+        """Пересобирает кучи без устаревших записей"""
+        for name in ("long_extremes", "short_extremes", "long_stops", "short_stops"):
+            heap = [e for e in getattr(stops, name) if e[2] == e[3].version and e[3].active]
+            heapq.heapify(heap)
+            setattr(stops, name, heap)
+
+    @staticmethod
+    def _pop_while(heap, condition):
+        """Снимает с кучи актуальные позиции, пока вершина удовлетворяет condition"""
+        popped = []
+        while heap:
+            value, _, version, position = heap[0]
+            if version != position.version or not position.active:
+                heapq.heappop(heap)
+                continue
+            if not condition(value):
+                break
+            heapq.heappop(heap)
+            popped.append(position)
+        return popped
+
+    def _due(self, position):
+        """Стоп сдвинулся с последней отправки больше порога"""
+        if position.sent is None:
+            return True
+        tick = position.tick_size or 1e-12
+        moved = round(abs(position.stop - position.sent) / tick)
+        return moved > self.threshold_ticks
+
+    def _pending(self, position):
+        """Стоп нужно отправить: сдвинулся больше порога или выбит, но не подтвержден"""
+        if position.triggered:
+            return position.sent != position.stop
+        return self._due(position)
+
+    def on_tick(self, symbol, price):
+        """
+        Новая цена символа.
+        :return: Позиции, чьи стопы нужно отправить на биржу
+                 (при заданном send уже отправлены или поставлены в очередь)
+        """
+        price = float(price)
+        with self._lock:
+            stops = self._symbols.get(symbol)
+            if stops is None:
+                return []
+            # Выбитая позиция остается в кучах экстремумов: пока биржа не подтвердит
+            # закрытие, стоп сопровождается дальше. Неотправленный из-за порога
+            # стоп уходит сразу - стоп на бирже может быть свободнее локального
+            triggered = self._pop_while(stops.long_stops, lambda v: -v >= price)
+            triggered += self._pop_while(stops.short_stops, lambda v: v <= price)
+            updates = []
+            for position in triggered:
+                position.triggered = True
+                if self._pending(position):
+                    updates.append(position)
+
+            moved = self._pop_while(stops.long_extremes, lambda v: v < price)
+            moved += self._pop_while(stops.short_extremes, lambda v: -v > price)
+            for position in moved:
+                position.extreme = price
+                position.stop = position.stop_for(price)
+                position.triggered = False
+                self._push(stops, position)
+                if self._due(position):
+                    updates.append(position)
+
+        self._dispatch(updates)
+        for position in triggered:
+            logger.info(f"Trailing stop {position.stop} hit for {position.symbol} at {price}")
+            if position.on_trigger is not None:
+                position.on_trigger(position)
+            if self.on_trigger is not None:
+                self.on_trigger(position)
+        return updates
+
+    def _dispatch(self, updates):
+        for position in updates:
+            if position.send is None:
+                continue
+            with self._lock:
+                if position._inflight:
+                    position._dirty = True
+                    continue
+                position._inflight = True
+            if self.executor is None:
+                self._send(position)
+            else:
+                self.executor.submit(self._send, position)
+
+    def _send(self, position):
+        """Отправляет актуальный стоп, пока он меняется во время отправки"""
+        while True:
+            stop = position.stop
+            try:
+                ok = position.send(position, stop)
+            except Exception as e:
+                logger.error(f"Failed to send trailing stop for {position.symbol}: {e}")
+                ok = False
+            with self._lock:
+                if ok:
+                    position.sent = stop
+                    position.failures = 0
+                    self.sent += 1
+                else:
+                    position.failures += 1
+                if position._dirty and position.active and self._pending(position):
+                    position._dirty = False
+                    continue
+                position._dirty = False
+                position._inflight = False
+                retry = not ok and position.active
+            if retry:
+                self._schedule_retry(position)
+            return
+
+    def _schedule_retry(self, position):
+        """
+        Стоп не принят биржей: повтор по таймеру, а не со следующим сдвигом цены -
+        на ровном или падающем рынке сдвига может не быть, а позиция без стопа
+        """
+        delay = min(RETRY_DELAY * 2 ** (position.failures - 1), RETRY_MAX_DELAY)
+        timer = threading.Timer(delay, self._retry, args=(position,))
+        timer.daemon = True
+        timer.start()
+
+    def _retry(self, position):
+        with self._lock:
+            due = position.active and position.failures and position.sent != position.stop
+        if due:
+            self._dispatch([position])
+
+
+# Общий менеджер процесса, позиции всех ботов; стопы уходят на биржу в фоне
+stops = TrailingStopManager(
+    executor=ThreadPoolExecutor(max_workers=4, thread_name_prefix="trailing-send")
+)
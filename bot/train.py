@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .backtest import compute_bollinger, compute_rsi, load_klines
+from .indicators import FEATURES
+
+CHUNK = 200_000  # свечей в одном блоке расчета признаков
+# Свечи перед блоком для прогрева EWM: вклад отброшенной истории < 1e-16
+WARMUP = 1_000
+# float64: startTime в мс не помещается в мантиссу float32
+FEATURE_DTYPE = np.float64
+PART_COLUMNS = len(FEATURES) + 2  # признаки, метка, startTime
+
+
+def compute_features(close, rsi_window=13, bb_window=19, bb_dev=2):
+    """
+    Матрица признаков FEATURES для каждой свечи серии, векторно.
+    Строка i совпадает с IndicatorEngine.features() после закрытия свечи i.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    rsi = compute_rsi(close, rsi_window)
+    mid, std = compute_bollinger(close, bb_window)
+    high = mid + bb_dev * std
+    low = mid - bb_dev * std
+    band = high - low
+
+    returns = np.full(close.size, np.nan)
+    returns[1:] = close[1:] / close[:-1] - 1
+    variance = (
+        pd.Series(returns * returns, copy=False)
+        .ewm(alpha=1 / bb_window, adjust=False)
+        .mean()
+        .to_numpy()
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position = np.where(band == 0, 0.5, (close - low) / band)
+        return np.column_stack(
+            (
+                rsi / 100,
+                position,
+                band / mid,
+                close / mid - 1,
+                returns,
+                np.sqrt(variance),
+            )
+        )
+
+
+def forward_labels(close, horizon):
+    """
+    Метка свечи i: 1, если close через horizon свечей выше текущего, иначе 0.
+    Для последних horizon свечей метки нет (NaN).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    labels = np.full(close.size, np.nan)
+    if close.size > horizon:
+        labels[:-horizon] = (close[horizon:] > close[:-horizon]).astype(np.float64)
+    return labels
+
+
+def iter_chunks(size, chunk=CHUNK, warmup=WARMUP, horizon=0):
+    """
+    Блоки (lo, hi, out_lo, out_hi): считать по [lo, hi), брать строки [out_lo, out_hi).
+    Каждый блок захватывает warmup свечей слева и horizon справа.
+    """
+    for out_lo in range(0, size, chunk):
+        out_hi = min(out_lo + chunk, size)
+        yield max(out_lo - warmup, 0), min(out_hi + horizon, size), out_lo, out_hi
+
+
+def _build_part(path, part_path, horizon, indicator_kwargs, chunk):
+    """
+    Признаки и метки одного файла свечей блоками, с дозаписью в part_path.
+    Исходные свечи не загружаются целиком, если path - папка архива (memmap).
+    :return: Количество записанных строк
+    """
+    data = load_klines(path)
+    close = data["close"]
+    start = data["start"]
+    rows = 0
+    with open(part_path, "wb") as f:
+        for lo, hi, out_lo, out_hi in iter_chunks(close.size, chunk, WARMUP, horizon):
+            window = np.asarray(close[lo:hi], dtype=np.float64)
+            features = compute_features(window, **indicator_kwargs)
+            labels = forward_labels(window, horizon)
+            part = np.column_stack(
+                (features, labels, start[lo:hi].astype(np.float64))
+            )[out_lo - lo : out_hi - lo]
+            part = part[~np.isnan(part).any(axis=1)]
+            f.write(part.astype(FEATURE_DTYPE).tobytes())
+            rows += len(part)
+    return rows
+
+
+def build_dataset(
+    paths, work_dir, horizon=12, workers=None, chunk=CHUNK, **indicator_kwargs
+):
+    """
+    Набор данных по всем файлам, файлы обрабатываются параллельно.
+    :return: (X, y, start) - признаки, метки и время свечей,
+             строки упорядочены по времени
+    """
+    parts = [os.path.join(work_dir, f"part{i}.bin") for i in range(len(paths))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_build_part, path, part, horizon, indicator_kwargs, chunk)
+            for path, part in zip(paths, parts)
+        ]
+        counts = [future.result() for future in futures]
+
+    total = sum(counts)
+    table = np.lib.format.open_memmap(
+        os.path.join(work_dir, "dataset.npy"),
+        mode="w+",
+        dtype=FEATURE_DTYPE,
+        shape=(total, PART_COLUMNS),
+    )
+    offset = 0
+    for part, count in zip(parts, counts):
+        if count:
+            table[offset : offset + count] = np.memmap(
+                part, dtype=FEATURE_DTYPE, mode="r", shape=(count, PART_COLUMNS)
+            )
+        offset += count
+        os.remove(part)
+
+    # TimeSeriesSplit требует порядка по времени для всех символов вместе
+    order = np.argsort(table[:, -1], kind="stable")
+    features = len(FEATURES)
+    return (
+        table[order, :features],
+        table[order, features].astype(np.int8),
+        table[order, -1].astype(np.int64),
+    )
+
+
+def _metrics(y_true, y_pred):
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision": float(precision_score(y_true, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_true, y_pred, zero_division=0)),
+        "f1": float(f1_score(y_true, y_pred, zero_division=0)),
+    }
+
+
+def train(X, y, n_splits=5, n_estimators=100, max_depth=None, random_state=42):
+    """
+    RandomForest с кросс-валидацией по времени (TimeSeriesSplit),
+    итоговая модель обучается на всех данных.
+    :return: (model, scaler, metrics)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import TimeSeriesSplit
+    from sklearn.preprocessing import StandardScaler
+
+    def fit(X_train, y_train):
+        scaler = StandardScaler().fit(X_train)
+        model = RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            class_weight="balanced",
+            n_jobs=-1,
+            random_state=random_state,
+        )
+        model.fit(scaler.transform(X_train), y_train)
+        return model, scaler
+
+    folds = []
+    for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(X):
+        model, scaler = fit(X[train_idx], y[train_idx])
+        prediction = model.predict(scaler.transform(X[test_idx]))
+        folds.append(_metrics(y[test_idx], prediction))
+
+    metrics = {
+        name: float(np.mean([fold[name] for fold in folds])) for name in folds[0]
+    }
+    metrics["folds"] = folds
+    model, scaler = fit(X, y)
+    return model, scaler, metrics
+
+
+def save_artifact(out_dir, model, scaler, metrics, params):
+    """
+    Пишет версионированный артефакт для TradingModel и JSON с его описанием.
+    :return: Путь к артефакту
+    """
+    import joblib
+
+    version = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"trading_model-{version}.pkl")
+    meta = {
+        "version": version,
+        "features": list(FEATURES),
+        "metrics": metrics,
+        "params": params,
+    }
+    joblib.dump({"model": model, "scaler": scaler, **meta}, path)
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обучение фильтра сигналов TradingModel")
+    parser.add_argument("paths", nargs="+", help="CSV, Parquet или папки архива свечей")
+    parser.add_argument("--horizon", type=int, default=12, help="Горизонт метки, свечей")
+    parser.add_argument("--rsi-window", type=int, default=13)
+    parser.add_argument("--bb-window", type=int, default=19)
+    parser.add_argument("--bb-dev", type=float, default=2)
+    parser.add_argument("--splits", type=int, default=5)
+    parser.add_argument("--estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out-dir", default="models")
+    args = parser.parse_args(argv)
+
+    indicator_kwargs = dict(
+        rsi_window=args.rsi_window, bb_window=args.bb_window, bb_dev=args.bb_dev
+    )
+    work_dir = tempfile.mkdtemp(prefix="train_")
+    try:
+        X, y, start = build_dataset(
+            args.paths, work_dir, args.horizon, args.workers, **indicator_kwargs
+        )
+        model, scaler, metrics = train(
+            X, y, args.splits, args.estimators, args.max_depth
+        )
+        params = dict(
+            indicator_kwargs,
+            horizon=args.horizon,
+            estimators=args.estimators,
+            max_depth=args.max_depth,
+            rows=int(len(y)),
+            start=int(start[0]) if len(start) else None,
+            end=int(start[-1]) if len(start) else None,
+            sources=args.paths,
+        )
+        path = save_artifact(args.out_dir, model, scaler, metrics, params)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Model saved to {path}")
+    print(json.dumps({k: v for k, v in metrics.items() if k != "folds"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
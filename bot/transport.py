@@ -0,0 +1,190 @@
+import re
+import time
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость: без нее JSON разбирает requests
+    orjson = None
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .metrics import metrics
+from .ratelimit import RequestScheduler, match_prefix
+
+# Таймауты (сек) по группам эндпоинтов, совпадение по префиксу пути
+DEFAULT_TIMEOUTS = {
+    "/v5/order/": 3,
+    "/v5/position/": 5,
+    "/v5/market/": 5,
+    "/v5/account/": 10,
+}
+
+
+class FastJSONResponse(Response):
+    """Response, у которого json() разбирается orjson"""
+
+    def json(self, **kwargs):
+        if kwargs:
+            return super().json(**kwargs)
+        return orjson.loads(self.content)
+
+
+# Успешный ответ Bybit начинается с retCode 0, ошибки API приходят с HTTP 200
+_RET_OK = re.compile(rb'^\s*\{\s*"retCode"\s*:\s*0\s*,')
+
+# Класс ответов адаптера: с orjson разбор тела ответа в разы быстрее
+RESPONSE_CLASS = FastJSONResponse if orjson is not None else Response
+
+
+def _clone(response, request):
+    """Копия уже прочитанного ответа для схлопнутого запроса"""
+    clone = RESPONSE_CLASS()
+    clone.status_code = response.status_code
+    clone.headers = CaseInsensitiveDict(response.headers)
+    clone._content = response.content
+    clone.encoding = response.encoding
+    clone.reason = response.reason
+    clone.url = response.url
+    clone.elapsed = response.elapsed
+    clone.request = request
+    clone.connection = response.connection
+    return clone
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter с пулом keep-alive соединений,
+    таймаутами по эндпоинтам и счетчиком открытых/переиспользованных соединений.
+    С планировщиком каждый запрос сначала ждет токен своей группы эндпоинтов.
+    """
+
+    def __init__(self, timeouts=None, pool_size=10, scheduler=None, **kwargs):
+        self.timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self.scheduler = scheduler
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, **kwargs)
+
+    def timeout_for(self, path, default=None):
+        """Таймаут для пути запроса (самый длинный подходящий префикс)"""
+        best = match_prefix(path, self.timeouts)
+        return self.timeouts[best] if best is not None else default
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        response.__class__ = RESPONSE_CLASS
+        return response
+
+    def _send(self, request, path, timeout, kwargs):
+        self.scheduler.acquire(path)
+        response = super().send(request, timeout=timeout, **kwargs)
+        self.scheduler.update(path, response.headers)
+        return response
+
+    def _send_shared(self, request, path, timeout, kwargs):
+        response = self._send(request, path, timeout, kwargs)
+        response.content  # Тело читается сразу, чтобы отдать его всем ожидающим
+        return response
+
+    def send(self, request, timeout=None, **kwargs):
+        path = urlsplit(request.url).path
+        if not metrics.enabled:
+            return self._dispatch(request, path, timeout, kwargs)
+
+        started = time.perf_counter()
+        try:
+            response = self._dispatch(request, path, timeout, kwargs)
+        except Exception:
+            metrics.request(path, time.perf_counter() - started, error=True)
+            raise
+        error = response.status_code >= 400 or not _RET_OK.match(response.content)
+        metrics.request(path, time.perf_counter() - started, error=error)
+        return response
+
+    def _dispatch(self, request, path, timeout, kwargs):
+        timeout = self.timeout_for(path, default=timeout)
+        if self.scheduler is None:
+            return super().send(request, timeout=timeout, **kwargs)
+
+        # Публичные GET рыночных данных с одинаковым URL идут на биржу один раз
+        if (
+            request.method == "GET"
+            and "X-BAPI-API-KEY" not in request.headers
+            and self.scheduler.coalescable(path)
+        ):
+            response, shared = self.scheduler.coalesce(
+                request.url,
+                path,
+                lambda: self._send_shared(request, path, timeout, kwargs),
+            )
+            return _clone(response, request) if shared else response
+        return self._send(request, path, timeout, kwargs)
+
+    def stats(self):
+        """
+        Счетчики по живым пулам соединений.
+        opened - сколько TCP/TLS соединений было установлено,
+        reused - сколько запросов ушло по уже открытому соединению
+        """
+        opened = requests = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            requests += pool.num_requests
+        return {
+            "requests": requests,
+            "opened": opened,
+            "reused": max(requests - opened, 0),
+        }
+
+
+class Transport:
+    """
+    Единый транспорт к Bybit: один pybit HTTP клиент поверх
+    одной requests.Session с пулом соединений.
+    Все методы Bybit ходят на биржу через него,
+    с учетом лимитов запросов Bybit (RequestScheduler).
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        api_secret=None,
+        pool_size=10,
+        timeouts=None,
+        endpoint=None,
+        scheduler=None,
+        **http_kwargs,
+    ):
+        """
+        :param scheduler: RequestScheduler, по умолчанию с лимитами Bybit;
+                          False - без ограничения частоты запросов
+        """
+        # pybit.unified_trading тянет все модули API - только при создании клиента
+        from pybit.unified_trading import HTTP
+
+        if scheduler is None:
+            scheduler = RequestScheduler()
+        self.scheduler = scheduler or None
+        self.adapter = PooledHTTPAdapter(
+            timeouts=timeouts, pool_size=pool_size, scheduler=self.scheduler
+        )
+        self.http = HTTP(api_key=api_key, api_secret=api_secret, **http_kwargs)
+        self.http.client.mount("https://", self.adapter)
+        self.http.client.mount("http://", self.adapter)
+        if endpoint:
+            # Например, локальная заглушка биржи для тестов
+            self.http.endpoint = endpoint.rstrip("/")
+
+    def stats(self):
+        return self.adapter.stats()
+
+    def rate_stats(self):
+        """Время ожидания в очереди и схлопнутые запросы по группам эндпоинтов"""
+        return self.scheduler.stats() if self.scheduler is not None else {}
+
+    def close(self):
+        self.http.client.close()
@@ -1,24 +1,71 @@
+import asyncio
 import os
 
-from pybit import exceptions
-from bot import Bot, setup_logger
 from dotenv import load_dotenv
+
+# .env загружается до модулей бота: их настройки (логи, метрики) читаются из окружения
+load_dotenv()
+
+from pybit import exceptions
+from bot import setup_logger, shutdown_logging
+from bot.metrics import metrics
 import traceback
 
 # Настройка логгера
 logger = setup_logger(__name__)
 
-
-load_dotenv()
-
 if __name__ == "__main__":
     try:
-        # Запуск бота
-        bot = Bot(
-            max_usdt_to_spend=os.getenv("CAPITAL"),
-            interval=int(os.getenv("INTERVAL")),
-        )
-        bot.run()
+        # Сбор метрик (METRICS=1) включается явно, уже с загруженным .env
+        if os.getenv("METRICS") == "1":
+            metrics.enable()
+        # Метрики: http://127.0.0.1:METRICS_PORT/metrics и/или файл METRICS_DUMP
+        if os.getenv("METRICS_PORT"):
+            metrics.enable()
+            metrics.serve(int(os.getenv("METRICS_PORT")))
+        if os.getenv("METRICS_DUMP"):
+            metrics.enable()
+            metrics.start_dump(
+                os.getenv("METRICS_DUMP"), int(os.getenv("METRICS_DUMP_INTERVAL", 60))
+            )
+        # Bot, AsyncRunner и модель импортируются только для выбранного режима
+        model = None
+        if os.getenv("ML_FILTER") == "1":
+            # Фильтр сигналов моделью (trading_model.pkl или MODEL_PATH)
+            from bot.ml_model import TradingModel
+
+            model = TradingModel()
+            # Загружаем сразу: без модели фильтр включен только на словах
+            try:
+                model.load_model()
+            except Exception as e:
+                logger.error(f"ML_FILTER=1, but the model can't be loaded: {e}")
+                raise SystemExit(1)
+        if os.getenv("SYMBOLS"):
+            from bot import AsyncRunner
+
+            # Несколько символов в одном процессе
+            runner = AsyncRunner.from_symbols(
+                symbols=os.getenv("SYMBOLS").split(","),
+                capital=os.getenv("CAPITAL"),
+                interval=int(os.getenv("INTERVAL")),
+                rate_limit=int(os.getenv("RATE_LIMIT", 100)),
+                model=model,
+            )
+            asyncio.run(runner.run())
+        else:
+            from bot import Bot
+
+            # Запуск бота
+            bot = Bot(
+                max_usdt_to_spend=os.getenv("CAPITAL"),
+                interval=int(os.getenv("INTERVAL")),
+                model=model,
+            )
+            if os.getenv("MODE") == "stream":
+                bot.run_stream(interval=os.getenv("KLINE_INTERVAL", "5"))
+            else:
+                bot.run()
         print("Bot run!")
     except KeyboardInterrupt:
         logger.info("Бот остановлен вручную!")
@@ -31,3 +78,6 @@ if __name__ == "__main__":
         logger.error(traceback.format_exc())
     finally:
         logger.info("Bot has been stopped.")
+        metrics.stop()
+        # Дописываем очередь логов на диск до выхода
+        shutdown_logging()
@@ -0,0 +1,96 @@
+import os
+import time
+
+import numpy as np
+
+from bot.archive import COLUMNS, KlineArchive
+from bot.backtest import load_klines
+
+MINUTE = 60_000
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % MINUTE
+
+
+def kline(start):
+    price = 100 + (start - T0) / MINUTE
+    return [str(start), str(price), str(price + 1), str(price - 1), str(price + 0.5), "10", "1000"]
+
+
+class FakeKlines:
+    """get_kline: свечи раз в минуту, от новых к старым, как у Bybit"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_kline(self, category, symbol, interval, start, end, limit):
+        self.calls.append((start, end))
+        first = start + (-start) % MINUTE
+        rows = [kline(t) for t in range(first, end + 1, MINUTE)][-limit:]
+        return {"retCode": 0, "result": {"list": rows[::-1]}}
+
+
+def test_sync_paginates_and_appends_incrementally(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    client = FakeKlines()
+
+    now = T0 + 2500 * MINUTE + 30_000  # последняя свеча еще формируется
+    assert archive.sync(client, "BTCUSDT", "1", since=T0, now=now) == 2500
+    assert len(client.calls) == 3
+    assert archive.last_start("BTCUSDT", "1") == T0 + 2499 * MINUTE
+
+    # Повторный запуск догружает только новые свечи
+    client.calls.clear()
+    later = now + 10 * MINUTE
+    assert archive.sync(client, "BTCUSDT", "1", now=later) == 10
+    assert client.calls == [(T0 + 2500 * MINUTE, later - MINUTE)]
+
+    data = archive.read("BTCUSDT", "1")
+    assert len(data["start"]) == 2510
+    assert np.all(np.diff(data["start"]) == MINUTE)
+    assert data["close"][0] == 100.5
+    assert data["start"].dtype == np.int64
+
+
+def test_range_read_is_zero_copy(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    archive.append("BTCUSDT", "1", "linear", [kline(T0 + i * MINUTE) for i in range(100)])
+
+    data = archive.read("BTCUSDT", "1", start=T0 + 10 * MINUTE, end=T0 + 20 * MINUTE)
+    assert data["start"][0] == T0 + 10 * MINUTE
+    assert len(data["close"]) == 10
+    assert isinstance(data["close"], np.memmap)
+
+
+def test_duplicates_and_torn_writes(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    rows = [kline(T0 + i * MINUTE) for i in range(10)]
+    archive.append("BTCUSDT", "1", "linear", rows)
+    assert archive.append("BTCUSDT", "1", "linear", rows[5:]) == 0
+
+    # Оборванная запись: колонка close длиннее остальных
+    path = os.path.join(str(tmp_path), "linear", "BTCUSDT", "1", "close.bin")
+    with open(path, "ab") as f:
+        f.write(np.float64(1).tobytes())
+    assert archive.count("BTCUSDT", "1") == 10
+
+    archive.append("BTCUSDT", "1", "linear", [kline(T0 + 10 * MINUTE)])
+    data = archive.read("BTCUSDT", "1")
+    assert all(len(data[column]) == 11 for column in COLUMNS)
+    assert data["close"][-1] == float(kline(T0 + 10 * MINUTE)[4])
+
+
+def test_year_of_minutes_loads_fast(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    n = 366 * 1440
+    folder = os.path.join(str(tmp_path), "linear", "BTCUSDT", "1")
+    os.makedirs(folder)
+    for column in COLUMNS:
+        dtype = np.int64 if column == "start" else np.float64
+        values = T0 + np.arange(n, dtype=np.int64) * MINUTE if column == "start" else np.ones(n)
+        values.astype(dtype).tofile(os.path.join(folder, f"{column}.bin"))
+
+    start = time.perf_counter()
+    data = load_klines(folder)
+    elapsed = time.perf_counter() - start
+
+    assert len(data["close"]) == n
+    assert elapsed < 0.05
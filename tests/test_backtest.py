@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ta.momentum import RSIIndicator
+from ta.volatility import BollingerBands
+
+from bot.backtest import (
+    Backtester,
+    TRADE_FIELDS,
+    compute_indicators,
+    floor_qty,
+    load_klines,
+)
+
+
+def bars(close, spread=0.0):
+    close = np.asarray(close, dtype=np.float64)
+    return {
+        "open": close.copy(),
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+    }
+
+
+def signal_mask(n, indices):
+    mask = np.zeros(n, dtype=bool)
+    mask[list(indices)] = True
+    return mask
+
+
+def trade(result, i=0):
+    return dict(zip(TRADE_FIELDS, result.trades[i]))
+
+
+def test_indicators_match_ta():
+    rng = np.random.default_rng(7)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1, 2000)), 2)
+    rsi, high, low, mid = compute_indicators(close)
+
+    series = pd.Series(close)
+    bollinger = BollingerBands(series, window=19, window_dev=2)
+    np.testing.assert_array_equal(rsi, RSIIndicator(series, window=13).rsi())
+    np.testing.assert_array_equal(high, bollinger.bollinger_hband())
+    np.testing.assert_array_equal(low, bollinger.bollinger_lband())
+    np.testing.assert_array_equal(mid, bollinger.bollinger_mavg())
+
+
+def test_long_closed_by_opposite_signal():
+    close = [10, 10, 10, 11, 12, 13, 14, 14]
+    n = len(close)
+    backtester = Backtester(min_notional=20, qty_decimals=1, fee=0)
+    result = backtester.run(
+        bars(close), buy=signal_mask(n, [1]), sell=signal_mask(n, [5])
+    )
+
+    assert result.metrics["trades"] == 1
+    t = trade(result)
+    assert (t["entry_idx"], t["exit_idx"], t["side"]) == (1, 5, 1)
+    # Размер считается тем же округлением вниз, что и в Bot._floor
+    assert t["qty"] == floor_qty(20 / 10, 1)
+    assert t["pnl"] == pytest.approx(3 * t["qty"])
+
+
+def test_trailing_stop_exit_uses_previous_peak():
+    close = [10, 10, 12, 14, 13, 11, 10, 10]
+    n = len(close)
+    backtester = Backtester(qty_decimals=1, trailing_stop=2, fee=0)
+    result = backtester.run(
+        bars(close, spread=0.5), buy=signal_mask(n, [0]), sell=signal_mask(n, [])
+    )
+
+    t = trade(result)
+    # Пик 14.5 на свече 3 дает стоп 12.5, его касается минимум свечи 4
+    assert t["exit_idx"] == 4
+    assert t["exit"] == 12.5
+
+    # Гэп ниже стопа исполняется по open
+    gapped = bars(close, spread=0.5)
+    gapped["open"][4] = 12.0
+    t = trade(backtester.run(gapped, buy=signal_mask(n, [0]), sell=signal_mask(n, [])))
+    assert t["exit"] == 12.0
+
+
+def test_entries_below_min_qty_are_skipped():
+    close = [100.0] * 6
+    n = len(close)
+    backtester = Backtester(min_notional=20, qty_decimals=0, fee=0)
+    result = backtester.run(
+        bars(close), buy=signal_mask(n, [1, 3]), sell=signal_mask(n, [])
+    )
+    assert result.metrics["trades"] == 0
+
+
+def test_drawdown_and_pnl():
+    close = [10, 12, 8, 8, 12, 13, 9]
+    n = len(close)
+    backtester = Backtester(qty_decimals=2, fee=0)
+    result = backtester.run(
+        bars(close),
+        buy=signal_mask(n, [0, 3]),
+        sell=signal_mask(n, [1, 2, 5]),
+    )
+
+    # Сигнал на выход не открывает встречную позицию:
+    # long 0->1, short 2->3, затем short 5 до конца данных
+    entries = [trade(result, i)["entry_idx"] for i in range(3)]
+    assert entries == [0, 2, 5]
+    pnl = result.trades[:, TRADE_FIELDS.index("pnl")]
+    assert pnl[0] > 0 and pnl[1] == 0 and pnl[2] > 0
+    assert result.metrics["pnl"] == pytest.approx(pnl.sum())
+    assert result.metrics["max_drawdown"] == 0.0
+    assert result.metrics["win_rate"] == pytest.approx(2 / 3)
+
+
+def test_load_klines_sorts_chronologically(tmp_path):
+    path = tmp_path / "klines.csv"
+    pd.DataFrame(
+        {
+            "startTime": [180000, 120000, 60000],
+            "open": [3, 2, 1],
+            "high": [3, 2, 1],
+            "low": [3, 2, 1],
+            "close": [3.5, 2.5, 1.5],
+        }
+    ).to_csv(path, index=False)
+
+    data = load_klines(str(path))
+    assert list(data["start"]) == [60000, 120000, 180000]
+    assert list(data["close"]) == [1.5, 2.5, 3.5]
+    assert data["start"].dtype == np.int64
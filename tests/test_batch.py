@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bot.api import UNKNOWN_ORDER
+from bot.batch import OrderBatcher
+from tests.test_bot import bot, exchange  # noqa: F401
+
+BUY = dict(side="Buy", orderType="Market", qty="0.001")
+
+
+def test_place_orders_split_by_category_limit(bot, exchange):  # noqa: F811
+    results = bot.place_orders([dict(BUY) for _ in range(25)])
+    assert exchange.requests["/v5/order/create-batch"] == 2  # 20 + 5
+    assert exchange.requests["/v5/order/create"] == 0
+    assert len(results) == 25 and all(results.values())
+    for link_id, order_id in results.items():
+        assert exchange.orders[order_id]["orderLinkId"] == link_id
+        assert bot.book.get(link_id=link_id)["orderId"] == order_id
+
+    bot.place_orders([dict(BUY, category="spot") for _ in range(12)])
+    assert exchange.requests["/v5/order/create-batch"] == 4  # spot: 10 + 2
+
+
+def test_rejected_orders_fall_back_to_single_requests(bot, exchange):  # noqa: F811
+    orders = [dict(BUY, orderLinkId=f"ok-{i}") for i in range(3)]
+    orders.append(dict(BUY, qty="0.0001", orderLinkId="bad"))
+    results = bot.place_orders(orders)
+    assert exchange.requests["/v5/order/create-batch"] == 1
+    # Повтор только отклоненной заявки, биржа снова ее отклоняет
+    assert exchange.requests["/v5/order/create"] == 1
+    assert results["bad"] is None
+    assert all(results[f"ok-{i}"] for i in range(3))
+
+    # Упал весь batch-запрос - все заявки уходят по одной
+    exchange.inject("/v5/order/create-batch", code=10016)
+    results = bot.place_orders([dict(BUY) for _ in range(3)])
+    assert exchange.requests["/v5/order/create"] == 4
+    assert all(results.values())
+
+
+def test_batch_accepted_before_timeout_is_not_resent(bot, exchange, monkeypatch):  # noqa: F811
+    place_batch_order = bot.client.place_batch_order
+
+    def accepted_then_timeout(**kwargs):
+        place_batch_order(**kwargs)
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    monkeypatch.setattr(bot.client, "place_batch_order", accepted_then_timeout)
+    results = bot.place_orders([dict(BUY) for _ in range(3)])
+    # Заявки найдены по orderLinkId, повторов-дубликатов нет
+    assert exchange.requests["/v5/order/create"] == 0
+    assert len(exchange.orders) == 3
+    for link_id, order_id in results.items():
+        assert exchange.orders[order_id]["orderLinkId"] == link_id
+        assert bot.book.get(link_id=link_id)["orderStatus"] == "Filled"
+
+    # Поиск тоже упал: заявка не считается неразмещенной
+    def lookup_failed(**kwargs):
+        raise requests.exceptions.ConnectionError("connection reset")
+
+    monkeypatch.setattr(bot.client, "get_open_orders", lookup_failed)
+    results = bot.place_orders([dict(BUY)])
+    assert list(results.values()) == [UNKNOWN_ORDER]
+    assert exchange.requests["/v5/order/create"] == 0
+    assert len(bot.book) == 3
+
+
+def test_amend_and_cancel_batches(bot, exchange):  # noqa: F811
+    price = bot.get_symbol_price()
+    limits = [
+        dict(side="Buy", orderType="Limit", qty="0.001", price=str(round(price / 2, 1)))
+        for _ in range(3)
+    ]
+    placed = bot.place_orders(limits)
+    links = list(placed)
+
+    amended = bot.amend_orders([dict(orderLinkId=link, qty="0.002") for link in links])
+    assert exchange.requests["/v5/order/amend-batch"] == 1
+    assert amended == placed
+    assert all(exchange.orders[placed[link]]["qty"] == "0.002" for link in links)
+    assert bot.book.get(link_id=links[0])["qty"] == "0.002"
+
+    assert bot.cancel_order(order_id=placed[links[0]]) == placed[links[0]]
+    cancelled = bot.cancel_orders([dict(orderLinkId=link) for link in links[1:]])
+    assert exchange.requests["/v5/order/cancel-batch"] == 2
+    assert all(cancelled.values())
+    assert all(exchange.orders[placed[link]]["orderStatus"] == "Cancelled" for link in links)
+    assert bot.book.get(link_id=links[1])["orderStatus"] == "Cancelled"
+
+    # Отмена уже отмененной заявки: отказ в batch и в повторе
+    assert bot.cancel_order(link_id=links[0]) is None
+    assert exchange.requests["/v5/order/cancel"] == 1
+
+
+def test_order_batcher_joins_concurrent_orders(bot, exchange):  # noqa: F811
+    bot.order_batcher = OrderBatcher(bot.place_orders, window=0.05)
+    with ThreadPoolExecutor(8) as pool:
+        order_ids = list(pool.map(lambda _: bot.submit_order("Buy", 0.001), range(8)))
+    assert all(order_ids) and len(set(order_ids)) == 8
+    assert bot.order_batcher.batches == 1
+    assert exchange.requests["/v5/order/create-batch"] == 1
+    assert exchange.requests["/v5/order/create"] == 0
+    assert bot.book.get(link_id=bot.position_id)["orderId"] in order_ids
+
+
+def test_order_batcher_falls_back_to_single_order():
+    sent = []
+    # Окно batch никогда не закрывается: заявка уходит через fallback
+    batcher = OrderBatcher(sent.append, window=0.01, schedule=lambda delay, flush: None)
+    order = dict(BUY, category="linear", orderLinkId="late")
+    assert batcher.place(order, timeout=0.05, fallback=lambda o: "single-id") == "single-id"
+    batcher.flush()
+    assert sent == []  # из batch заявка забрана, дубля нет
@@ -1,44 +1,106 @@
+from dataclasses import replace
+
+import numpy as np
 import pytest
-from bot import Bot  # Импортируйте ваш класс
+
+from bot import Bot, instruments, orders
+from bot.health import HealthMonitor
+from bot.sandbox import SandboxExchange
+from bot.transport import Transport
+
+
+@pytest.fixture
+def exchange():
+    with SandboxExchange(symbols=["BTCUSDT"], limits={}) as exchange:
+        yield exchange
 
 
 @pytest.fixture
-def bot():
-    """Фикстура для инициализации бота."""
-    return Bot(max_usdt_to_spend=100)
+def bot(exchange, monkeypatch):
+    """Бот, подключенный к локальной замене биржи"""
+    monkeypatch.setenv("SYMBOL", "BTCUSDT")
+    monkeypatch.setenv("TRAILING_PERCENT", "50")
+    monkeypatch.setattr(instruments, "registry", instruments.InstrumentRegistry(path=None))
+    monkeypatch.setattr(orders, "book", orders.OrderBook(path=None))
+    transport = Transport(endpoint=exchange.url, api_key="key", api_secret="secret")
+    bot = Bot(
+        max_usdt_to_spend=100,
+        transport=transport,
+        health=HealthMonitor(transport.http),
+    )
+    yield bot
+    transport.close()
+
+
+def test_instrument_filters_from_exchange(bot):
+    """Фильтры инструмента приходят из get_instruments_info"""
+    assert (bot.price_decimals, bot.qty_decimals, bot.min_qty) == (1, 3, 0.001)
 
 
 def test_adjust_qty(bot):
-    """Проверяет корректировку количества."""
-    assert (
-        bot.adjust_qty(0.0001) == 0.001
-    )  # Пример значения, которое корректируется до минимального допустимого
-    assert (
-        bot.adjust_qty(1.23456) == 1.234
-    )  # Пример округления количества до нужного знака
+    """Количество не меньше допустимого минимума и округляется вниз до шага"""
+    assert bot.adjust_qty(1.23456) == 1.23456
+    assert bot.floor_qty(1.23456) == pytest.approx(1.234)
+    # Минимальная сумма ордера - из фильтров инструмента (в песочнице 5 USDT)
+    assert bot.get_valid_order_qty(2000) == pytest.approx(0.002)
+
+
+def test_valid_order_qty_falls_back_without_min_notional(bot, monkeypatch):
+    """Без minNotionalValue у инструмента минимум ордера - 20 USDT"""
+    monkeypatch.setattr(bot, "instrument", replace(bot.instrument, min_notional=0.0))
+    assert bot.get_valid_order_qty(2000) == pytest.approx(0.01)
 
 
 def test_generate_signal(bot):
-    """Проверяет генерацию торгового сигнала."""
-    # Создаем пример данных
-    import pandas as pd
-
-    data = pd.DataFrame(
-        {
-            "close": [100, 105, 102, 108, 107],
-            "high": [101, 106, 103, 109, 108],
-            "low": [99, 104, 101, 107, 106],
-        }
+    """Сигнал по свечам биржи: None или 0/1, после прогрева индикаторов"""
+    data = bot.get_klines(interval="1", limit=200)
+    assert len(data) == 200
+    assert bot.generate_signal(data) in (None, 0, 1)
+    assert bot.indicators.latest is not None
+
+    # Резкое падение после спокойного рынка - сигнал на покупку
+    closes = np.r_[np.full(60, 100.0), np.linspace(100, 80, 10)]
+    keys = np.arange(closes.size, dtype=np.int64) * 60_000
+    bot.indicators.reset()
+    data = np.zeros(closes.size, dtype=data.dtype)
+    data["start"], data["close"] = keys, closes
+    assert bot.generate_signal(data) == 1
+
+
+def test_execute_trade(bot, exchange):
+    """Ордер исполняется на бирже, трейлинг стоп ставится на открытую позицию"""
+    bot.get_valid_order_qty = lambda price: 0.001
+    order_id = bot.execute_trade_by_base(1)
+    assert order_id is not None
+    assert bot.stop_future.result() is True
+
+    assert exchange.orders[order_id]["orderStatus"] == "Filled"
+    position = exchange.positions["BTCUSDT"]
+    assert (position["side"], position["size"], position["trailingStop"]) == (
+        "Buy",
+        "0.001",
+        "50",
     )
+    assert bot.book.get(order_id=order_id)["side"] == "Buy"
+    assert bot.latency_stats()["orders"] == 1
+
+
+def test_is_position_fetches_fill_of_new_order(bot, exchange):
+    """Исполнение рыночного ордера без приватного потока запрашивается один раз"""
+    bot.get_valid_order_qty = lambda price: 0.001
+    order_id = bot.execute_trade_by_base(1)
+    assert bot.book.get(order_id=order_id)["orderStatus"] == "New"
 
-    signal = bot.generate_signal(data)
-    assert signal in [0, 1]  # Проверяем, что сигнал является валидным (0 или 1)
+    assert bot.is_position()
+    assert bot.book.get(order_id=order_id)["orderStatus"] == "Filled"
+    assert exchange.requests["/v5/order/realtime"] == 1
+    assert exchange.requests["/v5/order/history"] == 1
+    assert bot.is_position()
+    assert exchange.requests["/v5/order/realtime"] == 1
 
 
-def test_execute_trade(bot):
-    """Проверяет выполнение торговой операции."""
-    signal = 1  # Покупка
-    qty = 0.001
-    bot.execute_trade(signal, qty)
-    # Предположим, что метод `place_order` возвращает некоторый объект
-    # Добавьте проверки, если есть ожидаемые значения для результатов
+def test_exchange_errors_are_reported(bot, exchange):
+    """Ошибки биржи не роняют бота"""
+    exchange.inject("/v5/order/create", code=10001, message="Qty invalid")
+    assert bot.place_order("Buy", 0.001) is None
+    assert bot.get_symbol_price() > 0
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from pybit import exceptions
+
+from bot.health import HealthMonitor
+from bot.runner import AsyncRunner
+
+
+def wallet(balance):
+    return {
+        "retCode": 0,
+        "result": {"list": [{"accountType": "UNIFIED", "totalAvailableBalance": balance}]},
+    }
+
+
+class FakeAccount:
+    """get_wallet_balance с заданной последовательностью ответов"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get_wallet_balance(self, **args):
+        self.calls += 1
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def bybit_error(cls, code):
+    return cls(request="wallet", message="error", status_code=code, time=0, resp_headers={})
+
+
+def test_balance_is_cached_between_refreshes():
+    client = FakeAccount(wallet("150.5"))
+    health = HealthMonitor(client, interval=60)
+    health.start()
+    try:
+        assert health.balance == 150.5
+        for _ in range(1000):
+            assert health.can_trade(100)
+        assert not health.can_trade(200)
+        assert client.calls == 1
+    finally:
+        health.stop()
+
+
+def test_background_refresh():
+    client = FakeAccount(wallet("10"), wallet("50"))
+    health = HealthMonitor(client, interval=0.01)
+    health.start()
+    try:
+        deadline = time.monotonic() + 2
+        while health.balance != 50 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert health.balance == 50
+    finally:
+        health.stop()
+
+
+def test_only_auth_failure_blocks_trading():
+    health = HealthMonitor(
+        FakeAccount(
+            wallet("100"),
+            bybit_error(exceptions.FailedRequestError, 502),
+            bybit_error(exceptions.InvalidRequestError, 10003),
+        )
+    )
+    assert health.refresh()
+
+    # Сетевой сбой: остается последний известный баланс
+    assert not health.refresh()
+    assert health.trading_allowed
+    assert health.balance == 100
+
+    # Ключ отклонен биржей
+    assert not health.refresh()
+    assert not health.trading_allowed
+    assert not health.can_trade(1)
+
+
+def test_wallet_stream_updates_balance():
+    health = HealthMonitor(FakeAccount(wallet("1")))
+    health.handle_wallet(
+        {"topic": "wallet", "data": [{"accountType": "UNIFIED", "totalAvailableBalance": "42"}]}
+    )
+    assert health.balance == 42
+    assert health.requests == 0
+
+
+class FakeBot:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def get_klines(self):
+        return None
+
+
+def test_runner_checks_keys_once_for_all_bots():
+    client = FakeAccount(wallet("100"))
+    health = HealthMonitor(client, interval=60)
+    bots = [FakeBot(f"SYM{i}USDT") for i in range(10)]
+    runner = AsyncRunner(bots, interval=0, rate_limit=10_000, health=health)
+
+    asyncio.run(runner.run(iterations=5))
+    runner.stop()
+
+    assert runner.ticks == 50
+    assert client.calls == 1
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ta.momentum import RSIIndicator
+from ta.trend import MACD
+from ta.volatility import BollingerBands
+
+from bot.indicators import MODEL_FEATURES, IndicatorEngine, RingBuffer
+
+
+def random_walk(seed, n=1000):
+    rng = np.random.default_rng(seed)
+    return np.round(100 + np.cumsum(rng.normal(0, 1, n)), 2)
+
+
+def ta_reference(closes):
+    """Значения индикаторов, посчитанные библиотекой ta по всей серии"""
+    series = pd.Series(closes)
+    bollinger = BollingerBands(series, window=19, window_dev=2)
+    return {
+        "RSI": RSIIndicator(series, window=13).rsi().to_numpy(),
+        "Bollinger_High": bollinger.bollinger_hband().to_numpy(),
+        "Bollinger_Low": bollinger.bollinger_lband().to_numpy(),
+        "Bollinger_Mid": bollinger.bollinger_mavg().to_numpy(),
+    }
+
+
+def same(a, b):
+    return (np.isnan(a) and np.isnan(b)) or a == b
+
+
+def test_ring_buffer_evicts_oldest():
+    buffer = RingBuffer(3)
+    assert [buffer.push(v) for v in (1, 2, 3)] == [None, None, None]
+    assert buffer.push(4) == 1
+    assert buffer.push(5) == 2
+    assert len(buffer) == 3
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_engine_is_bit_compatible_with_ta(seed):
+    """Потоковый расчет побитово совпадает с ta на каждой свече"""
+    closes = random_walk(seed)
+    # Участок с повторяющимися ценами проверяет ветки pandas для одинаковых значений
+    closes[300:340] = closes[300]
+    reference = ta_reference(closes)
+
+    engine = IndicatorEngine()
+    for i, close in enumerate(closes):
+        result = engine.update(close, key=i)
+        for name, values in reference.items():
+            assert same(result[name], values[i]), (name, i)
+
+
+def test_legacy_features_match_ta_macd():
+    closes = random_walk(5, n=300)
+    macd = MACD(pd.Series(closes))
+    reference = {
+        "macd": macd.macd().to_numpy(),
+        "macd_signal": macd.macd_signal().to_numpy(),
+        "macd_diff": macd.macd_diff().to_numpy(),
+        "close_diff": np.diff(closes, prepend=np.nan),
+    }
+
+    engine = IndicatorEngine()
+    for i, close in enumerate(closes):
+        engine.update(close, key=i)
+        features = dict(zip(MODEL_FEATURES, engine.model_features()))
+        assert features["close"] == close
+        for name, values in reference.items():
+            np.testing.assert_allclose(features[name], values[i], rtol=1e-9, atol=1e-12)
+
+
+def test_peek_does_not_change_state():
+    closes = random_walk(4, n=100)
+    engine = IndicatorEngine()
+    engine.seed(closes[:-1])
+
+    first = engine.peek(closes[-1])
+    second = engine.peek(closes[-1] + 5)
+    assert engine.peek(closes[-1]) == first
+    assert first != second
+
+    reference = ta_reference(closes)
+    for name, values in reference.items():
+        assert same(first[name], values[-1])
+
+
+def test_sync_only_consumes_new_candles():
+    closes = random_walk(5, n=300)
+    keys = np.arange(300) * 60_000
+    reference = ta_reference(closes[:251])
+
+    engine = IndicatorEngine()
+    engine.sync(keys[:200], closes[:200])
+    assert engine.last_key == keys[198]
+
+    # Окно сдвинулось на несколько свечей - досчитываются только новые
+    result = engine.sync(keys[51:251], closes[51:251])
+    assert engine.last_key == keys[249]
+    for name, values in reference.items():
+        assert same(result[name], values[-1])
+
+
+def test_sync_reseeds_after_gap():
+    closes = random_walk(6, n=600)
+    keys = np.arange(600)
+
+    engine = IndicatorEngine()
+    engine.sync(keys[:200], closes[:200])
+    result = engine.sync(keys[400:600], closes[400:600])
+
+    reference = ta_reference(closes[400:600])
+    assert engine.last_key == keys[598]
+    for name, values in reference.items():
+        assert same(result[name], values[-1])
@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from bot.instruments import InstrumentInfo, InstrumentRegistry
+
+
+def instrument(symbol, min_qty="0.001", price_scale="2"):
+    return {
+        "symbol": symbol,
+        "priceScale": price_scale,
+        "priceFilter": {"tickSize": "0.10"},
+        "lotSizeFilter": {
+            "minOrderQty": min_qty,
+            "maxOrderQty": "100",
+            "qtyStep": min_qty,
+            "minNotionalValue": "5",
+        },
+    }
+
+
+class FakeClient:
+    """Две страницы инструментов, как get_instruments_info с cursor"""
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.calls = []
+
+    def get_instruments_info(self, **args):
+        self.calls.append(args)
+        half = len(self.symbols) // 2
+        if "cursor" not in args:
+            page, cursor = self.symbols[:half], "page2"
+        else:
+            page, cursor = self.symbols[half:], ""
+        return {
+            "retCode": 0,
+            "result": {
+                "list": [instrument(s) for s in page],
+                "nextPageCursor": cursor,
+            },
+        }
+
+
+SYMBOLS = [f"SYM{i}USDT" for i in range(200)]
+
+
+def test_info_parses_filters():
+    info = InstrumentInfo.from_api(instrument("BTCUSDT", min_qty="0.001"))
+    assert (info.price_decimals, info.qty_decimals, info.min_qty) == (2, 3, 0.001)
+    assert info.tick_size == 0.1
+    assert info.min_notional == 5.0
+    assert info.max_qty == 100.0
+
+
+def test_bulk_load_serves_all_symbols_from_memory(tmp_path):
+    client = FakeClient(SYMBOLS)
+    registry = InstrumentRegistry(path=str(tmp_path / "instruments.json"))
+
+    for symbol in SYMBOLS:
+        assert registry.get(symbol, client=client).symbol == symbol
+
+    # Две страницы на всю категорию вместо запроса на каждый символ
+    assert len(client.calls) == 2
+    assert client.calls[1]["cursor"] == "page2"
+
+
+def test_warm_cache_needs_no_requests(tmp_path):
+    path = str(tmp_path / "instruments.json")
+    InstrumentRegistry(path=path).get("SYM1USDT", client=FakeClient(SYMBOLS))
+
+    client = FakeClient(SYMBOLS)
+    restarted = InstrumentRegistry(path=path)
+    for symbol in SYMBOLS:
+        restarted.get(symbol, client=client)
+    assert client.calls == []
+
+
+def test_expired_cache_is_reloaded(tmp_path, monkeypatch):
+    path = str(tmp_path / "instruments.json")
+    InstrumentRegistry(path=path, ttl=60).get("SYM1USDT", client=FakeClient(SYMBOLS))
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    client = FakeClient(SYMBOLS)
+    InstrumentRegistry(path=path, ttl=60).get("SYM1USDT", client=client)
+    assert len(client.calls) == 2
+
+
+def test_unknown_symbol(tmp_path):
+    client = FakeClient(SYMBOLS)
+    registry = InstrumentRegistry(path=None)
+    registry.get("SYM1USDT", client=client)
+
+    with pytest.raises(KeyError):
+        registry.get("NOPEUSDT", client=client)
+    # Неизвестный символ вызывает одну перезагрузку категории
+    assert len(client.calls) == 4
+
+    # Промах запоминается до истечения TTL
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            registry.get("NOPEUSDT", client=client)
+    assert len(client.calls) == 4
+
+
+def test_exchange_error_keeps_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "instruments.json")
+    InstrumentRegistry(path=path, ttl=60).get("SYM1USDT", client=FakeClient(SYMBOLS))
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    client = FakeClient(SYMBOLS)
+    client.get_instruments_info = lambda **args: {"retCode": 10006, "retMsg": "Too many visits"}
+    registry = InstrumentRegistry(path=path, ttl=60)
+    # Устаревший кэш лучше, чем ничего: ошибка биржи его не затирает
+    assert registry.get("SYM1USDT", client=client).symbol == "SYM1USDT"
+    with pytest.raises(KeyError):
+        registry.get("NOPEUSDT", client=client)
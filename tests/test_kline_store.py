@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from bot import Bybit
+from bot.kline_store import KLINE_DTYPE, KlineSeries, KlineStore, parse_klines
+
+MINUTE = 60_000
+
+
+def kline(i, close=None):
+    close = 100 + i if close is None else close
+    return [str(i * MINUTE), "1", "2", "0.5", str(close), "10", "1000"]
+
+
+def test_merge_replaces_forming_candle_and_appends():
+    series = KlineSeries()
+    series.replace([kline(i) for i in range(5)])
+
+    ok, appended = series.merge([kline(4, close=1), kline(5), kline(6)])
+    assert ok and appended == 2
+    assert series.last_start == 6 * MINUTE
+    assert series.closes().loc[4 * MINUTE] == 1.0
+    assert len(series) == 7
+
+
+def test_merge_detects_gap():
+    series = KlineSeries(interval_ms=MINUTE)
+    series.replace([kline(i) for i in range(5)])
+    assert series.merge([kline(7), kline(8)]) == (False, 0)
+    assert series.last_start == 4 * MINUTE
+
+    # Следующая по порядку свеча (например, из потока) разрывом не считается
+    assert series.merge([kline(5)]) == (True, 1)
+
+
+def test_closes_cached_until_changed():
+    series = KlineSeries()
+    series.replace([kline(i) for i in range(5)])
+
+    first = series.closes(limit=3)
+    assert list(first.index) == [2 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert series.closes(limit=3) is first
+    series.merge([kline(4)])
+    assert series.closes(limit=3) is first
+
+    series.merge([kline(4, close=50)])
+    assert series.closes(limit=3) is not first
+
+
+def test_parse_klines_into_preallocated_array():
+    out = np.empty(10, dtype=KLINE_DTYPE)
+    # Bybit отдает свечи от новых к старым
+    rows = parse_klines([kline(2), kline(1), kline(0)], out=out, newest_first=True)
+
+    assert np.shares_memory(rows, out)
+    assert rows.dtype == KLINE_DTYPE
+    assert list(rows["start"]) == [0, MINUTE, 2 * MINUTE]
+    assert list(rows["close"]) == [100.0, 101.0, 102.0]
+    assert rows["turnover"][0] == 1000.0
+
+
+def test_view_is_zero_copy_and_bounded():
+    series = KlineSeries(maxlen=5, interval_ms=MINUTE)
+    series.replace([kline(i) for i in range(5)])
+    view = series.view(3)
+    assert np.shares_memory(view, series.view())
+
+    for i in range(5, 40):
+        series.merge([kline(i)])
+    assert len(series) == 5
+    assert list(series.view()["start"]) == [i * MINUTE for i in range(35, 40)]
+
+
+def test_store_persists_history(tmp_path):
+    store = KlineStore(cache_dir=str(tmp_path))
+    store.get("BTCUSDT", "5", "linear").replace([kline(i) for i in range(3)])
+    store.save("BTCUSDT", "5", "linear")
+
+    restored = KlineStore(cache_dir=str(tmp_path)).get("BTCUSDT", 5, "linear")
+    assert restored.last_start == 2 * MINUTE
+    assert list(restored.closes()) == [100.0, 101.0, 102.0]
+
+
+@pytest.fixture
+def bybit(monkeypatch):
+    monkeypatch.setenv("SYMBOL", "BTCUSDT")
+    return Bybit()
+
+
+def test_close_prices_fetches_only_delta(bybit, monkeypatch):
+    calls = []
+    history = [kline(i) for i in range(200)]
+
+    def fake_fetch(**args):
+        calls.append(args)
+        if "start" in args:
+            return [kline(199, close=1), kline(200)]
+        return list(history)
+
+    monkeypatch.setattr(bybit, "_fetch_klines", fake_fetch)
+
+    first = bybit.close_prices()
+    assert len(first) == 200 and "start" not in calls[0]
+    # Свечи той же категории, что и ордера бота
+    assert calls[0]["category"] == bybit.category == "linear"
+
+    second = bybit.close_prices()
+    assert calls[1]["start"] == 199 * MINUTE
+    assert len(second) == 200
+    assert second.index[-1] == 200 * MINUTE
+    assert second.loc[199 * MINUTE] == 1.0
+
+
+def test_close_prices_reloads_after_gap(bybit, monkeypatch):
+    calls = []
+
+    def fake_fetch(**args):
+        calls.append(args)
+        if "start" in args:
+            return [kline(500)]
+        return [kline(i) for i in range(300, 501)][-200:]
+
+    monkeypatch.setattr(bybit, "_fetch_klines", fake_fetch)
+    bybit.klines.get("BTCUSDT", "5", bybit.category).replace(
+        [kline(i) for i in range(200)]
+    )
+
+    closes = bybit.close_prices()
+    assert [("start" in c) for c in calls] == [True, False]
+    assert closes.index[-1] == 500 * MINUTE
@@ -0,0 +1,85 @@
+import json
+import logging
+import time
+from logging.handlers import RotatingFileHandler
+
+import pytest
+
+from bot import logger as log_module
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    """Перезапускает фоновый писатель логов во временной папке"""
+    log_module.shutdown_logging()
+    monkeypatch.setenv("LOG_DIR", str(tmp_path))
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    yield tmp_path
+    log_module.shutdown_logging()
+
+
+def read_lines(path):
+    return path.read_text(encoding="utf-8").splitlines()
+
+
+def test_records_are_written_by_module_file_and_flushed_on_shutdown(log_dir):
+    logger = log_module.setup_logger("pipeline.api")
+    logger.error("order failed: %s", "10006")
+    log_module.setup_logger("__main__").error("stopped")
+    log_module.shutdown_logging()
+
+    assert read_lines(log_dir / "pipeline.log")[0].endswith("ERROR - order failed: 10006")
+    assert read_lines(log_dir / "__main__.log")[0].endswith("ERROR - stopped")
+
+
+def test_json_lines(log_dir, monkeypatch):
+    monkeypatch.setenv("LOG_JSON", "1")
+    log_module.setup_logger("jsonlog.api").error("Привет")
+    log_module.shutdown_logging()
+
+    record = json.loads(read_lines(log_dir / "jsonlog.log")[0])
+    assert record["message"] == "Привет"
+    assert record["level"] == "ERROR"
+    assert record["logger"] == "jsonlog.api"
+
+
+def test_slow_disk_does_not_block_caller(log_dir, monkeypatch):
+    original_emit = RotatingFileHandler.emit
+
+    def slow_emit(self, record):
+        time.sleep(0.2)
+        original_emit(self, record)
+
+    monkeypatch.setattr(RotatingFileHandler, "emit", slow_emit)
+    logger = log_module.setup_logger("slowdisk.api")
+
+    start = time.perf_counter()
+    for i in range(5):
+        logger.error("record %s", i)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.05
+    log_module.shutdown_logging()
+    assert len(read_lines(log_dir / "slowdisk.log")) == 5
+
+
+def test_level_is_respected(log_dir):
+    logger = log_module.setup_logger("levels.api")
+    assert not logger.isEnabledFor(logging.INFO)
+    logger.info("skipped")
+    logger.error("kept")
+    log_module.shutdown_logging()
+    assert len(read_lines(log_dir / "levels.log")) == 1
+
+
+def test_settings_are_read_when_listener_starts(log_dir, monkeypatch):
+    logger = log_module.setup_logger("lateenv.api")
+    log_module.shutdown_logging()
+    # .env загружен после импорта модулей бота: действует при запуске писателя
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.setenv("LOG_DIR", str(log_dir / "late"))
+    log_module.setup_logger("lateenv.other")
+    assert logger.isEnabledFor(logging.INFO)
+    logger.info("kept")
+    log_module.shutdown_logging()
+    assert read_lines(log_dir / "late" / "lateenv.log")[0].endswith("INFO - kept")
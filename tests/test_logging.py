@@ -0,0 +1,32 @@
+import logging
+import sys
+
+from bot.api import Bybit
+
+
+def make_bybit():
+    bybit = Bybit.__new__(Bybit)
+    bybit.symbol = "BTCUSDT"
+    return bybit
+
+
+def place_order_stub(bybit):
+    bybit.log("args", {"qty": "0.1"})
+
+
+def test_log_reports_caller_when_debug_enabled(caplog):
+    caplog.set_level(logging.DEBUG, logger="bot.api")
+    place_order_stub(make_bybit())
+
+    assert caplog.messages == ["* place_order_stub BTCUSDT - ('args', {'qty': '0.1'})"]
+
+
+def test_log_does_nothing_when_debug_disabled(caplog, monkeypatch):
+    caplog.set_level(logging.ERROR, logger="bot.api")
+
+    def fail(*args):
+        raise AssertionError("frame lookup on disabled level")
+
+    monkeypatch.setattr(sys, "_getframe", fail)
+    place_order_stub(make_bybit())
+    assert caplog.records == []
@@ -0,0 +1,27 @@
+import ast
+import os
+
+import bot
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(bot.__file__)), "main.py")
+
+
+def test_env_is_loaded_before_bot_modules():
+    """Настройки модулей бота читаются из окружения: .env должен быть загружен раньше"""
+    with open(MAIN, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    dotenv_calls = []
+    bot_imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "id", None) == "load_dotenv":
+            dotenv_calls.append(node.lineno)
+        elif isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] == "bot":
+            bot_imports.append(node.lineno)
+        elif isinstance(node, ast.Import) and any(
+            alias.name.split(".")[0] == "bot" for alias in node.names
+        ):
+            bot_imports.append(node.lineno)
+
+    assert dotenv_calls and bot_imports
+    assert min(dotenv_calls) < min(bot_imports)
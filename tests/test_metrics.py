@@ -0,0 +1,106 @@
+import time
+import urllib.request
+
+import pytest
+
+from bot import metrics as metrics_module
+from bot.metrics import Histogram, Metrics, SamplingProfiler
+from bot.transport import Transport
+from tests.test_transport import server  # noqa: F401
+
+
+@pytest.fixture
+def shared_metrics():
+    metrics = metrics_module.metrics
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+    metrics.stop()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    with metrics.stage("klines"):
+        pass
+    metrics.request("/v5/market/kline", 0.01)
+    metrics.loop(1.2, 1)
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"] == {}
+    assert snapshot["requests"] == {}
+    assert snapshot["jitter"]["count"] == 0
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1))
+    for value in (0.005, 0.005, 0.05, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.quantile(0.4) == 0.01
+    assert histogram.quantile(0.99) == float("inf")
+
+    lines = histogram.render("x", 'stage="a"')
+    assert 'x_bucket{stage="a",le="0.1"} 3' in lines
+    assert 'x_bucket{stage="a",le="+Inf"} 5' in lines
+    assert 'x_count{stage="a"} 5' in lines
+
+
+def test_stages_requests_and_jitter_rendered():
+    metrics = Metrics(enabled=True)
+    with metrics.stage("klines"):
+        time.sleep(0.002)
+    metrics.request("/v5/order/create", 0.02)
+    metrics.request("/v5/order/create", 0.03, error=True)
+    metrics.loop(1.3, 1)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"]["klines"]["count"] == 1
+    assert snapshot["requests"] == {"/v5/order/create": 2}
+    assert snapshot["errors"] == {"/v5/order/create": 1}
+    assert snapshot["jitter"]["p50"] == 0.5
+
+    text = metrics.render()
+    assert 'trading_requests_total{endpoint="/v5/order/create"} 2' in text
+    assert 'trading_request_errors_total{endpoint="/v5/order/create"} 1' in text
+    assert 'trading_stage_seconds_count{stage="klines"} 1' in text
+
+
+def test_transport_counts_requests_per_endpoint(server, shared_metrics):  # noqa: F811
+    transport = Transport(endpoint=server)
+    for _ in range(3):
+        transport.http.get_tickers(category="linear", symbol="BTCUSDT")
+    transport.close()
+
+    snapshot = shared_metrics.snapshot()
+    assert snapshot["requests"] == {"/v5/market/tickers": 3}
+    assert snapshot["errors"] == {}
+
+
+def test_http_endpoint_and_profiler(shared_metrics):
+    shared_metrics.observe("signal", 0.001)
+    port = shared_metrics.serve(0)
+    base = f"http://127.0.0.1:{port}"
+
+    with urllib.request.urlopen(f"{base}/metrics") as response:
+        assert 'trading_stage_seconds_count{stage="signal"} 1' in response.read().decode()
+
+    with urllib.request.urlopen(f"{base}/profile/start?interval=0.001") as response:
+        assert response.status == 200
+    time.sleep(0.05)
+    with urllib.request.urlopen(f"{base}/profile/stop") as response:
+        stacks = response.read().decode()
+    assert "serve_forever" in stacks
+
+
+def test_profiler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    assert profiler.running
+    deadline = time.monotonic() + 0.05
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    stacks = profiler.stop()
+    assert not profiler.running
+    assert profiler.samples > 0
+    assert "test_profiler_collects_collapsed_stacks" in stacks
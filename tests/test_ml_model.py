@@ -0,0 +1,187 @@
+import asyncio
+import math
+import time
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from bot.indicators import FEATURES, LEGACY_FEATURES, IndicatorEngine
+from bot.ml_model import MODEL_PATH
+from bot.ml_model import TradingModel
+from bot.runner import AsyncRunner
+
+
+def artifact(path, model=None, features=FEATURES):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, len(features)))
+    y = (X[:, 0] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = (model if model is not None else LogisticRegression()).fit(
+        scaler.transform(X), y
+    )
+    joblib.dump({"model": model, "scaler": scaler, "features": features}, path)
+    return str(path)
+
+
+def vector(first):
+    return (first, 0.5, 0.01, 0.0, 0.001, 0.002)
+
+
+def test_model_is_loaded_lazily_and_cached_per_candle(tmp_path):
+    model = TradingModel(artifact(tmp_path / "model.pkl"))
+    assert model.model is None
+
+    items = [(f"SYM{i}", 100, vector(1.0 if i % 2 else -1.0)) for i in range(200)]
+    result = model.predict_batch(items)
+    assert model.loaded
+    assert result["SYM1"] == 1 and result["SYM0"] == 0
+    assert model.calls == 1  # один вызов модели на все символы
+
+    # Та же закрытая свеча - без вызова модели, новая свеча - пересчет
+    model.predict_batch(items)
+    assert model.calls == 1
+    assert model.cached("SYM1", 100) == 1
+    model.predict_batch([("SYM1", 200, vector(-1.0))])
+    assert model.calls == 2
+    assert model.cached("SYM1", 200) == 0
+
+
+def test_unwarmed_features_are_not_predicted(tmp_path):
+    model = TradingModel(artifact(tmp_path / "model.pkl"))
+    result = model.predict_batch([("A", 1, (math.nan,) * 6), ("B", 1, vector(1.0))])
+    assert result == {"A": None, "B": 1}
+
+
+def test_schema_mismatch(tmp_path):
+    path = tmp_path / "model.pkl"
+    scaler = StandardScaler().fit(np.zeros((2, 4)))
+    joblib.dump(
+        {"model": LogisticRegression().fit(np.eye(2, 4), [0, 1]), "scaler": scaler},
+        path,
+    )
+    with pytest.raises(ValueError, match="expects 4 features"):
+        TradingModel(str(path)).load_model()
+
+
+def test_failed_load_is_not_repeated(tmp_path, monkeypatch):
+    model = TradingModel(str(tmp_path / "missing.pkl"))
+    loads = []
+    load_model = model.load_model
+    monkeypatch.setattr(model, "load_model", lambda: loads.append(1) or load_model())
+
+    for candle in range(3):
+        assert model.predict_batch([("A", candle, vector(1.0))]) == {"A": None}
+    assert len(loads) == 1
+    assert isinstance(model.load_error, FileNotFoundError)
+
+
+def test_legacy_artifact_without_schema(tmp_path):
+    path = tmp_path / "model.pkl"
+    X = np.random.default_rng(0).normal(size=(200, len(LEGACY_FEATURES)))
+    scaler = StandardScaler().fit(X)
+    classifier = LogisticRegression().fit(scaler.transform(X), X[:, 4] > 0)
+    joblib.dump({"model": classifier, "scaler": scaler}, path)
+
+    model = TradingModel(str(path))
+    model.load_model()
+    assert model.features == LEGACY_FEATURES
+
+    engine = IndicatorEngine()
+    engine.seed(100 + np.sin(np.arange(60) / 3))
+    # Столбцы старой схемы берутся из хвоста вектора model_features
+    features = engine.model_features()
+    expected = model.predict(np.array([features[len(FEATURES) :]]))[0]
+    assert model.predict_batch([("A", 1, features)]) == {"A": int(expected)}
+
+    # Вектора FEATURES старой схеме мало
+    with pytest.raises(ValueError, match="need 11 input columns"):
+        model.predict_batch([("B", 1, engine.features())])
+
+
+def test_bundled_model_loads():
+    model = TradingModel(MODEL_PATH)
+    model.load_model()
+    assert model.features == LEGACY_FEATURES
+
+    engine = IndicatorEngine()
+    engine.seed(0.095 + np.sin(np.arange(60) / 3) / 1000)
+    assert model.predict_batch([("DOGEUSDT", 1, engine.model_features())])[
+        "DOGEUSDT"
+    ] in (0, 1)
+
+
+def test_subset_schema_selects_columns(tmp_path):
+    features = ("rsi", "volatility")
+    model = TradingModel(artifact(tmp_path / "model.pkl", features=features))
+    assert model.predict_batch([("A", 1, vector(1.0))]) == {"A": 1}
+
+
+def test_batch_latency_for_200_symbols(tmp_path):
+    forest = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = TradingModel(artifact(tmp_path / "model.pkl", model=forest))
+    model.ensure_loaded()
+
+    timings = []
+    for candle in range(5):
+        items = [(f"SYM{i}", candle, vector(i / 100 - 1)) for i in range(200)]
+        start = time.perf_counter()
+        model.predict_batch(items)
+        timings.append(time.perf_counter() - start)
+    assert min(timings) < 0.01
+
+
+def test_engine_features_follow_closed_candles():
+    engine = IndicatorEngine()
+    assert all(math.isnan(value) for value in engine.features())
+
+    closes = 100 + np.sin(np.arange(60) / 3)
+    engine.seed(closes)
+    features = dict(zip(FEATURES, engine.features()))
+    assert 0 <= features["rsi"] <= 1
+    assert features["return_1"] == pytest.approx(closes[-1] / closes[-2] - 1)
+    assert features["volatility"] > 0
+
+    # peek (незакрытая свеча) признаки не меняет
+    engine.peek(200.0)
+    assert dict(zip(FEATURES, engine.features())) == features
+
+
+class FakeBot:
+    def __init__(self, symbol, first):
+        self.symbol = symbol
+        self.first = first
+        self.orders = []
+
+    def get_klines(self):
+        return [1.0]
+
+    def generate_signal(self, data):
+        return 1
+
+    def model_input(self):
+        return 1, vector(self.first)
+
+    def filter_signal(self, signal, prediction):
+        return signal if prediction == signal else None
+
+    def execute_trade_by_base(self, signal):
+        self.orders.append(signal)
+        return "order-id"
+
+
+def test_runner_batches_predictions_across_bots(tmp_path):
+    model = TradingModel(artifact(tmp_path / "model.pkl"))
+    bots = [FakeBot(f"SYM{i}", 1.0 if i % 2 else -1.0) for i in range(50)]
+    runner = AsyncRunner(bots, interval=0.01, rate_limit=10_000, model=model)
+
+    asyncio.run(runner.run(iterations=3))
+    runner.stop()
+
+    assert runner.batcher.batches <= 3
+    assert model.calls <= 3
+    # Модель пропускает покупки только там, где прогнозирует рост
+    assert all(bool(bot.orders) == (bot.first > 0) for bot in bots)
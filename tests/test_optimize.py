@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from bot.backtest import Backtester
+from bot.optimize import PARAMS, ParameterSweep, parameter_grid, split_tasks
+
+GRID = {
+    "rsi_window": [9, 13],
+    "bb_window": [15, 19],
+    "bb_dev": [1.5, 2],
+    "rsi_buy": [30, 35],
+    "rsi_sell": [65, 70],
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(11)
+    close = 0.1 + np.abs(np.cumsum(rng.normal(0, 0.0005, 20_000))) + 0.05
+    noise = np.abs(rng.normal(0, 0.0002, close.size))
+    return {
+        "open": np.r_[close[0], close[:-1]],
+        "high": close + noise,
+        "low": close - noise,
+        "close": close,
+    }
+
+
+def test_parameter_grid_full_and_sampled():
+    full = parameter_grid(GRID)
+    assert len(full) == 32
+    assert set(full[0]) == set(PARAMS)
+
+    sampled = parameter_grid(GRID, samples=5, seed=1)
+    assert len(sampled) == 5
+    assert sampled == parameter_grid(GRID, samples=5, seed=1)
+
+
+def test_single_window_pair_is_split_across_workers():
+    grid = dict(GRID, rsi_window=[13], bb_window=[19], bb_dev=[1.5, 2, 2.5, 3])
+    combos = parameter_grid(grid)
+    tasks = split_tasks(combos, workers=4)
+    assert len(tasks) == 4
+    assert all(len(chunk) == 4 for _, _, chunk in tasks)
+    assert sorted(c for _, _, chunk in tasks for c in chunk) == sorted(
+        (c["bb_dev"], c["rsi_buy"], c["rsi_sell"]) for c in combos
+    )
+    # Разные пары окон не смешиваются в одной задаче
+    tasks = split_tasks(parameter_grid(GRID), workers=2)
+    assert [task[:2] for task in tasks] == [(9, 15), (9, 19), (13, 15), (13, 19)]
+
+
+def test_sweep_matches_single_backtest(data):
+    combos = parameter_grid(GRID)
+    table = ParameterSweep(data, workers=2, qty_decimals=0, trailing_stop=0.001).run(
+        combos
+    )
+
+    assert len(table) == len(combos)
+    assert table["pnl"].is_monotonic_decreasing
+    assert table["trades"].max() > 0
+
+    best = table.iloc[0]
+    params = {name: best[name] for name in PARAMS}
+    params["rsi_window"] = int(params["rsi_window"])
+    params["bb_window"] = int(params["bb_window"])
+    expected = Backtester(qty_decimals=0, trailing_stop=0.001, **params).run(data)
+    assert best["pnl"] == pytest.approx(expected.metrics["pnl"])
+    assert best["trades"] == expected.metrics["trades"]
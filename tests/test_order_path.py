@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+
+from bot import Bot
+from bot import trade_logic
+from bot.health import HealthMonitor
+from bot.orders import OrderBook
+
+
+class FakeExchange:
+    """Клиент биржи без сети с медленной установкой трейлинг стопа"""
+
+    def __init__(self):
+        self.calls = []
+        self.position = {"trailingStop": "0"}
+
+    def get_tickers(self, **args):
+        self.calls.append("get_tickers")
+        return {"retCode": 0, "result": {"list": [{"ask1Price": "50.0"}]}}
+
+    def get_positions(self, **args):
+        self.calls.append("get_positions")
+        return {"retCode": 0, "result": {"list": [self.position]}}
+
+    def place_order(self, **args):
+        self.calls.append(("place_order", args["qty"]))
+        return {"retCode": 0, "result": {"orderId": "order-1"}}
+
+    def set_trading_stop(self, **args):
+        time.sleep(0.2)
+        self.calls.append(("set_trading_stop", args["trailingStop"]))
+        return {"retCode": 0}
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setenv("SYMBOL", "BTCUSDT")
+    monkeypatch.setenv("TRAILING_PERCENT", "5")
+    monkeypatch.setattr(Bot, "get_instrument_info", lambda self: (1, 3, 0.001))
+    health = HealthMonitor(client=None)
+    bot = Bot(max_usdt_to_spend=100, health=health)
+    bot.client = FakeExchange()
+    bot.book = OrderBook(path=None)
+    return bot
+
+
+def test_order_goes_first_with_warm_price(bot):
+    bot.on_ticker(100.0)
+
+    start = time.perf_counter()
+    assert bot.execute_trade_by_base(1) == "order-1"
+    elapsed = time.perf_counter() - start
+
+    # Ни тикера, ни позиций до ордера; трейлинг стоп не задерживает ордер
+    assert bot.client.calls == [("place_order", "0.2")]
+    assert elapsed < 0.1
+
+    assert bot.stop_future.result() is True
+    assert bot.client.calls[-1] == ("set_trading_stop", "5")
+
+    stats = bot.latency_stats()
+    assert stats["orders"] == 1
+    assert stats["p50"] < 100
+
+
+def test_stale_price_falls_back_to_rest(bot, monkeypatch):
+    bot.on_ticker(100.0)
+    monkeypatch.setattr(trade_logic, "PRICE_MAX_AGE", 0)
+    time.sleep(0.01)
+
+    assert bot.execute_trade_by_base(1) == "order-1"
+    assert bot.client.calls[:2] == ["get_tickers", ("place_order", "0.4")]
+    bot.stop_future.result()
+
+
+def test_failed_order_releases_capital_and_skips_stop(bot, monkeypatch):
+    monkeypatch.setattr(
+        bot.client,
+        "place_order",
+        lambda **args: {"retCode": 10001, "retMsg": "error"},
+    )
+    bot.on_ticker(100.0)
+    assert bot.execute_trade_by_base(1) is None
+    assert bot.spent_usdt == 0
+    assert bot.stop_future is None
+    assert bot.latency_stats() == {"orders": 0}
+
+
+def test_capital_follows_net_position(bot):
+    bot.on_ticker(100.0)
+    assert bot.execute_trade_by_base(1) == "order-1"
+    assert (bot.position_qty, bot.spent_usdt) == (0.2, 20)
+
+    # Встречный ордер закрывает позицию и возвращает капитал
+    assert bot.execute_trade_by_base(0) == "order-1"
+    assert (bot.position_qty, bot.spent_usdt) == (0, 0)
+
+    assert bot.execute_trade_by_base(0) == "order-1"  # short
+    # Лимит меньше ордера не мешает закрыть открытую позицию
+    bot.capital.limit = 10
+    assert bot.execute_trade_by_base(1) == "order-1"
+    assert bot.client.calls[-1] == ("place_order", "0.2")
+    assert (bot.position_qty, bot.spent_usdt) == (0, 0)
+    assert bot.execute_trade_by_base(1) is None
+    bot.stop_future.result()
+
+
+def test_position_closed_on_exchange_releases_capital(bot):
+    bot.capital.limit = 20
+    bot.on_ticker(100.0)
+    assert bot.execute_trade_by_base(1) == "order-1"
+    bot.client.position = {"side": "Buy", "size": "0.2", "trailingStop": "5"}
+    assert bot.execute_trade_by_base(1) is None
+    assert bot.spent_usdt == 20
+
+    # Позиция закрыта стопом на бирже: лимит освобождается для нового ордера
+    bot.client.position = {"side": "", "size": "0", "trailingStop": "0"}
+    assert bot.execute_trade_by_base(1) == "order-1"
+    assert (bot.position_qty, bot.spent_usdt) == (0.2, 20)
+    assert bot.client.calls.count("get_positions") == 2
+    bot.stop_future.result()
+
+
+def test_trailing_stop_only_for_opening_orders(bot):
+    bot.on_ticker(100.0)
+    assert bot.execute_trade_by_base(1) == "order-1"
+    bot.stop_future.result()
+    opened = bot.stop_future
+
+    # Добор в ту же сторону и закрытие позиции стоп не ставят
+    assert bot.execute_trade_by_base(1) == "order-1"
+    assert bot.execute_trade_by_base(0) == "order-1"
+    assert bot.execute_trade_by_base(0) == "order-1"
+    assert bot.stop_future is opened
+    stops = [call for call in bot.client.calls if call[0] == "set_trading_stop"]
+    assert len(stops) == 1
+
+    # Открытие новой позиции (short) ставит стоп
+    assert bot.execute_trade_by_base(0) == "order-1"
+    assert bot.stop_future is not opened and bot.stop_future.result() is True
+
+
+def test_background_sync_and_fill_do_not_release_twice(bot, monkeypatch):
+    assert bot.capital.reserve(50)  # резерв другого бота с тем же лимитом
+    assert bot.capital.reserve(20)
+    bot.apply_fill("Buy", 0.2, 20)
+
+    release = bot.capital.release
+
+    def slow_release(amount):
+        time.sleep(0.05)  # расширяет окно гонки
+        release(amount)
+
+    monkeypatch.setattr(bot.capital, "release", slow_release)
+    # Сверка стопа в фоне и закрывающий ордер в торговом потоке одновременно
+    threads = [
+        threading.Thread(target=bot.sync_position, args=({},)),
+        threading.Thread(target=bot.apply_fill, args=("Sell", 0.2, 0.0)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert bot.capital.spent == pytest.approx(50 + bot.exposure)
+    assert bot.exposure == 0
@@ -0,0 +1,181 @@
+import json
+import time
+
+import pytest
+
+from bot import Bot
+from bot.health import HealthMonitor
+from bot.orders import OrderBook
+
+
+NOW = int(time.time() * 1000)
+
+
+def order(order_id, link_id, status="Filled", side="Buy", updated=1):
+    return {
+        "orderId": order_id,
+        "orderLinkId": link_id,
+        "symbol": "BTCUSDT",
+        "side": side,
+        "orderStatus": status,
+        "updatedTime": str(updated),
+    }
+
+
+class FakeHistory:
+    """get_order_history с пагинацией по cursor и get_positions"""
+
+    def __init__(self, orders, page=50):
+        self.orders = orders
+        self.page = page
+        self.calls = []
+
+    def get_order_history(self, **args):
+        self.calls.append(("get_order_history", args.get("cursor")))
+        start = int(args.get("cursor") or 0)
+        end = start + self.page
+        return {
+            "retCode": 0,
+            "result": {
+                "list": self.orders[start:end],
+                "nextPageCursor": str(end) if end < len(self.orders) else "",
+            },
+        }
+
+    def get_positions(self, **args):
+        self.calls.append(("get_positions", None))
+        return {
+            "retCode": 0,
+            "result": {"list": [{"symbol": "BTCUSDT", "positionIdx": 0, "trailingStop": "5"}]},
+        }
+
+
+def test_lookup_by_order_id_and_link_id():
+    book = OrderBook(path=None)
+    book.apply_order(order("1", "link-1", status="New"))
+    assert book.get(order_id="1")["orderStatus"] == "New"
+    assert book.get(link_id="link-1")["orderId"] == "1"
+    assert book.get(link_id="missing") is None
+
+
+def test_stale_updates_are_ignored():
+    book = OrderBook(path=None)
+    book.apply_order(order("1", "link-1", status="Filled", updated=20))
+    book.apply_order(order("1", "link-1", status="New", updated=10))
+    assert book.get(order_id="1")["orderStatus"] == "Filled"
+
+
+def test_private_stream_messages():
+    book = OrderBook(path=None)
+    book.handle_message({"topic": "order", "data": [order("1", "link-1", status="New")]})
+    book.handle_message(
+        {
+            "topic": "execution",
+            "data": [{"orderId": "1", "execQty": "0.5", "leavesQty": "0"}],
+        }
+    )
+    book.handle_message(
+        {"topic": "position", "data": [{"symbol": "BTCUSDT", "positionIdx": 0, "size": "0.5"}]}
+    )
+    assert book.get(link_id="link-1")["orderStatus"] == "Filled"
+    assert book.get(link_id="link-1")["cumExecQty"] == "0.5"
+    assert book.position("BTCUSDT")["size"] == "0.5"
+
+
+def test_reconcile_paginates_and_persists(tmp_path):
+    path = str(tmp_path / "orders.json")
+    history = [order(str(i), f"link-{i}", updated=i) for i in range(120)]
+    client = FakeHistory(history)
+
+    book = OrderBook(path=path)
+    assert book.reconcile(client, "linear") == 120
+    assert [c for c in client.calls if c[0] == "get_order_history"] == [
+        ("get_order_history", None),
+        ("get_order_history", "50"),
+        ("get_order_history", "100"),
+    ]
+
+    # После перезапуска история доступна без биржи, даже вне окна 7 дней
+    restarted = OrderBook(path=path)
+    week_ago = NOW - 7 * 24 * 60 * 60 * 1000
+    assert int(restarted.get(link_id="link-7")["updatedTime"]) < week_ago
+    assert len(restarted) == 120
+    assert restarted.get(link_id="link-7")["orderId"] == "7"
+    assert restarted.position("BTCUSDT")["trailingStop"] == "5"
+
+
+def test_journal_appends_changes_and_prunes_final_orders(tmp_path):
+    path = tmp_path / "orders.json"
+    book = OrderBook(path=str(path), retention=60)
+    for i in range(10):
+        book.apply_order(order(str(i), f"link-{i}", status="New"))
+    book.save()
+    assert len(path.read_text().splitlines()) == 10
+
+    # Без изменений файл не трогается, изменение дописывается одной строкой
+    book.save()
+    book.apply_order(order("1", "link-1", status="New"))
+    book.save()
+    assert len(path.read_text().splitlines()) == 10
+    book.apply_order(order("1", "link-1", status="Filled", updated=NOW + 2))
+    book.save()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 11 and json.loads(lines[-1])["order"]["orderStatus"] == "Filled"
+
+    # Исполненный ордер старше retention удаляется, активные остаются
+    assert book.prune(now_ms=NOW + 61_000) == 1
+    assert book.get(link_id="link-1") is None and len(book) == 9
+    book.save()
+    assert json.loads(path.read_text().splitlines()[-1]) == {"drop": "1"}
+    # Закрытый ордер старше retention из истории биржи не возвращается
+    book.apply_order(order("old", "link-old", updated=NOW - 61_000))
+    assert book.get(order_id="old") is None
+
+    restarted = OrderBook(path=str(path), retention=60)
+    assert len(restarted) == 9
+    assert restarted.get(link_id="link-2")["orderStatus"] == "New"
+
+
+def test_journal_is_compacted_and_reads_old_snapshot(tmp_path):
+    path = tmp_path / "orders.json"
+    snapshot = {"orders": [order("1", "link-1", status="New")], "positions": []}
+    path.write_text(json.dumps(snapshot))
+    book = OrderBook(path=str(path))
+    assert book.get(link_id="link-1")["orderStatus"] == "New"
+
+    for i in range(300):
+        book.apply_order(order("1", "link-1", status="New", updated=i + 2))
+        book.save()
+    # Журнал переписывается снимком, когда становится длиннее книги
+    assert len(path.read_text().splitlines()) <= 2 * len(book) + 100
+    assert OrderBook(path=str(path)).get(order_id="1")["updatedTime"] == "301"
+
+
+class NoNetwork:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        raise AssertionError(f"unexpected request {name}")
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setenv("SYMBOL", "BTCUSDT")
+    monkeypatch.setattr(Bot, "get_instrument_info", lambda self: (1, 3, 0.001))
+    bot = Bot(max_usdt_to_spend=100, health=HealthMonitor(client=None))
+    bot.book = OrderBook(path=None)
+    bot.client = NoNetwork()
+    return bot
+
+
+def test_bot_lookups_do_not_hit_network(bot):
+    bot.book.apply_order(order("1", "link-1", side="Buy"))
+    bot.position_id = "link-1"
+    assert bot.is_position()
+
+    bot.book.apply_position({"symbol": "BTCUSDT", "positionIdx": 0, "trailingStop": "5"})
+    bot.trailing_percent = "5"
+    bot.set_trailing_stop()  # стоп уже стоит: ни позиций, ни set_trading_stop
+    assert bot.client.calls == []
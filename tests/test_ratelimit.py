@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bot.ratelimit import RequestScheduler, TokenBucket
+from bot.transport import Transport
+
+
+class LimitedHandler(BaseHTTPRequestHandler):
+    """Медленный тикер и ордер с заголовками лимитов Bybit"""
+
+    protocol_version = "HTTP/1.1"
+    hits = []
+
+    def _reply(self, result, headers=()):
+        type(self).hits.append(self.path.split("?")[0])
+        body = json.dumps({"retCode": 0, "retMsg": "OK", "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(0.1)
+        self._reply({"list": [{"symbol": "BTCUSDT", "ask1Price": "100.5"}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        reset = int(time.time() * 1000) + 300
+        self._reply(
+            {"orderId": "1"},
+            headers=[
+                ("X-Bapi-Limit", "5"),
+                ("X-Bapi-Limit-Status", "0"),
+                ("X-Bapi-Limit-Reset-Timestamp", str(reset)),
+            ],
+        )
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    LimitedHandler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), LimitedHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+    # 5 токенов из запаса, остальные 20 со скоростью 100/с
+    assert time.monotonic() - start >= 0.18
+
+
+def test_orders_are_served_before_market_reads():
+    bucket = TokenBucket(rate=20, capacity=1)
+    bucket.acquire()
+    served = []
+
+    def take(name, priority):
+        bucket.acquire(priority)
+        served.append(name)
+
+    reads = [
+        threading.Thread(target=take, args=(f"read{i}", 3)) for i in range(3)
+    ]
+    for thread in reads:
+        thread.start()
+    time.sleep(0.01)
+    order = threading.Thread(target=take, args=("order", 0))
+    order.start()
+    for thread in [*reads, order]:
+        thread.join()
+
+    # Ордер пришел последним, но получил токен одним из первых
+    assert served.index("order") <= 1
+
+
+def test_duplicate_reads_are_coalesced(server):
+    transport = Transport(endpoint=server)
+
+    def ticker(_):
+        return transport.http.get_tickers(category="linear", symbol="BTCUSDT")
+
+    with ThreadPoolExecutor(10) as pool:
+        responses = list(pool.map(ticker, range(10)))
+
+    assert all(r["result"]["list"][0]["ask1Price"] == "100.5" for r in responses)
+    assert len(LimitedHandler.hits) < 10
+    stats = transport.rate_stats()["/v5/market/"]
+    assert stats["requests"] + stats["coalesced"] == 10
+    transport.close()
+
+
+def test_limit_headers_calibrate_bucket(server):
+    transport = Transport(endpoint=server, api_key="key", api_secret="secret")
+    args = dict(category="linear", symbol="BTCUSDT", side="Buy", orderType="Market", qty="1")
+
+    transport.http.place_order(**args)
+    start = time.monotonic()
+    transport.http.place_order(**args)
+    # Биржа сообщила, что лимит исчерпан: второй ордер ждет сброса
+    assert time.monotonic() - start >= 0.2
+
+    bucket = transport.scheduler._bucket("/v5/order/create")
+    assert bucket.rate == 5
+    stats = transport.rate_stats()["/v5/order/create"]
+    assert stats["requests"] == 2
+    assert stats["waited"] == 1
+    assert stats["wait_max"] >= 0.2
+    transport.close()
+
+
+def test_groups():
+    scheduler = RequestScheduler()
+    assert scheduler.group("/v5/market/kline") == "/v5/market/"
+    assert scheduler.group("/v5/market/tickers") == "/v5/market/"
+    assert scheduler.group("/v5/order/create") == "/v5/order/create"
+    assert scheduler.priority("/v5/order/create") < scheduler.priority("/v5/market/kline")
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from bot import Bot, instruments, orders
+from bot.health import HealthMonitor
+from bot.kline_store import parse_klines
+from bot.resample import Resampler, resample
+from bot.sandbox import MINUTE, SandboxExchange
+from bot.transport import Transport
+
+TIMEFRAMES = ("5", "15", "60", "240")
+
+
+@pytest.fixture
+def exchange():
+    exchange = SandboxExchange(symbols=["BTCUSDT"], limits={}, seed=3)
+    now = exchange.now() // MINUTE * MINUTE + 37_000
+    exchange.now = lambda: now  # Часы биржи стоят - незакрытые свечи совпадают
+    return exchange
+
+
+def klines(exchange, interval, limit=1000):
+    _, body, _ = exchange.handle(
+        "GET",
+        "/v5/market/kline",
+        dict(category="linear", symbol="BTCUSDT", interval=interval, limit=limit),
+        {},
+    )
+    return parse_klines(body["result"]["list"], newest_first=True)
+
+
+def assert_same_bars(ours, exchange_bars):
+    """OHLC совпадают точно, объемы - с точностью до сложения float"""
+    exchange_bars = exchange_bars[np.isin(exchange_bars["start"], ours["start"])]
+    ours = ours[np.isin(ours["start"], exchange_bars["start"])]
+    assert len(ours) > 0
+    for field in ("start", "open", "high", "low", "close"):
+        np.testing.assert_array_equal(ours[field], exchange_bars[field])
+    for field in ("volume", "turnover"):
+        np.testing.assert_allclose(ours[field], exchange_bars[field], rtol=1e-12)
+
+
+def test_resampled_bars_match_exchange(exchange):
+    minutes = klines(exchange, "1")
+    resampler = Resampler(TIMEFRAMES)
+    resampler.sync(minutes)
+    for interval in TIMEFRAMES:
+        ours = resampler.view(interval)
+        # Неполная первая свеча отброшена, последняя - незакрытая, как у биржи
+        assert ours["start"][0] % (int(interval) * MINUTE) == 0
+        assert ours["start"][0] >= minutes["start"][0]
+        assert ours["start"][-1] == minutes["start"][-1] // (int(interval) * MINUTE) * (
+            int(interval) * MINUTE
+        )
+        assert_same_bars(ours, klines(exchange, interval))
+
+
+def test_incremental_updates_match_batch(exchange):
+    minutes = klines(exchange, "1")
+    resampler = Resampler(TIMEFRAMES)
+    resampler.sync(minutes[:300])
+    for row in minutes[299:].tolist():
+        # Незакрытая минута приходит несколько раз, затем закрывается
+        start, open_, high, low, close, volume, turnover = row
+        resampler.update((start, open_, open_, open_, open_, volume / 2, turnover / 2), closed=False)
+        resampler.update(row, closed=False)
+        resampler.update(row, closed=True)
+
+    for interval in TIMEFRAMES:
+        expected = resample(minutes, int(interval) * MINUTE)
+        ours = resampler.view(interval)
+        assert_same_bars(ours, expected)
+        assert ours["start"][-1] == expected["start"][-1]
+
+
+def test_sync_skips_partial_bucket_and_backfills_history(exchange):
+    minutes = klines(exchange, "1")
+    # История начинается с середины часа
+    offset = int(np.argmax(minutes["start"] % (60 * MINUTE) == 30 * MINUTE))
+    resampler = Resampler(("60",))
+    resampler.sync(minutes[offset:])
+    ours = resampler.view("60")
+    assert ours["start"][0] == minutes["start"][offset] + 30 * MINUTE
+    assert resampler.needs_history("60")
+
+    hours = klines(exchange, "60", limit=50)
+    added = resampler.backfill("60", hours)
+    assert added > 0
+    assert not resampler.needs_history("60")
+    ours = resampler.view("60")
+    assert np.all(np.diff(ours["start"]) == 60 * MINUTE)
+    assert_same_bars(ours, hours)
+
+
+def test_sync_reseeds_after_gap(exchange):
+    minutes = klines(exchange, "1")
+    resampler = Resampler(("5",))
+    resampler.sync(minutes[:100])
+    resampler.sync(minutes[500:])
+    assert_same_bars(resampler.view("5"), klines(exchange, "5"))
+
+
+def test_unaligned_interval_rejected():
+    with pytest.raises(ValueError):
+        Resampler(("7",), base_interval="5")
+    with pytest.raises(ValueError):
+        Resampler(("W",))
+
+
+def test_bot_signals_on_timeframes_without_extra_requests(exchange, monkeypatch):
+    monkeypatch.setattr(instruments, "registry", instruments.InstrumentRegistry(path=None))
+    monkeypatch.setattr(orders, "book", orders.OrderBook(path=None))
+    with exchange:
+        transport = Transport(endpoint=exchange.url, api_key="key", api_secret="secret")
+        bot = Bot(
+            symbol="BTCUSDT",
+            transport=transport,
+            health=HealthMonitor(transport.http),
+            timeframes=TIMEFRAMES,
+        )
+        # Первый запрос прогревает историю интервала, дальше - только базовые свечи
+        data = bot.get_klines(interval="15", limit=100)
+        assert exchange.requests["/v5/market/kline"] == 2
+        bot.get_klines(interval="15", limit=100)
+        assert exchange.requests["/v5/market/kline"] == 3
+        assert len(data) == 100
+        assert_same_bars(data, klines(exchange, "15"))
+
+        before = exchange.requests["/v5/market/kline"]
+        for interval in TIMEFRAMES:
+            assert bot.generate_signal(timeframe=interval) in (None, 0, 1)
+        assert exchange.requests["/v5/market/kline"] == before
+        assert set(bot.timeframe_indicators) == set(TIMEFRAMES)
+        transport.close()
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+from bot.capital import CapitalLimit
+from bot.runner import AsyncRunner, RateBudget
+
+
+class FakeBot:
+    """Бот без сети: медленная загрузка данных и сигнал на каждой итерации"""
+
+    def __init__(self, symbol, capital, fetch_delay=0.05):
+        self.symbol = symbol
+        self.capital = capital
+        self.fetch_delay = fetch_delay
+        self.orders = []
+
+    def check_permissions(self):
+        return {"retCode": 0}
+
+    def get_klines(self):
+        time.sleep(self.fetch_delay)
+        return [1.0]
+
+    def generate_signal(self, data):
+        return 1
+
+    def execute_trade_by_base(self, signal):
+        if not self.capital.reserve(20):
+            return None
+        self.orders.append(signal)
+        return "order-id"
+
+
+def test_capital_limit_is_shared_and_thread_safe():
+    capital = CapitalLimit(1000)
+
+    def spend():
+        for _ in range(100):
+            capital.reserve(1)
+
+    threads = [threading.Thread(target=spend) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert capital.spent == 1000
+    assert not capital.can_spend(1)
+    capital.release(30)
+    assert capital.reserve(30)
+
+
+def test_rate_budget_limits_throughput():
+    async def consume():
+        budget = RateBudget(rate=100, capacity=10)
+        start = time.monotonic()
+        for _ in range(30):
+            await budget.acquire()
+        return time.monotonic() - start
+
+    # 10 запросов из запаса, остальные 20 со скоростью 100/с
+    assert asyncio.run(consume()) >= 0.18
+
+
+def test_runner_fetches_concurrently_with_shared_capital():
+    capital = CapitalLimit(100)
+    bots = [FakeBot(f"SYM{i}USDT", capital) for i in range(50)]
+    runner = AsyncRunner(bots, interval=0.01, rate_limit=10_000, max_workers=50)
+
+    start = time.monotonic()
+    asyncio.run(runner.run(iterations=2))
+    elapsed = time.monotonic() - start
+
+    # 100 последовательных загрузок по 50 мс заняли бы 5 с
+    assert elapsed < 1.5
+    assert runner.ticks == 100
+    # Общий лимит 100 USDT пропускает только 5 ордеров по 20 USDT на всех
+    assert sum(len(bot.orders) for bot in bots) == 5
+    assert capital.spent == 100
+
+
+class BatchBot(FakeBot):
+    """Бот, чьи заявки уходят через общий OrderBatcher runner"""
+
+    order_batcher = None
+
+    def place_orders(self, orders):
+        self.sent_from = threading.current_thread().name
+        return {order["orderLinkId"]: f"id-{order['orderLinkId']}" for order in orders}
+
+    def execute_trade_by_base(self, signal):
+        order_id = self.order_batcher.place(
+            dict(category="linear", symbol=self.symbol, orderLinkId=self.symbol)
+        )
+        self.orders.append(order_id)
+        return order_id
+
+
+def test_order_batching_is_opt_in_and_paid_from_budget(monkeypatch):
+    monkeypatch.delenv("ORDER_BATCH_WINDOW", raising=False)
+    assert AsyncRunner([FakeBot("A", CapitalLimit(100))]).order_batcher is None
+
+    bots = [BatchBot(f"SYM{i}USDT", None, fetch_delay=0) for i in range(25)]
+    runner = AsyncRunner(bots, interval=0.01, rate_limit=10_000, batch_window=0.05)
+    weights = []
+    acquire = runner.budget.acquire
+
+    async def spy(weight=1):
+        weights.append(weight)
+        await acquire(weight)
+
+    runner.budget.acquire = spy
+    asyncio.run(runner.run(iterations=1))
+
+    assert all(bot.orders == [f"id-{bot.symbol}"] for bot in bots)
+    assert runner.order_batcher.batches == 1
+    # Batch ушел из своего потока runner, а не из потока таймера или пула ботов
+    assert bots[0].sent_from.startswith("order-batch")
+    # 25 заявок - два batch-запроса (20 + 5), заявка бота без веса ордера
+    assert weights.count(AsyncRunner.TRADE_WEIGHT - 1) == 25
+    assert weights[-1] == 2
+
+
+def test_batch_is_sent_when_all_workers_wait_for_it():
+    # Ботов с сигналом больше, чем потоков пула: все потоки ждут batch
+    bots = [BatchBot(f"SYM{i}USDT", None, fetch_delay=0) for i in range(8)]
+    runner = AsyncRunner(
+        bots, interval=0.01, rate_limit=10_000, max_workers=4, batch_window=0.01
+    )
+
+    async def run():
+        await asyncio.wait_for(runner.run(iterations=1), timeout=5)
+
+    asyncio.run(run())
+    runner.stop()
+    assert all(bot.orders == [f"id-{bot.symbol}"] for bot in bots)
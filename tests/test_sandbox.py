@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from bot.sandbox import MINUTE, SandboxExchange
+from bot.stream import MarketStream
+
+KEY = {"X-BAPI-API-KEY": "key"}
+
+
+@pytest.fixture
+def exchange():
+    return SandboxExchange(symbols=["BTCUSDT", "ETHUSDT"], seed=1)
+
+
+def call(exchange, method, path, headers=KEY, **params):
+    status, body, _ = exchange.handle(method, path, params, headers)
+    assert status == 200
+    return body
+
+
+def test_klines_aggregate_minutes(exchange):
+    minutes = call(exchange, "GET", "/v5/market/kline", symbol="BTCUSDT", interval="1", limit=30)
+    fives = call(exchange, "GET", "/v5/market/kline", symbol="BTCUSDT", interval="5", limit=3)
+    rows = minutes["result"]["list"]
+    bars = fives["result"]["list"]
+    assert len(bars) == 3
+    assert int(bars[0][0]) > int(bars[1][0])  # от новых к старым
+    assert int(bars[0][0]) % (5 * MINUTE) == 0
+
+    closed = bars[1]
+    inside = [row for row in rows if int(closed[0]) <= int(row[0]) < int(closed[0]) + 5 * MINUTE]
+    assert len(inside) == 5
+    assert closed[1] == inside[-1][1]  # open первой минуты
+    assert closed[4] == inside[0][4]  # close последней минуты
+    assert float(closed[2]) == max(float(row[2]) for row in inside)
+
+
+def test_private_endpoints_require_key(exchange):
+    body = call(exchange, "GET", "/v5/position/list", headers={}, symbol="BTCUSDT")
+    assert body["retCode"] == 10003
+    assert call(exchange, "GET", "/v5/market/tickers", headers={})["retCode"] == 0
+
+
+def test_rate_limit_headers_and_rejection():
+    exchange = SandboxExchange(limits={"/v5/order/": 2})
+    args = dict(symbol="BTCUSDT", side="Buy", orderType="Market", qty="0.001")
+    _, first, headers = exchange.handle("POST", "/v5/order/create", args, KEY)
+    assert first["retCode"] == 0
+    assert headers["X-Bapi-Limit"] == "2"
+    assert headers["X-Bapi-Limit-Status"] == "1"
+
+    codes = [exchange.handle("POST", "/v5/order/create", args, KEY)[1]["retCode"] for _ in range(3)]
+    assert 10006 in codes
+
+
+def test_injected_faults_and_error_rate(exchange):
+    exchange.inject("/v5/market/tickers", code=10016, count=2)
+    codes = [call(exchange, "GET", "/v5/market/tickers")["retCode"] for _ in range(3)]
+    assert codes == [10016, 10016, 0]
+    assert exchange.errors["/v5/market/tickers"] == 2
+
+    exchange.inject("/v5/market/tickers", status=503)
+    assert exchange.handle("GET", "/v5/market/tickers", {}, KEY)[0] == 503
+
+    flaky = SandboxExchange(error_rate=1.0)
+    assert call(flaky, "GET", "/v5/market/tickers")["retCode"] == 10016
+
+
+def test_limit_order_rests_then_amend_and_cancel(exchange):
+    price = float(call(exchange, "GET", "/v5/market/tickers", symbol="ETHUSDT")["result"]["list"][0]["bid1Price"])
+    created = call(
+        exchange, "POST", "/v5/order/create",
+        symbol="ETHUSDT", side="Buy", orderType="Limit", qty="0.1", price=str(price * 0.5),
+        orderLinkId="link-1",
+    )
+    assert created["retCode"] == 0
+    assert exchange.orders[created["result"]["orderId"]]["orderStatus"] == "New"
+
+    amended = call(exchange, "POST", "/v5/order/amend", symbol="ETHUSDT", orderLinkId="link-1", qty="0.2")
+    assert amended["retCode"] == 0
+    assert exchange.orders[created["result"]["orderId"]]["qty"] == "0.2"
+
+    call(exchange, "POST", "/v5/order/cancel", symbol="ETHUSDT", orderLinkId="link-1")
+    assert call(exchange, "POST", "/v5/order/cancel", symbol="ETHUSDT", orderLinkId="link-1")["retCode"] == 110001
+
+
+def test_stop_loss_closes_position(exchange):
+    call(exchange, "POST", "/v5/order/create", symbol="BTCUSDT", side="Buy", orderType="Market", qty="0.01")
+    position = call(exchange, "GET", "/v5/position/list", symbol="BTCUSDT")["result"]["list"][0]
+    assert position["side"] == "Buy"
+
+    # Стоп выше рынка срабатывает при следующем обращении к позициям
+    stop = str(float(position["markPrice"]) * 1.5)
+    assert call(exchange, "POST", "/v5/position/trading-stop", symbol="BTCUSDT", stopLoss=stop)["retCode"] == 0
+    position = call(exchange, "GET", "/v5/position/list", symbol="BTCUSDT")["result"]["list"][0]
+    assert position["size"] == "0"
+
+    body = call(exchange, "POST", "/v5/position/trading-stop", symbol="BTCUSDT", trailingStop="10")
+    assert body["retCode"] == 10001  # позиции нет
+
+
+def test_order_history_pagination(exchange):
+    for _ in range(7):
+        call(exchange, "POST", "/v5/order/create", symbol="BTCUSDT", side="Buy", orderType="Market", qty="0.001")
+    first = call(exchange, "GET", "/v5/order/history", limit=5)["result"]
+    second = call(exchange, "GET", "/v5/order/history", limit=5, cursor=first["nextPageCursor"])["result"]
+    assert len(first["list"]) == 5
+    assert len(second["list"]) == 2
+    assert second["nextPageCursor"] == ""
+
+
+def test_stream_feeds_market_stream():
+    with SandboxExchange(symbols=["BTCUSDT"], speed=600, ws_interval=0.02) as exchange:
+        candles = []
+        stream = MarketStream("BTCUSDT", interval="1", url=exchange.ws_url, max_reconnects=0)
+        done = threading.Event()
+
+        def on_candle(row, confirmed):
+            candles.append((row, confirmed))
+            if confirmed:
+                done.set()
+
+        stream.on_candle = on_candle
+        thread = threading.Thread(target=stream.run, daemon=True)
+        thread.start()
+        assert done.wait(5)
+        stream.stop()
+        thread.join(5)
+
+    assert stream.ask is not None
+    assert any(confirmed for _, confirmed in candles)
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from bot.indicators import IndicatorEngine
+from bot.kline_store import KLINE_DTYPE
+from bot.sandbox import MINUTE, SandboxExchange
+from bot.scanner import MarketScanner
+from bot.transport import Transport
+
+FIVE = 5 * MINUTE
+
+
+def history(closes, last_start):
+    """Свечи KLINE_DTYPE с заданными close, последняя начинается в last_start"""
+    rows = np.zeros(len(closes), dtype=KLINE_DTYPE)
+    rows["start"] = last_start - FIVE * np.arange(len(closes))[::-1]
+    rows["close"] = closes
+    return rows
+
+
+def tickers(prices):
+    return [{"symbol": symbol, "lastPrice": str(price)} for symbol, price in prices.items()]
+
+
+def test_indicators_match_indicator_engine():
+    rng = np.random.default_rng(7)
+    now = 1_700_000_000_000 // FIVE * FIVE
+    closes = {f"S{i}USDT": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 80))) for i in range(5)}
+    # Символ с короткой историей: до начала торгов в матрице NaN
+    closes["NEWUSDT"] = closes["S0USDT"][-30:]
+
+    scanner = MarketScanner(bars=60)
+    scanner.load_history({s: history(c, now) for s, c in closes.items()})
+    last = {s: c[-1] for s, c in closes.items()}
+    scanner.update_tickers(tickers(last), now + 1000)
+
+    close, rsi, high, low, _ = scanner.indicators()
+    for symbol, series in closes.items():
+        engine = IndicatorEngine(rsi_window=13, bb_window=19, bb_dev=2)
+        series = series[-60:]
+        expected = engine.sync(np.arange(len(series)), series)
+        row = scanner.symbols.index(symbol)
+        assert close[row] == expected["close"]
+        assert rsi[row] == pytest.approx(expected["RSI"], rel=1e-12)
+        assert high[row] == pytest.approx(expected["Bollinger_High"], rel=1e-12)
+        assert low[row] == pytest.approx(expected["Bollinger_Low"], rel=1e-12)
+
+    # Новая свеча: предыдущая закрывается в состоянии RSI, матрица сдвигается
+    loaded = {s: max(len(c) - 60, 0) for s, c in closes.items()}
+    for step in range(1, 70):
+        for symbol in last:
+            closes[symbol] = np.r_[closes[symbol], last[symbol] * (1 + 0.001 * step)]
+        last = {s: c[-1] for s, c in closes.items()}
+        scanner.update_tickers(tickers(last), now + step * FIVE)
+    assert scanner.view().shape == (len(closes), 60)
+    close, rsi, _, _, _ = scanner.indicators()
+    for symbol, series in closes.items():
+        row = scanner.symbols.index(symbol)
+        np.testing.assert_array_equal(scanner.view()[row], series[-60:])
+        # Состояние RSI ведется с загруженной истории, а не с окна матрицы
+        series = series[loaded[symbol] :]
+        engine = IndicatorEngine(rsi_window=13, bb_window=19, bb_dev=2)
+        expected = engine.sync(np.arange(len(series)), series)
+        assert rsi[row] == pytest.approx(expected["RSI"], rel=1e-12)
+
+
+def test_scan_ranks_signals_by_band_breakout():
+    now = 1_700_000_000_000 // FIVE * FIVE
+    base = 100 + np.sin(np.arange(40))
+    scanner = MarketScanner(bars=40, top=5)
+    scanner.load_history(
+        {
+            symbol: history(base, now)
+            for symbol in ("DROPUSDT", "CRASHUSDT", "PUMPUSDT", "FLATUSDT", "BTCUSDC")
+        }
+    )
+    scanner.update_tickers(
+        tickers(
+            {
+                "DROPUSDT": 90,
+                "CRASHUSDT": 80,
+                "PUMPUSDT": 115,
+                "FLATUSDT": 100,
+                "BTCUSDC": 50,  # не USDT - не сканируется
+                "ETHUSDT": 3000,  # новый символ без истории
+            }
+        ),
+        now,
+    )
+    shortlist = scanner.scan()
+    assert [(item["symbol"], item["signal"]) for item in shortlist] == [
+        ("CRASHUSDT", 1),
+        ("PUMPUSDT", 0),
+        ("DROPUSDT", 1),
+    ]
+    assert shortlist[0]["bb_position"] < shortlist[2]["bb_position"] < 0
+    assert shortlist[0]["RSI"] <= 35 and shortlist[1]["RSI"] >= 65
+
+    scanner.top = 1
+    assert [item["symbol"] for item in scanner.scan()] == ["CRASHUSDT"]
+
+    # Символ, пропавший из снимка тикеров, в выдачу не попадает
+    scanner.update_tickers(tickers({"DROPUSDT": 90, "PUMPUSDT": 115}), now)
+    scanner.top = 5
+    assert [item["symbol"] for item in scanner.scan()] == ["PUMPUSDT", "DROPUSDT"]
+
+
+def test_refresh_uses_one_tickers_request():
+    symbols = [f"S{i}USDT" for i in range(20)]
+    with SandboxExchange(symbols=symbols, limits={}, seed=5) as exchange:
+        transport = Transport(endpoint=exchange.url)
+        scanner = MarketScanner(interval="1", bars=100)
+        assert scanner.load(transport.http) == len(symbols)
+        assert exchange.requests["/v5/market/kline"] == len(symbols)
+
+        before = dict(exchange.requests)
+        for _ in range(3):
+            assert isinstance(scanner.refresh(transport.http), list)
+        transport.close()
+    requests = {path: count - before.get(path, 0) for path, count in exchange.requests.items()}
+    assert {path: count for path, count in requests.items() if count} == {
+        "/v5/market/tickers": 3
+    }
+    assert len(scanner) == len(symbols)
+    assert not np.isnan(scanner.indicators()[1]).any()
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from bot import Bot
+from bot.health import HealthMonitor
+from bot.stream import MarketStream
+from tests.ws_replay import ReplayServer, load_recording
+
+FIVE_MINUTES = 300_000
+LAST_START = 1726358400000
+
+
+def history(n=200):
+    rows = []
+    for i in range(n):
+        start = LAST_START - (n - 1 - i) * FIVE_MINUTES
+        rows.append([str(start), "60000", "60010", "59990", "60000", "1", "60000"])
+    return rows
+
+
+def test_stream_parses_recorded_session():
+    candles = []
+    with ReplayServer([load_recording("stream_btcusdt.jsonl")]) as server:
+        stream = MarketStream(
+            "BTCUSDT",
+            url=server.url,
+            on_candle=lambda row, confirmed: candles.append((row, confirmed)),
+            max_reconnects=0,
+        )
+        stream.run()
+
+    assert json.loads(server.received[0]) == {
+        "op": "subscribe",
+        "args": ["kline.5.BTCUSDT", "tickers.BTCUSDT"],
+    }
+    # delta без ask1Price не сбрасывает цену из snapshot
+    assert stream.ask == 60012.0
+    assert [confirmed for _, confirmed in candles] == [False, True, False]
+    assert candles[1][0][:5] == [str(LAST_START), "60000", "60020", "59990", "60012"]
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setenv("SYMBOL", "BTCUSDT")
+    monkeypatch.setattr(Bot, "get_instrument_info", lambda self: (1, 3, 0.001))
+    # Баланс без сети: монитор аккаунта не делает запросов к бирже
+    health = HealthMonitor(client=None)
+    health.start = lambda: None
+    return Bot(max_usdt_to_spend=100, health=health)
+
+
+def test_bot_trades_on_confirmed_candle_with_stream_price(bot, monkeypatch):
+    fetches = []
+    signals = []
+    trades = []
+
+    def fake_fetch(**args):
+        fetches.append(args)
+        return history()
+
+    def fake_signal(data):
+        signals.append(data)
+        return 1
+
+    monkeypatch.setattr(bot, "_fetch_klines", fake_fetch)
+    monkeypatch.setattr(bot, "generate_signal", fake_signal)
+    monkeypatch.setattr(
+        bot,
+        "execute_trade_by_base",
+        lambda signal, price=None: trades.append((signal, price)),
+    )
+
+    recording = load_recording("stream_btcusdt.jsonl")
+    with ReplayServer([recording, recording[:1]]) as server:
+        stream = MarketStream(
+            "BTCUSDT",
+            url=server.url,
+            reconnect_delay=0,
+            max_reconnects=1,
+        )
+        bot.run_stream(stream=stream)
+
+    # Сигнал считается только на закрытии свечи, цена берется из потока
+    assert trades == [(1, 60012.0)]
+    assert len(signals) == 1
+    assert signals[0]["close"][-1] == 60012.0
+    assert signals[0]["start"][-1] == LAST_START
+
+    # REST: начальная загрузка и восполнение после переподключения
+    assert len(fetches) == 2
+    assert fetches[0]["category"] == "linear"
+    assert fetches[1]["start"] == LAST_START + FIVE_MINUTES
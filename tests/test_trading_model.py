@@ -30,7 +30,7 @@ def test_predict_without_model(trading_model):
 @pytest.mark.parametrize(
     "input_data, expected",
     [
-        (np.array([[0.5, 0.1, 0.8, 0.3, 0.4, 0.7]]), 1),
+        (np.array([[0.5, 0.1, 0.8, 0.3, 0.4, 0.7]]), 0),
         (np.array([[0.1, 0.4, 0.2, 0.5, 0.1, 0.3]]), 0),
     ],
 )
@@ -0,0 +1,295 @@
+import math
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from bot import trade_logic, trailing
+from bot.capital import CapitalLimit
+from bot.trailing import TrailingStopManager
+from tests.test_bot import bot, exchange  # noqa: F401
+
+
+class Recorder:
+    """send позиций: запоминает отправленные стопы"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, position, stop):
+        self.calls.append((position.symbol, position.position_idx, stop))
+        return True
+
+
+def test_long_stop_ratchets_by_threshold_and_triggers():
+    send = Recorder()
+    hit = []
+    manager = TrailingStopManager(threshold_ticks=1, on_trigger=hit.append)
+    manager.open("BTCUSDT", "Buy", 100, percent=1, tick_size=0.01, send=send)
+    assert send.calls == [("BTCUSDT", 0, 99.0)]
+
+    manager.on_tick("BTCUSDT", 100.5)  # стоп 99.495 -> 99.49: 49 шагов
+    assert send.calls[-1][2] == 99.49
+    manager.on_tick("BTCUSDT", 100.51)  # 99.50 - сдвиг на 1 шаг, не больше порога
+    assert len(send.calls) == 2 and manager.get("BTCUSDT").stop == 99.5
+    manager.on_tick("BTCUSDT", 100.2)  # падение цены стоп не двигает
+    assert manager.get("BTCUSDT").stop == 99.5
+    manager.on_tick("BTCUSDT", 100.525)  # 99.51 - 2 шага от отправленного
+    assert send.calls[-1][2] == 99.51
+    assert manager.sent == 3
+
+    manager.on_tick("BTCUSDT", 99.51)
+    assert [position.stop for position in hit] == [99.51]
+    # Позиция сопровождается, пока закрытие не подтверждено; стоп уже на бирже
+    assert manager.get("BTCUSDT").triggered and manager.sent == 3
+    manager.on_tick("BTCUSDT", 99.4)
+    assert len(hit) == 1
+    manager.close("BTCUSDT")
+    assert len(manager) == 0 and manager.on_tick("BTCUSDT", 200) == []
+
+
+def test_triggered_stop_is_sent_before_confirmation():
+    send = Recorder()
+    hit = []
+    manager = TrailingStopManager(threshold_ticks=5)
+    manager.open(
+        "BTCUSDT", "Buy", 100, percent=1, tick_size=0.01, send=send, on_trigger=hit.append
+    )
+    manager.on_tick("BTCUSDT", 100.03)  # 99.02: 2 шага, меньше порога
+    assert send.calls[-1][2] == 99.0
+
+    # Стоп на бирже (99.0) свободнее локального: уходит сразу при срабатывании
+    manager.on_tick("BTCUSDT", 99.02)
+    assert send.calls[-1][2] == 99.02
+    assert hit == [manager.get("BTCUSDT")]
+
+    # Цена вернулась и обновила максимум - стоп снова ведется
+    manager.on_tick("BTCUSDT", 101)
+    assert not manager.get("BTCUSDT").triggered
+    assert send.calls[-1][2] == 99.99
+
+
+def test_short_stop_with_distance():
+    send = Recorder()
+    manager = TrailingStopManager(threshold_ticks=0)
+    manager.open("ETHUSDT", "Sell", 2000, distance=15, tick_size=0.05, position_idx=2, send=send)
+    assert send.calls == [("ETHUSDT", 2, 2015)]
+    manager.on_tick("ETHUSDT", 2001)
+    assert len(send.calls) == 1
+    manager.on_tick("ETHUSDT", 1980.03)  # 1995.03 округляется вверх: 1995.05
+    assert send.calls[-1] == ("ETHUSDT", 2, 1995.05)
+    manager.on_tick("ETHUSDT", 1995.05)
+    assert manager.get("ETHUSDT", 2).triggered
+    manager.close("ETHUSDT", 2)
+    assert manager.get("ETHUSDT", 2) is None
+
+    with pytest.raises(ValueError):
+        manager.open("ETHUSDT", "Buy", 2000)
+
+
+def test_matches_brute_force_on_many_positions():
+    rng = random.Random(3)
+    symbols = [f"S{i}USDT" for i in range(20)]
+    prices = {symbol: 100.0 for symbol in symbols}
+    manager = TrailingStopManager(threshold_ticks=2)
+    model = {}  # ключ -> [long, percent, extreme, stop, sent, triggered]
+
+    def stop_for(long, percent, extreme):
+        distance = extreme * percent / 100
+        ticks = (extreme - distance if long else extreme + distance) / 0.01
+        ticks = math.floor(ticks + 1e-9) if long else math.ceil(ticks - 1e-9)
+        return round(ticks * 0.01, 2)
+
+    for i in range(3000):
+        symbol = rng.choice(symbols)
+        long, percent = rng.random() < 0.5, rng.choice((0.5, 1, 2))
+        price = prices[symbol]
+        side = "Buy" if long else "Sell"
+        opened = manager.open(symbol, side, price, percent=percent, tick_size=0.01, position_idx=i)
+        for position in opened:
+            position.sent = position.stop  # подтверждение биржи без send
+        stop = stop_for(long, percent, price)
+        model[(symbol, i)] = [long, percent, price, stop, stop, False]
+
+    for _ in range(5000):
+        symbol = rng.choice(symbols)
+        price = prices[symbol] = round(prices[symbol] * (1 + rng.gauss(0, 0.003)), 2)
+        expected = set()
+        for key, state in model.items():
+            long, percent, extreme, stop, sent, triggered = state
+            if key[0] != symbol:
+                continue
+            if not triggered and ((long and price <= stop) or (not long and price >= stop)):
+                # Выбитая позиция остается, неподтвержденный стоп уходит сразу
+                state[5] = True
+                if stop != sent:
+                    state[4] = stop
+                    expected.add(key)
+                continue
+            if (long and price > extreme) or (not long and price < extreme):
+                state[2], state[3], state[5] = price, stop_for(long, percent, price), False
+                if round(abs(state[3] - sent) / 0.01) > 2:
+                    state[4] = state[3]
+                    expected.add(key)
+        updates = manager.on_tick(symbol, price)
+        assert {position.key for position in updates} == expected
+        for position in updates:
+            position.sent = position.stop  # подтверждение биржи без send
+
+    assert len(manager) == len(model)
+    for key, (_, _, extreme, stop, _, triggered) in model.items():
+        position = manager.get(*key)
+        assert (position.extreme, position.stop) == (extreme, stop)
+        assert position.triggered == triggered
+
+
+def test_updates_during_send_are_coalesced():
+    started, release = threading.Event(), threading.Event()
+    sent = []
+
+    def send(position, stop):
+        sent.append(stop)
+        if len(sent) == 1:
+            return True
+        started.set()
+        release.wait(5)
+        return True
+
+    manager = TrailingStopManager(threshold_ticks=0)
+    manager.open("BTCUSDT", "Buy", 100, distance=1, tick_size=0.1, send=send)
+    worker = threading.Thread(target=manager.on_tick, args=("BTCUSDT", 101))
+    worker.start()
+    assert started.wait(5)
+    # Пока стоп 100.0 отправляется, цена дважды растет: уйдет только последний
+    manager.on_tick("BTCUSDT", 102)
+    manager.on_tick("BTCUSDT", 103)
+    release.set()
+    worker.join(5)
+    assert sent == [99.0, 100.0, 102.0]
+    assert manager.get("BTCUSDT").sent == 102.0
+
+
+def test_local_mode_moves_exchange_stop_loss(bot, exchange, monkeypatch):  # noqa: F811
+    monkeypatch.setattr(trailing, "stops", TrailingStopManager(threshold_ticks=1))
+    bot.trailing_mode, bot.trailing_percent = "local", "1"
+    bot.get_valid_order_qty = lambda price: 0.001
+    assert bot.execute_trade_by_base(1) is not None
+    assert bot.stop_future.result() is True
+
+    position = exchange.positions["BTCUSDT"]
+    assert position["trailingStop"] == "0"
+    tracked = trailing.stops.get("BTCUSDT")
+    assert float(position["stopLoss"]) == tracked.stop < tracked.extreme
+
+    before = dict(exchange.requests)
+    bot.on_ticker(tracked.extreme * 1.02)
+    assert float(position["stopLoss"]) == tracked.stop
+    assert tracked.stop == pytest.approx(tracked.extreme - 1, abs=0.1)
+    bot.on_ticker(tracked.extreme - 1)
+    assert exchange.requests["/v5/position/trading-stop"] - before.get(
+        "/v5/position/trading-stop", 0
+    ) == 1
+    assert exchange.requests["/v5/position/list"] == before.get("/v5/position/list", 0)
+
+
+def test_closing_order_stops_tracking(bot, exchange, monkeypatch):  # noqa: F811
+    monkeypatch.setattr(trailing, "stops", TrailingStopManager(threshold_ticks=1))
+    bot.capital = CapitalLimit(10**6)  # разворот целиком помещается в лимит
+    bot.trailing_mode, bot.trailing_percent = "local", "1"
+    bot.get_valid_order_qty = lambda price: 0.001
+    assert bot.execute_trade_by_base(1) is not None
+    assert bot.stop_future.result() is True
+    assert trailing.stops.get("BTCUSDT").long
+
+    # Продажа закрывает long: фантомного short нет, стоп не отправляется
+    sent = exchange.requests["/v5/position/trading-stop"]
+    assert bot.execute_trade_by_base(0) is not None
+    assert bot.position_qty == 0
+    assert trailing.stops.get("BTCUSDT") is None
+    assert exchange.requests["/v5/position/trading-stop"] == sent
+
+    # Разворот: закрывает long и открывает short
+    assert bot.execute_trade_by_base(1) is not None
+    assert bot.stop_future.result() is True
+    bot.order_qty = lambda price: 0.002
+    assert bot.execute_trade_by_base(0) is not None
+    assert bot.stop_future.result() is True
+    assert bot.position_qty == -0.001
+    assert not trailing.stops.get("BTCUSDT").long
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_triggered_stop_waits_for_exchange_close(bot, exchange, monkeypatch):  # noqa: F811
+    monkeypatch.setattr(trailing, "stops", TrailingStopManager(threshold_ticks=1))
+    monkeypatch.setattr(trade_logic, "_stops_executor", InlineExecutor())
+    monkeypatch.setattr(trade_logic, "STOP_CONFIRM_DELAY", 0.05)
+    checks = []
+    refresh_position = bot.refresh_position
+    bot.refresh_position = lambda: checks.append(1) or refresh_position()
+    bot.trailing_mode, bot.trailing_percent = "local", "1"
+    bot.get_valid_order_qty = lambda price: 0.001
+    assert bot.execute_trade_by_base(1) is not None
+    tracked = trailing.stops.get("BTCUSDT")
+
+    # Биржа еще держит позицию: сопровождение продолжается
+    bot.on_ticker(tracked.stop)
+    assert trailing.stops.get("BTCUSDT") is tracked and tracked.triggered
+    assert bot.position_qty == 0.001
+    # Проверки повторяются по таймеру, повторный тик новую цепочку не заводит
+    bot.on_ticker(tracked.stop - 1)
+    deadline = time.monotonic() + 5
+    while len(checks) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(checks) >= 3 and tracked.triggered
+
+    # Биржа закрыла позицию стопом: очередная проверка снимает сопровождение
+    bot.get_open_positions = lambda: []
+    while trailing.stops.get("BTCUSDT") is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert trailing.stops.get("BTCUSDT") is None
+    assert bot.position_qty == 0 and bot.capital.spent == 0
+    assert not bot._confirming
+
+
+def test_failed_stop_send_is_retried(monkeypatch):
+    monkeypatch.setattr(trailing, "RETRY_DELAY", 0.01)
+    calls = []
+
+    def send(position, stop):
+        calls.append(stop)
+        return len(calls) > 2  # биржа принимает стоп с третьей попытки
+
+    manager = TrailingStopManager(threshold_ticks=1)
+    manager.open("BTCUSDT", "Buy", 100, distance=1, tick_size=0.01, send=send)
+    deadline = time.monotonic() + 5
+    # Цена не движется, повтор идет по таймеру
+    while manager.get("BTCUSDT").sent is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == [99.0, 99.0, 99.0]
+    assert manager.get("BTCUSDT").sent == 99.0 and manager.get("BTCUSDT").failures == 0
+
+
+def test_local_and_exchange_modes_trail_by_same_distance(bot, exchange, monkeypatch):  # noqa: F811
+    monkeypatch.setattr(trailing, "stops", TrailingStopManager(threshold_ticks=1))
+    bot.get_valid_order_qty = lambda price: 0.001
+    assert bot.execute_trade_by_base(1) is not None
+    assert bot.stop_future.result() is True
+    bot.get_open_positions()  # биржа обновляет пик цены трейлинга
+    position = exchange.positions["BTCUSDT"]
+    peak, distance = position["_peak"], float(position["trailingStop"])
+    assert distance == float(bot.trailing_percent) == 50
+
+    bot.trailing_mode = "local"
+    bot.execute_trade_by_base(0)  # закрыть позицию биржевого режима
+    assert bot.execute_trade_by_base(1) is not None
+    assert bot.stop_future.result() is True
+    # От одной и той же цены локальный стоп там же, где стоп биржи
+    assert trailing.stops.get("BTCUSDT").stop_for(peak) == pytest.approx(peak - distance)
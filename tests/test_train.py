@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot.indicators import FEATURES, IndicatorEngine
+from bot.ml_model import TradingModel
+from bot.train import (
+    build_dataset,
+    compute_features,
+    forward_labels,
+    iter_chunks,
+    save_artifact,
+    train,
+)
+
+MINUTE = 60_000
+
+
+def make_csv(path, size, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, size))
+    pd.DataFrame(
+        {
+            "start": np.arange(size, dtype=np.int64) * MINUTE + 1_700_000_000_000,
+            "open": close,
+            "high": close + 0.1,
+            "low": close - 0.1,
+            "close": close,
+        }
+    ).to_csv(path, index=False)
+    return close
+
+
+def test_features_match_streaming_engine():
+    rng = np.random.default_rng(3)
+    close = 50 + np.cumsum(rng.normal(0, 0.2, 300))
+    matrix = compute_features(close)
+
+    engine = IndicatorEngine()
+    for i, value in enumerate(close):
+        engine.update(value)
+        if i >= 30:
+            np.testing.assert_allclose(matrix[i], engine.features(), rtol=1e-9)
+
+
+def test_forward_labels():
+    labels = forward_labels([1.0, 2.0, 1.5, 3.0], horizon=2)
+    np.testing.assert_array_equal(labels[:2], [1.0, 1.0])
+    assert np.isnan(labels[2:]).all()
+
+
+def test_chunks_cover_series():
+    chunks = list(iter_chunks(25, chunk=10, warmup=4, horizon=2))
+    assert chunks == [(0, 12, 0, 10), (6, 22, 10, 20), (16, 25, 20, 25)]
+
+
+def test_chunked_dataset_equals_whole(tmp_path):
+    close = make_csv(tmp_path / "a.csv", 5_000, seed=1)
+    whole_dir = tmp_path / "whole"
+    chunked_dir = tmp_path / "chunked"
+    whole_dir.mkdir()
+    chunked_dir.mkdir()
+
+    X, y, start = build_dataset([str(tmp_path / "a.csv")], str(whole_dir), 5, 1)
+    Xc, yc, startc = build_dataset(
+        [str(tmp_path / "a.csv")], str(chunked_dir), 5, 1, chunk=1_200
+    )
+
+    assert X.shape == (close.size - 5 - 18, len(FEATURES))  # без прогрева и хвоста
+    np.testing.assert_allclose(Xc, X, rtol=1e-9, atol=1e-10)
+    np.testing.assert_array_equal(yc, y)
+    np.testing.assert_array_equal(startc, start)
+
+
+def test_multi_symbol_dataset_sorted_by_time(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"s{i}.csv"
+        make_csv(path, 800, seed=i)
+        paths.append(str(path))
+
+    X, y, start = build_dataset(paths, str(tmp_path), 3, 2)
+    assert len(X) == 3 * (800 - 3 - 18)
+    assert (np.diff(start) >= 0).all()
+    assert not os.path.exists(tmp_path / "part0.bin")
+
+
+def test_artifact_loads_into_trading_model(tmp_path):
+    make_csv(tmp_path / "a.csv", 3_000, seed=5)
+    X, y, _ = build_dataset([str(tmp_path / "a.csv")], str(tmp_path), 5, 1)
+    model, scaler, metrics = train(X, y, n_splits=3, n_estimators=10)
+    assert len(metrics["folds"]) == 3
+    assert 0 <= metrics["accuracy"] <= 1
+
+    path = save_artifact(str(tmp_path / "models"), model, scaler, metrics, {})
+    with open(os.path.splitext(path)[0] + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta["features"] == list(FEATURES)
+
+    trading_model = TradingModel(model_path=path)
+    result = trading_model.predict_batch(
+        [("BTCUSDT", 1, tuple(X[-1])), ("ETHUSDT", 1, (np.nan,) * len(FEATURES))]
+    )
+    assert result["BTCUSDT"] in (0, 1)
+    assert result["ETHUSDT"] is None
@@ -0,0 +1,55 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bot.transport import PooledHTTPAdapter, Transport
+
+
+class TickerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = json.dumps(
+            {
+                "retCode": 0,
+                "retMsg": "OK",
+                "result": {"list": [{"symbol": "BTCUSDT", "ask1Price": "100.5"}]},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), TickerHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_one_connection(server):
+    transport = Transport(endpoint=server)
+    for _ in range(5):
+        response = transport.http.get_tickers(category="linear", symbol="BTCUSDT")
+        assert response["result"]["list"][0]["ask1Price"] == "100.5"
+
+    assert transport.stats() == {"requests": 5, "opened": 1, "reused": 4}
+    transport.close()
+
+
+def test_timeout_by_endpoint_prefix():
+    adapter = PooledHTTPAdapter(timeouts={"/v5/": 7, "/v5/order/": 2})
+    assert adapter.timeout_for("/v5/order/create") == 2
+    assert adapter.timeout_for("/v5/market/kline") == 7
+    assert adapter.timeout_for("/health", default=10) == 10
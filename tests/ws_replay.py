@@ -0,0 +1,59 @@
+"""
+Локальная заглушка WebSocket сервера Bybit.
+После первого сообщения клиента (subscribe) проигрывает
+записанные сообщения и закрывает соединение.
+"""
+
+import os
+import socket
+import struct
+import threading
+
+from bot.sandbox import handshake, read_frame, send_frame
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def load_recording(name):
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class ReplayServer:
+    """
+    :param sessions: Список записей, по одной на каждое входящее соединение
+    """
+
+    def __init__(self, sessions):
+        self.sessions = list(sessions)
+        self.received = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.url = f"ws://127.0.0.1:{self._sock.getsockname()[1]}"
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._sock.close()
+
+    def _serve(self):
+        for messages in self.sessions:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with conn:
+                handshake(conn)
+                # Ждем subscribe от клиента
+                opcode, payload = read_frame(conn)
+                while opcode != 0x1:
+                    opcode, payload = read_frame(conn)
+                self.received.append(payload.decode())
+                for message in messages:
+                    send_frame(conn, message.encode())
+                send_frame(conn, struct.pack(">H", 1000), opcode=0x8)